@@ -1,23 +1,438 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import requests
 import json
+import logging
+import multiprocessing
 import re
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 from datetime import datetime
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from hedging import DeadlineExceeded, Hedger, remaining_seconds
+from http_client import PooledHTTPClient
+from linear_match import UnsupportedPattern, compile_linear
+from logging_config import PAYLOAD_LOGGER_NAME, LazyJSON, configure_logging
+from match_results import (COLUMNAR_ENCODINGS, TEST_MODES, batch_row, encode_columnar, linear_mode, page_spans,
+                           re_mode, re_spans)
+from metrics import MetricsRegistry
+from model_router import ModelRouter, load_model_pool
+from pattern_cache import CompiledPatternCache
+from pattern_store import PatternStore
+from regex_optimizer import optimize_regex
+from regex_validation import RegexValidator, prompt_examples
+from response_cache import DiskStore, MemoryStore, ResponseCache, normalize_prompt
+from safe_match import GuardedMatcher, find_redos_risks
+from semantic_cache import SemanticCache
+from single_flight import SingleFlight
+from stream_scan import match_window, scan_chunks
+from tracing import build_tracer, traced
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for web interface
 
+logger = configure_logging()
+payload_logger = logging.getLogger(PAYLOAD_LOGGER_NAME)
+
+# Prometheus metrics; point METRICS_DIR at a directory shared by all gunicorn
+# workers so /metrics reports the whole server, not just the worker scraped
+metrics = MetricsRegistry(
+    directory=os.getenv('METRICS_DIR') or None,
+    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+)
+REQUEST_LATENCY = metrics.histogram(
+    'regex_http_request_duration_seconds', 'Time spent handling HTTP requests',
+    ('route', 'method', 'status')
+)
+UPSTREAM_LATENCY = metrics.histogram(
+    'regex_upstream_request_duration_seconds', 'Latency of model API calls (to response headers)',
+    ('outcome',)
+)
+FALLBACKS = metrics.counter(
+    'regex_fallback_total', 'Smart fallback patterns served, by matched keyword', ('keyword',)
+)
+EXTRACTION_FAILURES = metrics.counter(
+    'regex_extraction_failures_total', 'Model responses without a usable regex', ('reason',)
+)
+DEADLINES_EXCEEDED = metrics.counter(
+    'regex_deadline_exceeded_total', 'Requests answered with the fallback because their deadline ran out'
+)
+CACHE_LOOKUPS = metrics.counter(
+    'regex_cache_lookups_total', 'Cache lookups; hit ratio = hit / (hit + miss)', ('cache', 'result')
+)
+VALIDATIONS = metrics.counter(
+    'regex_validations_total', 'Model patterns validated, by outcome (passed or the failed check)', ('outcome',)
+)
+VALIDATION_LATENCY = metrics.histogram(
+    'regex_validation_duration_seconds', 'Time spent validating a model pattern', ('outcome',)
+)
+
+# Per-request span trees; TRACE_SAMPLE_RATE=0 (the default) disables tracing
+tracer = build_tracer()
+
+# Compiled-pattern cache shared by every /api/test code path
+pattern_cache = CompiledPatternCache(
+    max_entries=int(os.getenv('PATTERN_CACHE_SIZE', 1024)),
+    max_bytes=int(os.getenv('PATTERN_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+)
+
+# Programs for the linear-time (no backtracking) engine, cached like re patterns
+linear_cache = CompiledPatternCache(
+    max_entries=int(os.getenv('LINEAR_CACHE_SIZE', 256)),
+    max_bytes=int(os.getenv('LINEAR_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    compiler=compile_linear
+)
+
+# Optimized rewrites of generated patterns (see regex_optimizer), cached per pattern
+optimization_cache = CompiledPatternCache(
+    max_entries=int(os.getenv('OPTIMIZATION_CACHE_SIZE', 1024)),
+    max_bytes=int(os.getenv('OPTIMIZATION_CACHE_MAX_BYTES', 4 * 1024 * 1024)),
+    compiler=optimize_regex
+)
+
+# auto: linear engine for risky patterns (or always, with the re2 backend); re: backtracking only
+MATCH_ENGINE = os.getenv('MATCH_ENGINE', 'auto').lower()
+MATCH_ENGINES = ('auto', 're', 'linear')
+
+# /api/test result formats: the findall-style match list, or span columns (see match_results)
+TEST_FORMATS = ('matches', 'columnar')
+
+# Guarded (killable, time-budgeted) matching for untrusted patterns on /api/test
+GUARDED_MATCHING = os.getenv('GUARDED_MATCHING', 'False').lower() == 'true'
+GUARDED_TIMEOUT_MS = int(os.getenv('GUARDED_TIMEOUT_MS', 1000))
+GUARDED_MAX_TIMEOUT_MS = int(os.getenv('GUARDED_MAX_TIMEOUT_MS', 5000))
+guarded_matcher = GuardedMatcher(
+    max_workers=int(os.getenv('GUARDED_WORKERS', 2)),
+    default_timeout=GUARDED_TIMEOUT_MS / 1000
+)
+
+def guarded_test_regex(pattern, test_string, timeout_ms, mode='all', engine='re'):
+    """Like SmartRegexGenerator.test_regex, but killed after timeout_ms"""
+    try:
+        # Compiling is cheap and safe; only matching needs the worker process
+        pattern_cache.compile(pattern)
+        outcome = guarded_matcher.match_mode(mode, pattern, test_string, timeout_ms / 1000, engine)
+    except re.error as e:
+        outcome = {"status": "error", "error": f"Invalid regex: {str(e)}"}
+    
+    if outcome["status"] == "ok":
+        return {
+            "success": True,
+            "status": "ok",
+            "matches": outcome["matches"],
+            "match_count": outcome["match_count"],
+            "is_valid": True
+        }
+    return guarded_failure(outcome, timeout_ms)
+
+def guarded_failure(outcome, timeout_ms):
+    """Test result for a guarded match that timed out, found no free worker or failed"""
+    if outcome["status"] == "timeout":
+        return {
+            "success": False,
+            "status": "timeout",
+            "error": f"Match exceeded time budget of {timeout_ms} ms",
+            "matches": [],
+            "match_count": 0,
+            "is_valid": True
+        }
+    if outcome["status"] == "busy":
+        return {
+            "success": False,
+            "status": "busy",
+            "error": outcome["error"],
+            "matches": [],
+            "match_count": 0,
+            "is_valid": True
+        }
+    return {
+        "success": False,
+        "status": "error",
+        "error": outcome["error"],
+        "matches": [],
+        "match_count": 0,
+        "is_valid": False
+    }
+
+def columnar_test_regex(pattern, test_string, linear, guarded, timeout_ms, encoding, offset=0, limit=None):
+    """Match spans as columns (see match_results), from whichever engine /api/test picked"""
+    try:
+        compiled = pattern_cache.compile(pattern)
+    except re.error as e:
+        return {
+            "success": False,
+            "status": "error",
+            "error": f"Invalid regex: {str(e)}",
+            "matches": [],
+            "match_count": 0,
+            "is_valid": False
+        }
+    
+    if linear is not None and not guarded:
+        page, total = page_spans(linear.finditer_spans(test_string), offset, limit)
+    elif guarded:
+        engine = linear.engine if linear is not None else 're'
+        outcome = guarded_matcher.spans(pattern, test_string, timeout_ms / 1000, offset, limit, engine)
+        if outcome["status"] != "ok":
+            return guarded_failure(outcome, timeout_ms)
+        page, total = outcome["page"], outcome["total"]
+    else:
+        page, total = page_spans(re_spans(compiled, test_string), offset, limit)
+    
+    group_names = {index: name for name, index in compiled.groupindex.items()}
+    columns = encode_columnar(page, compiled.groups, group_names, encoding)
+    columns["offset"] = offset
+    columns["next_offset"] = offset + len(page) if offset + len(page) < total else None
+    return {
+        "success": True,
+        "status": "ok",
+        "matches": [],
+        "match_count": total,
+        "is_valid": True,
+        "columns": columns
+    }
+
+# Keyword -> pattern table used by the smart fallback (order matters: first hit wins)
+SMART_PATTERNS = {
+    # Email patterns
+    'email': r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$',
+    'gmail': r'^[a-zA-Z0-9._%+-]+@gmail\.com$',
+    'yahoo': r'^[a-zA-Z0-9._%+-]+@yahoo\.com$',
+
+    # Phone patterns
+    'phone': r'^\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}$',
+    'mobile': r'^\+?1?[0-9]{10}$',
+    'international': r'^\+[1-9]\d{1,14}$',
+
+    # Date patterns
+    'date': r'^\d{1,2}/\d{1,2}/\d{4}$',
+    'mm/dd/yyyy': r'^(0[1-9]|1[0-2])/(0[1-9]|[12][0-9]|3[01])/\d{4}$',
+    'dd-mm-yyyy': r'^(0[1-9]|[12][0-9]|3[01])-(0[1-9]|1[0-2])-\d{4}$',
+    'yyyy-mm-dd': r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$',
+    'iso': r'^\d{4}-\d{2}-\d{2}$',
+
+    # Web patterns
+    'url': r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.]*))?(?:#(?:\w*))?)?',
+    'http': r'https?://[^\s]+',
+    'domain': r'^[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9]\.[a-zA-Z]{2,}$',
+    'ip': r'^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$',
+    'ipv4': r'^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$',
+
+    # Text patterns
+    'word': r'^[a-zA-Z]+$',
+    'capital': r'^[A-Z][a-z]*$',
+    'uppercase': r'^[A-Z]+$',
+    'lowercase': r'^[a-z]+$',
+    'alphanumeric': r'^[a-zA-Z0-9]+$',
+    'hashtag': r'#[a-zA-Z0-9_]+',
+    'mention': r'@[a-zA-Z0-9_]+',
+
+    # Number patterns
+    'number': r'^\d+$',
+    'integer': r'^-?\d+$',
+    'decimal': r'^\d+\.\d+$',
+    'float': r'^-?\d+\.?\d*$',
+    'currency': r'^\$?\d{1,3}(,\d{3})*(\.\d{2})?$',
+
+    # Finance patterns
+    'credit card': r'^\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}$',
+    'creditcard': r'^\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}$',
+    'ssn': r'^\d{3}-\d{2}-\d{4}$',
+    'social security': r'^\d{3}-\d{2}-\d{4}$',
+    'zip': r'^\d{5}(-\d{4})?$',
+    'zipcode': r'^\d{5}(-\d{4})?$',
+    'postal': r'^[A-Z]\d[A-Z]\s?\d[A-Z]\d$',
+
+    # Security patterns
+    'password': r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$',
+    'strong password': r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$',
+    'uuid': r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
+    'api key': r'^[A-Za-z0-9]{32}$',
+    'hex': r'^[0-9a-fA-F]+$',
+    'hexadecimal': r'^#?[0-9a-fA-F]{6}$',
+
+    # Time patterns
+    'time': r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$',
+    '24hour': r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$',
+    '12hour': r'^(0?[1-9]|1[0-2]):[0-5][0-9]\s?(AM|PM)$',
+}
+
+def build_keyword_index(table):
+    """Flatten a keyword table into tokens in priority order plus a token -> hit map.
+    
+    Tokens are whole keywords (exact hits) followed by the individual words of
+    multi-word keywords (partial hits), each ranked by table order. The first
+    token found in a prompt is therefore the same keyword the two-pass scan
+    (every keyword, then every word of every keyword) would have returned.
+    Returns (tokens, hits) where hits[token] is (keyword, exact).
+    """
+    ranks = {}
+    for priority, keyword in enumerate(table):
+        for word in keyword.split():
+            ranks.setdefault(word, (1, priority, keyword))
+    for priority, keyword in enumerate(table):
+        ranks[keyword] = (0, priority, keyword)
+    
+    tokens = tuple(sorted(ranks, key=lambda token: ranks[token][:2]))
+    hits = {token: (ranks[token][2], ranks[token][0] == 0) for token in tokens}
+    return tokens, hits
+
+KEYWORD_TOKENS, KEYWORD_HITS = build_keyword_index(SMART_PATTERNS)
+
+# Label the model is asked to put its answer behind
+REGEX_LABEL = re.compile(r'REGEX:', re.IGNORECASE)
+
+def record_fallback(keyword):
+    """Count a served fallback pattern and tag the active span with it"""
+    FALLBACKS.inc(keyword)
+    tracer.current_span().set_attribute("fallback.keyword", keyword)
+
+def is_upstream_success(status_code):
+    """Status codes that count as a healthy upstream for the circuit breaker"""
+    return status_code < 500 and status_code != 429
+
+def is_shareable_result(result):
+    """Whether coalesced callers may reuse a result; a deadline fallback reflects the leader's budget only"""
+    return not result.get("deadline_exceeded")
+
+def validation_feedback(result):
+    """Prompt addition telling the model why its previous answer was rejected"""
+    return f"Your previous answer REGEX: {result['regex']} was rejected: {result['validation']['error']}."
+
+def match_fallback_keyword(user_lower):
+    """Best SMART_PATTERNS keyword for a lowercased prompt, as (keyword, exact) or (None, False)"""
+    for token in KEYWORD_TOKENS:
+        if token in user_lower:
+            return KEYWORD_HITS[token]
+    return None, False
+
 class SmartRegexGenerator:
-    def __init__(self, api_key):
+    def __init__(self, api_key, response_cache=None, http_client=None, circuit_breaker=None, hedger=None,
+                 router=None, pattern_store=None, semantic_cache=None, single_flight=None, validator=None):
         self.api_key = api_key
         self.base_url = "https://openrouter.ai/api/v1/chat/completions"
         self.model = "deepseek/deepseek-r1:free"
+        self.response_cache = response_cache
+        self.http_client = http_client or PooledHTTPClient()
+        self.circuit_breaker = circuit_breaker
+        self.hedger = hedger
+        self.router = router
+        self.pattern_store = pattern_store
+        self.semantic_cache = semantic_cache
+        self.single_flight = single_flight
+        self.validator = validator
+        
+    @traced("generate_regex")
+    def generate_regex(self, user_input, deadline=None):
+        """Generate regex using DeepSeek R1, serving repeat prompts from the cache.
         
-    def generate_regex(self, user_input):
-        """Generate regex using DeepSeek R1"""
+        deadline is an absolute time.monotonic() value; once it passes, the
+        smart fallback is returned instead of waiting for the model.
+        """
+        cached = self.get_cached(user_input)
+        tracer.current_span().set_attribute("cached", cached is not None)
+        if cached is not None:
+            return cached
         
+        if self.single_flight is None:
+            result, leader = self._generate_checked(user_input, deadline), True
+        else:
+            # Identical prompts in flight share one upstream call
+            try:
+                result, leader = self.single_flight.do(
+                    normalize_prompt(user_input),
+                    lambda: self._generate_checked(user_input, deadline),
+                    deadline,
+                    shareable=is_shareable_result
+                )
+            except DeadlineExceeded:
+                return self.deadline_result(user_input)
+            except TimeoutError:
+                result, leader = self._generate_checked(user_input, deadline), True
+            if not leader and not is_shareable_result(result):
+                result, leader = self._generate_checked(user_input, deadline), True
+        
+        if leader:
+            self.remember(user_input, result)
+        return result
+    
+    @traced("cache.get")
+    def get_cached(self, user_input):
+        """Return the cached (or stored, or near-duplicate) result for a prompt, marked as cached, or None"""
+        cached = self.response_cache.get(user_input) if self.response_cache is not None else None
+        if cached is None:
+            cached = self.get_stored(user_input)
+            if cached is not None and self.response_cache is not None:
+                self.response_cache.set(user_input, cached)
+        if cached is None:
+            # Not copied into the exact cache: a wrong near-duplicate would stick for the whole TTL
+            cached = self.get_similar(user_input)
+            if cached is None:
+                return None
+        logger.debug("⚡ Cache hit for: '%s'", user_input)
+        return dict(cached, cached=True)
+    
+    def get_stored(self, user_input):
+        """Result rebuilt from the on-disk pattern store, for patterns that validated"""
+        if self.pattern_store is None:
+            return None
+        record = self.pattern_store.get(user_input)
+        validation = (record or {}).get("validation") or {}
+        if not validation.get("compiles") or not validation.get("passed", True):
+            return None
+        result = {
+            "success": True,
+            "regex": record["regex"],
+            "full_response": "Served from the pattern store",
+            "source": "model"
+        }
+        if record.get("model"):
+            result["model"] = record["model"]
+        return result
+    
+    def get_similar(self, user_input):
+        """Result cached for a near-duplicate prompt, tagged with what it matched"""
+        if self.semantic_cache is None:
+            return None
+        match = self.semantic_cache.lookup(user_input)
+        if match is None:
+            return None
+        value, similarity, similar_to = match
+        logger.debug("⚡ Near-duplicate of '%s' (similarity %.2f): '%s'", similar_to, similarity, user_input)
+        return dict(value, similar_to=similar_to, similarity=round(similarity, 3))
+    
+    def remember(self, user_input, result):
+        """Cache a result; only real model answers, fallbacks should be retried next time"""
+        if result.get("source") != "model":
+            return
+        if self.response_cache is not None:
+            self.response_cache.set(user_input, result)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set(user_input, result)
+        if self.pattern_store is not None:
+            report = result.get("validation")
+            if report is not None:
+                validation = {"compiles": report["checks"]["compile"] == "passed", "passed": report["passed"]}
+                if report["error"]:
+                    validation["error"] = report["error"]
+            else:
+                try:
+                    pattern_cache.compile(result["regex"])
+                    validation = {"compiles": True}
+                except re.error as e:
+                    validation = {"compiles": False, "error": str(e)}
+            try:
+                self.pattern_store.put(user_input, result["regex"], result.get("model", self.model), validation)
+            except OSError as e:
+                logger.warning("⚠️ Could not persist pattern: %s", e)
+    
+    def build_request(self, user_input, endpoint=None, feedback=None):
+        """Build the headers and JSON payload of a chat completion request.
+        
+        feedback explains why a previous answer was rejected, for a retry.
+        """
         prompt = f"""You are a regex expert. Generate a precise regular expression for the following requirement:
 
 USER REQUEST: "{user_input}"
@@ -30,95 +445,335 @@ Format your response as:
 REGEX: [your regex pattern]
 
 Focus on accuracy and practical usage."""
+        if feedback:
+            prompt += f"\n\n{feedback}\nGive a corrected regex in the same format."
 
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {endpoint.api_key if endpoint else self.api_key}",
             "Content-Type": "application/json"
         }
         
         data = {
-            "model": self.model,
+            "model": endpoint.model if endpoint else self.model,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.1,
             "max_tokens": 400
         }
-        
-        try:
-            print(f"🔑 Making API call to: {self.base_url}")
-            print(f"🔧 Request data: {json.dumps(data, indent=2)}")
-            
-            response = requests.post(self.base_url, headers=headers, json=data, timeout=30)
-            print(f"📡 API Response Status: {response.status_code}")
-            print(f"📡 Response Headers: {dict(response.headers)}")
-            
-            response.raise_for_status()
-            
-            result = response.json()
-            print(f"📄 Full API Response: {json.dumps(result, indent=2)}")
+        return headers, data
+    
+    @traced("parse_completion")
+    def parse_completion(self, result, user_input):
+        """Turn a chat completion response body into a generation result"""
+        # Handle different response formats
+        ai_response = ""
+        if 'choices' in result and len(result['choices']) > 0:
+            choice = result['choices'][0]
             
-            # Handle different response formats
-            ai_response = ""
-            if 'choices' in result and len(result['choices']) > 0:
-                choice = result['choices'][0]
-                
-                # Handle different message formats
-                if 'message' in choice and 'content' in choice['message']:
-                    ai_response = choice['message']['content']
-                elif 'text' in choice:
-                    ai_response = choice['text']
-                else:
-                    ai_response = str(choice)
-                    
-                print(f"🤖 AI Raw Response: '{ai_response}'")
-                
-                # If response is empty or None, use smart fallback
-                if not ai_response or ai_response.strip() == '':
-                    print("⚠️ Empty AI response, using smart fallback...")
-                    ai_response = "Empty response from AI"
-                    regex_pattern = self.generate_smart_fallback(user_input)
-                else:
-                    regex_pattern = self.extract_regex_from_response(ai_response)
-                
-                # If extraction still fails, use smart fallback
-                if regex_pattern == "Could not extract regex pattern":
-                    regex_pattern = self.generate_smart_fallback(user_input)
-                
-                print(f"🎯 Final Pattern: '{regex_pattern}'")
+            # Handle different message formats
+            if 'message' in choice and 'content' in choice['message']:
+                ai_response = choice['message']['content']
+            elif 'text' in choice:
+                ai_response = choice['text']
+            else:
+                ai_response = str(choice)
                 
-                return {
-                    "success": True,
-                    "regex": regex_pattern,
-                    "full_response": ai_response
-                }
+            payload_logger.debug("🤖 AI Raw Response: '%s'", ai_response)
+            
+            # If response is empty or None, use smart fallback
+            source = "model"
+            if not ai_response or ai_response.strip() == '':
+                logger.warning("⚠️ Empty AI response, using smart fallback...")
+                EXTRACTION_FAILURES.inc("empty")
+                ai_response = "Empty response from AI"
+                regex_pattern = self.generate_smart_fallback(user_input)
+                source = "fallback"
             else:
-                print("❌ No choices in API response")
-                # Use smart fallback when API fails
+                regex_pattern = self.extract_regex_from_response(ai_response)
+            
+            # If extraction still fails, use smart fallback
+            if regex_pattern == "Could not extract regex pattern":
+                EXTRACTION_FAILURES.inc("unextractable")
                 regex_pattern = self.generate_smart_fallback(user_input)
-                return {
-                    "success": True,
-                    "regex": regex_pattern,
-                    "full_response": "API returned no response, using smart fallback"
-                }
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ API Request Error: {str(e)}")
-            # Use smart fallback on API error
-            regex_pattern = self.generate_smart_fallback(user_input)
+                source = "fallback"
+            
+            logger.debug("🎯 Final Pattern: '%s'", regex_pattern)
+            
             return {
                 "success": True,
                 "regex": regex_pattern,
-                "full_response": f"API Error: {str(e)}, using smart fallback"
+                "full_response": ai_response,
+                "source": source
             }
+        
+        logger.warning("❌ No choices in API response")
+        EXTRACTION_FAILURES.inc("no_choices")
+        # Use smart fallback when API fails
+        return self.fallback_result(user_input, "API returned no response, using smart fallback")
+    
+    def deadline_result(self, user_input):
+        """Fallback served when the caller's deadline ran out first"""
+        logger.warning("⏱️ Deadline exceeded for: '%s', using smart fallback", user_input)
+        DEADLINES_EXCEEDED.inc()
+        result = self.fallback_result(user_input, "Deadline exceeded before the model answered, using smart fallback")
+        return dict(result, deadline_exceeded=True)
+    
+    def fallback_result(self, user_input, message):
+        """Generation result built from the smart fallback table"""
+        regex_pattern = self.generate_smart_fallback(user_input)
+        return {
+            "success": True,
+            "regex": regex_pattern,
+            "full_response": message,
+            "source": "fallback"
+        }
+    
+    @traced("upstream.post")
+    def post_completion(self, headers, data, endpoint=None, **kwargs):
+        """POST to the model API (or a pool endpoint), recording the upstream latency.
+        
+        Raises CircuitOpenError without touching the network while the
+        circuit breaker is open.
+        """
+        url = endpoint.url if endpoint else self.base_url
+        breaker = endpoint.circuit_breaker if endpoint else self.circuit_breaker
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("Upstream circuit is open")
+        
+        started = time.perf_counter()
+        try:
+            response = self.http_client.post(url, headers=headers, json=data, **kwargs)
+        except requests.exceptions.RequestException:
+            elapsed = time.perf_counter() - started
+            UPSTREAM_LATENCY.observe(elapsed, "error")
+            if breaker is not None:
+                breaker.record(elapsed, False)
+            raise
+        elapsed = time.perf_counter() - started
+        UPSTREAM_LATENCY.observe(elapsed, str(response.status_code))
+        success = is_upstream_success(response.status_code)
+        if breaker is not None:
+            breaker.record(elapsed, success)
+        if success and self.hedger is not None:
+            self.hedger.latency.record(elapsed)
+        tracer.current_span().set_attribute("http.status_code", response.status_code)
+        return response
+    
+    def request_completion(self, user_input, deadline=None, attempt=1, feedback=None):
+        """Ask the model (or, with a pool, the best-ranked model that answers)"""
+        if self.router is None:
+            return self.request_endpoint(user_input, None, deadline, attempt, feedback)
+        
+        last_error = None
+        for endpoint in self.router.ranked():
+            started = time.perf_counter()
+            try:
+                result = self.request_endpoint(user_input, endpoint, deadline, attempt, feedback)
+            except CircuitOpenError as e:
+                # Skipped without a call, nothing to learn from
+                last_error = e
+                continue
+            except requests.exceptions.RequestException as e:
+                self.router.record(endpoint, time.perf_counter() - started, False, str(e))
+                logger.warning("🔀 Model '%s' failed (%s), failing over", endpoint.name, e)
+                last_error = e
+                continue
+            self.router.record(endpoint, time.perf_counter() - started, True)
+            return dict(result, model=endpoint.name)
+        raise last_error
+    
+    def request_endpoint(self, user_input, endpoint=None, deadline=None, attempt=1, feedback=None):
+        """One upstream round trip for a prompt; raises on transport and HTTP errors"""
+        headers, data = self.build_request(user_input, endpoint, feedback)
+        kwargs = {}
+        remaining = remaining_seconds(deadline)
+        if remaining is not None:
+            # Never let the socket wait past the caller's deadline
+            connect_timeout, read_timeout = self.http_client.timeout
+            kwargs["timeout"] = (min(connect_timeout, remaining), min(read_timeout, remaining))
+            kwargs["deadline"] = deadline
+        
+        logger.debug("🔑 Making API call to: %s (attempt %d)", endpoint.url if endpoint else self.base_url, attempt)
+        payload_logger.debug("🔧 Request data: %s", LazyJSON(data))
+        
+        response = self.post_completion(headers, data, endpoint, **kwargs)
+        logger.debug("📡 API Response Status: %s", response.status_code)
+        payload_logger.debug("📡 Response Headers: %s", response.headers)
+        
+        response.raise_for_status()
+        
+        with tracer.span("upstream.decode_json"):
+            result = response.json()
+        payload_logger.debug("📄 Full API Response: %s", LazyJSON(result))
+        
+        return self.parse_completion(result, user_input)
+    
+    def _generate_uncached(self, user_input, deadline=None, feedback=None):
+        """Call the model for a single prompt, hedging slow attempts when a hedger is set"""
+        try:
+            if self.hedger is None:
+                return self.request_completion(user_input, deadline, feedback=feedback)
+            return self.hedger.run(
+                lambda attempt: self.request_completion(user_input, deadline, attempt, feedback),
+                deadline
+            )
+        
+        except DeadlineExceeded:
+            return self.deadline_result(user_input)
+        except CircuitOpenError:
+            logger.debug("⚡ Circuit open, skipping upstream for: '%s'", user_input)
+            return self.fallback_result(user_input, "Upstream unavailable (circuit open), using smart fallback")
+        except requests.exceptions.RequestException as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                # The clamped socket timeout fired: the deadline, not the upstream, ran out
+                return self.deadline_result(user_input)
+            logger.warning("❌ API Request Error: %s", e)
+            # Use smart fallback on API error
+            return self.fallback_result(user_input, f"API Error: {str(e)}, using smart fallback")
         except Exception as e:
-            print(f"❌ Unexpected Error: {str(e)}")
+            logger.exception("❌ Unexpected Error: %s", e)
             # Use smart fallback on any error
-            regex_pattern = self.generate_smart_fallback(user_input)
-            return {
-                "success": True,
-                "regex": regex_pattern,
-                "full_response": f"Error: {str(e)}, using smart fallback"
-            }
+            return self.fallback_result(user_input, f"Error: {str(e)}, using smart fallback")
+    
+    def _generate_checked(self, user_input, deadline=None):
+        """_generate_uncached, with model answers validated when a validator is set.
+        
+        A rejected answer is sent back to the model with the reason, up to
+        validator.retries times; see settle_validation for what is served
+        when none passes.
+        """
+        result = self._generate_uncached(user_input, deadline)
+        if self.validator is None:
+            return result
+        
+        examples = prompt_examples(user_input)
+        attempts = []
+        while result.get("source") == "model":
+            result = self.validate_result(result, examples)
+            attempts.append(result)
+            if result["validation"]["passed"] or len(attempts) > self.validator.retries:
+                break
+            logger.warning("🔁 Model regex failed validation (%s), asking again", result["validation"]["error"])
+            result = self._generate_uncached(user_input, deadline, feedback=validation_feedback(result))
+        return self.settle_validation(user_input, attempts, result)
+    
+    @traced("validate")
+    def validate_result(self, result, examples):
+        """The result with the validator's report under "validation"; examples is (positives, negatives)"""
+        report = self.validator.validate(result["regex"], *examples)
+        outcome = report["failed"] or "passed"
+        VALIDATIONS.inc(outcome)
+        VALIDATION_LATENCY.observe(report["timing_ms"]["total"] / 1000, outcome)
+        tracer.current_span().set_attribute("validation.outcome", outcome)
+        return dict(result, validation=report)
     
+    def settle_validation(self, user_input, attempts, last):
+        """What to serve after validating attempts (in order); last is the final result obtained.
+        
+        A passing attempt is served as is. Failing only the prompt's examples
+        may be a misread prompt, so the attempt that got the most of them right
+        still beats a generic pattern. An answer that does not compile or
+        backtracks catastrophically is replaced by the smart fallback, unless
+        the retry already ended in one.
+        """
+        if not attempts or attempts[-1]["validation"]["passed"]:
+            return last
+        usable = [attempt for attempt in attempts if attempt["validation"]["failed"] == "examples"]
+        if usable:
+            return max(usable, key=lambda attempt: (attempt["validation"]["examples"] or {}).get("passed", 0))
+        if last is not attempts[-1]:
+            return last
+        report = last["validation"]
+        logger.warning("❌ Model regex failed validation (%s), using smart fallback", report["error"])
+        result = self.fallback_result(user_input, f"Model regex rejected: {report['error']}, using smart fallback")
+        return dict(result, validation=report)
+    
+    def generate_regex_stream(self, user_input):
+        """Stream a generation, yielding ("progress", info) events and a final ("result", result).
+        
+        The upstream connection is closed as soon as a complete "REGEX:" line
+        has arrived, so the model's trailing output is neither waited for nor
+        billed.
+        
+        Unlike generate_regex, a stream has no deadline, is never hedged and
+        is not shared through single-flight: the client sees progress as it
+        arrives and can disconnect whenever it likes.
+        """
+        cached = self.get_cached(user_input)
+        if cached is not None:
+            yield "result", cached
+            return
+        
+        # A stream cannot fail over halfway, so it goes to the best-ranked model
+        endpoint = self.router.ranked()[0] if self.router else None
+        headers, data = self.build_request(user_input, endpoint)
+        data["stream"] = True
+        
+        text = ""
+        chunks = 0
+        early_stop = False
+        started = time.perf_counter()
+        try:
+            logger.debug("🔑 Making streaming API call to: %s", endpoint.url if endpoint else self.base_url)
+            response = self.post_completion(headers, data, endpoint, stream=True)
+            logger.debug("📡 API Response Status: %s", response.status_code)
+            response.raise_for_status()
+            
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    # SSE comments (": OPENROUTER PROCESSING") and blank separators
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    
+                    choices = json.loads(payload).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content") or ""
+                    if not delta:
+                        continue
+                    text += delta
+                    chunks += 1
+                    yield "progress", {"chunks": chunks, "chars": len(text), "delta": delta}
+                    
+                    if self.has_complete_regex_line(text):
+                        early_stop = True
+                        logger.debug("✂️ Complete REGEX line after %d chunks, closing stream", chunks)
+                        break
+            finally:
+                response.close()
+            
+            result = self.parse_completion({"choices": [{"message": {"content": text}}]}, user_input)
+            if endpoint is not None:
+                self.router.record(endpoint, time.perf_counter() - started, True)
+                result = dict(result, model=endpoint.name)
+        
+        except CircuitOpenError:
+            logger.debug("⚡ Circuit open, skipping upstream for: '%s'", user_input)
+            result = self.fallback_result(user_input, "Upstream unavailable (circuit open), using smart fallback")
+        except requests.exceptions.RequestException as e:
+            if endpoint is not None:
+                self.router.record(endpoint, time.perf_counter() - started, False, str(e))
+            logger.warning("❌ API Request Error: %s", e)
+            result = self.fallback_result(user_input, f"API Error: {str(e)}, using smart fallback")
+        except Exception as e:
+            logger.exception("❌ Unexpected Error: %s", e)
+            result = self.fallback_result(user_input, f"Error: {str(e)}, using smart fallback")
+        
+        if self.validator is not None and result.get("source") == "model":
+            # Too late to ask again mid-stream, but a broken pattern still gets replaced
+            checked = self.validate_result(result, prompt_examples(user_input))
+            result = self.settle_validation(user_input, [checked], checked)
+        
+        self.remember(user_input, result)
+        yield "result", dict(result, streamed=True, early_stop=early_stop, chunks=chunks)
+    
+    @staticmethod
+    def has_complete_regex_line(text):
+        """True once the text holds a "REGEX:" label followed by a finished line"""
+        match = REGEX_LABEL.search(text)
+        return bool(match) and "\n" in text[match.end():].lstrip()
+    
+    @traced("extract_regex")
     def extract_regex_from_response(self, response):
         """Extract regex pattern from AI response"""
         # Try to find pattern after "REGEX:" label
@@ -138,110 +793,48 @@ Focus on accuracy and practical usage."""
         
         return "Could not extract regex pattern"
     
+    @traced("fallback")
     def generate_smart_fallback(self, user_input):
         """Generate smart fallback patterns based on user input"""
         user_lower = user_input.lower()
         
-        print(f"🔍 Generating smart fallback for: '{user_input}'")
-        
-        # Enhanced pattern matching based on user input
-        smart_patterns = {
-            # Email patterns
-            'email': r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$',
-            'gmail': r'^[a-zA-Z0-9._%+-]+@gmail\.com$',
-            'yahoo': r'^[a-zA-Z0-9._%+-]+@yahoo\.com$',
-            
-            # Phone patterns
-            'phone': r'^\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}$',
-            'mobile': r'^\+?1?[0-9]{10}$',
-            'international': r'^\+[1-9]\d{1,14}$',
-            
-            # Date patterns
-            'date': r'^\d{1,2}/\d{1,2}/\d{4}$',
-            'mm/dd/yyyy': r'^(0[1-9]|1[0-2])/(0[1-9]|[12][0-9]|3[01])/\d{4}$',
-            'dd-mm-yyyy': r'^(0[1-9]|[12][0-9]|3[01])-(0[1-9]|1[0-2])-\d{4}$',
-            'yyyy-mm-dd': r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])$',
-            'iso': r'^\d{4}-\d{2}-\d{2}$',
-            
-            # Web patterns
-            'url': r'https?://(?:[-\w.])+(?:[:\d]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.]*))?(?:#(?:\w*))?)?',
-            'http': r'https?://[^\s]+',
-            'domain': r'^[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9]\.[a-zA-Z]{2,}$',
-            'ip': r'^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$',
-            'ipv4': r'^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$',
-            
-            # Text patterns
-            'word': r'^[a-zA-Z]+$',
-            'capital': r'^[A-Z][a-z]*$',
-            'uppercase': r'^[A-Z]+$',
-            'lowercase': r'^[a-z]+$',
-            'alphanumeric': r'^[a-zA-Z0-9]+$',
-            'hashtag': r'#[a-zA-Z0-9_]+',
-            'mention': r'@[a-zA-Z0-9_]+',
-            
-            # Number patterns
-            'number': r'^\d+$',
-            'integer': r'^-?\d+$',
-            'decimal': r'^\d+\.\d+$',
-            'float': r'^-?\d+\.?\d*$',
-            'currency': r'^\$?\d{1,3}(,\d{3})*(\.\d{2})?$',
-            
-            # Finance patterns
-            'credit card': r'^\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}$',
-            'creditcard': r'^\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}$',
-            'ssn': r'^\d{3}-\d{2}-\d{4}$',
-            'social security': r'^\d{3}-\d{2}-\d{4}$',
-            'zip': r'^\d{5}(-\d{4})?$',
-            'zipcode': r'^\d{5}(-\d{4})?$',
-            'postal': r'^[A-Z]\d[A-Z]\s?\d[A-Z]\d$',
-            
-            # Security patterns
-            'password': r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$',
-            'strong password': r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&])[A-Za-z\d@$!%*?&]{8,}$',
-            'uuid': r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-            'api key': r'^[A-Za-z0-9]{32}$',
-            'hex': r'^[0-9a-fA-F]+$',
-            'hexadecimal': r'^#?[0-9a-fA-F]{6}$',
-            
-            # Time patterns
-            'time': r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$',
-            '24hour': r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$',
-            '12hour': r'^(0?[1-9]|1[0-2]):[0-5][0-9]\s?(AM|PM)$',
-        }
-        
-        # Check for exact matches first
-        for keyword, pattern in smart_patterns.items():
-            if keyword in user_lower:
-                print(f"✅ Found smart fallback pattern for '{keyword}': {pattern}")
-                return pattern
+        logger.debug("🔍 Generating smart fallback for: '%s'", user_input)
         
-        # Check for partial matches (more flexible)
-        for keyword, pattern in smart_patterns.items():
-            if any(word in user_lower for word in keyword.split()):
-                print(f"✅ Found partial match for '{keyword}': {pattern}")
-                return pattern
+        # Exact keyword matches win over partial (single word) matches
+        keyword, exact = match_fallback_keyword(user_lower)
+        if keyword is not None:
+            pattern = SMART_PATTERNS[keyword]
+            if exact:
+                logger.debug("✅ Found smart fallback pattern for '%s': %s", keyword, pattern)
+            else:
+                logger.debug("✅ Found partial match for '%s': %s", keyword, pattern)
+            record_fallback(keyword)
+            return pattern
         
         # If no specific pattern found, try to infer from context
         if 'match' in user_lower:
             if 'waqas@gmail.com' in user_lower or '@gmail.com' in user_lower:
-                print("✅ Detected email context from example")
-                return smart_patterns['email']
+                logger.debug("✅ Detected email context from example")
+                record_fallback("email_context")
+                return SMART_PATTERNS['email']
             elif any(char in user_lower for char in ['@', '.com', '.org', '.net']):
-                print("✅ Detected email context from symbols")
-                return smart_patterns['email']
+                logger.debug("✅ Detected email context from symbols")
+                record_fallback("email_context")
+                return SMART_PATTERNS['email']
         
         # Ultimate fallback - a very permissive pattern
-        print("⚠️ Using ultimate fallback pattern")
+        logger.debug("⚠️ Using ultimate fallback pattern")
+        record_fallback("none")
         return r'.+'
     
-    def test_regex(self, pattern, test_string):
-        """Test regex pattern against a string"""
+    def test_regex(self, pattern, test_string, mode='all'):
+        """Test regex pattern against a string; mode is one of TEST_MODES"""
         try:
-            matches = re.findall(pattern, test_string)
+            matches, match_count = re_mode(mode, pattern_cache.compile(pattern), test_string)
             return {
                 "success": True,
                 "matches": matches,
-                "match_count": len(matches),
+                "match_count": match_count,
                 "is_valid": True
             }
         except re.error as e:
@@ -253,14 +846,336 @@ Focus on accuracy and practical usage."""
                 "is_valid": False
             }
 
+def build_response_cache():
+    """Create the prompt -> regex cache selected by RESPONSE_CACHE_BACKEND"""
+    backend = os.getenv('RESPONSE_CACHE_BACKEND', 'memory').lower()
+    max_entries = int(os.getenv('RESPONSE_CACHE_SIZE', 1000))
+    ttl = int(os.getenv('RESPONSE_CACHE_TTL', 86400))
+    
+    if backend == 'off':
+        return None
+    if backend == 'disk':
+        path = os.getenv('RESPONSE_CACHE_PATH', 'response_cache.sqlite3')
+        return ResponseCache(DiskStore(path, max_entries), ttl)
+    return ResponseCache(MemoryStore(max_entries), ttl)
+
+response_cache = build_response_cache()
+
+def build_semantic_cache():
+    """Near-duplicate prompt cache, only with SEMANTIC_CACHE=true"""
+    if os.getenv('SEMANTIC_CACHE', 'False').lower() != 'true':
+        return None
+    return SemanticCache(
+        threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.8)),
+        max_entries=int(os.getenv('SEMANTIC_CACHE_SIZE', 10000))
+    )
+
+# Limits for /api/generate/batch
+BATCH_MAX_PROMPTS = int(os.getenv('BATCH_MAX_PROMPTS', 1000))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', 8))
+
+# Limits for /api/test/batch; matrices above TEST_BATCH_PARALLEL_CELLS use a process pool
+TEST_BATCH_MAX_CELLS = int(os.getenv('TEST_BATCH_MAX_CELLS', 1000000))
+TEST_BATCH_PARALLEL_CELLS = int(os.getenv('TEST_BATCH_PARALLEL_CELLS', 20000))
+TEST_BATCH_WORKERS = int(os.getenv('TEST_BATCH_WORKERS', os.cpu_count() or 1))
+TEST_BATCH_OUTPUTS = ('counts', 'booleans', 'matches')
+# Patterns find_redos_risks flags are matched in the guarded matcher: this much per cell, and per request
+TEST_BATCH_CELL_TIMEOUT_MS = int(os.getenv('TEST_BATCH_CELL_TIMEOUT_MS', 50))
+TEST_BATCH_GUARDED_BUDGET_MS = int(os.getenv('TEST_BATCH_GUARDED_BUDGET_MS', 10000))
+# Whole-request budget, unless the client sends a shorter deadline
+TEST_BATCH_TIMEOUT_MS = int(os.getenv('TEST_BATCH_TIMEOUT_MS', 30000))
+test_batch_pool = None
+
+# /api/scan reads the body in SCAN_CHUNK_BYTES pieces and holds back the last
+# window characters of each (SCAN_MATCH_WINDOW unless the pattern is bounded)
+SCAN_CHUNK_BYTES = int(os.getenv('SCAN_CHUNK_BYTES', 1024 * 1024))
+SCAN_MATCH_WINDOW = int(os.getenv('SCAN_MATCH_WINDOW', 4096))
+SCAN_MAX_MATCH_WINDOW = int(os.getenv('SCAN_MAX_MATCH_WINDOW', 1024 * 1024))
+
+# /api/bench: synthetic corpus size and run limits (corpus generation runs in the guarded matcher too)
+BENCH_DEFAULT_SIZE = int(os.getenv('BENCH_DEFAULT_SIZE', 256 * 1024))
+BENCH_MAX_SIZE = int(os.getenv('BENCH_MAX_SIZE', 8 * 1024 * 1024))
+BENCH_MAX_LENGTH = int(os.getenv('BENCH_MAX_LENGTH', 10000))
+BENCH_MAX_REPEAT = int(os.getenv('BENCH_MAX_REPEAT', 10))
+BENCH_TIMEOUT_MS = int(os.getenv('BENCH_TIMEOUT_MS', 10000))
+BENCH_MAX_TIMEOUT_MS = int(os.getenv('BENCH_MAX_TIMEOUT_MS', 60000))
+# Benchmarks hold a worker for seconds, so they get their own, or they would starve /api/test
+bench_matcher = GuardedMatcher(
+    max_workers=int(os.getenv('BENCH_WORKERS', 1)),
+    default_timeout=BENCH_TIMEOUT_MS / 1000
+)
+
+def guarded_row(pattern, strings, output, timeout_ms):
+    """(row, error): match_rows' row for one pattern, from the guarded matcher"""
+    outcome = guarded_matcher.row(pattern, strings, output, timeout_ms / 1000)
+    if outcome["status"] == "ok":
+        return outcome["row"], None
+    if outcome["status"] == "timeout":
+        return None, f"Match exceeded time budget of {timeout_ms} ms"
+    return None, outcome["error"]
+
+def match_rows(patterns, strings, output, deadline=None):
+    """Match every pattern against every string, compiling each pattern once.
+    
+    Patterns find_redos_risks flags run in the guarded matcher, allowed
+    TEST_BATCH_CELL_TIMEOUT_MS per string, and all of them together
+    TEST_BATCH_GUARDED_BUDGET_MS (or less, if the request deadline comes
+    first). Returns (rows, errors) where rows[i] is None for an invalid
+    pattern or one that ran out of time, and errors[i] says why.
+    """
+    rows = []
+    errors = {}
+    guarded_deadline = time.monotonic() + TEST_BATCH_GUARDED_BUDGET_MS / 1000
+    if deadline is not None:
+        guarded_deadline = min(guarded_deadline, deadline)
+    for i, pattern in enumerate(patterns):
+        try:
+            compiled = pattern_cache.compile(pattern)
+        except re.error as e:
+            rows.append(None)
+            errors[i] = f"Invalid regex: {str(e)}"
+            continue
+        
+        if find_redos_risks(pattern):
+            remaining_ms = int((guarded_deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                rows.append(None)
+                errors[i] = f"Not run: risky patterns used up the batch's {TEST_BATCH_GUARDED_BUDGET_MS} ms"
+                continue
+            row, error = guarded_row(pattern, strings, output,
+                                     min(TEST_BATCH_CELL_TIMEOUT_MS * max(1, len(strings)), remaining_ms))
+            rows.append(row)
+            if error:
+                errors[i] = error
+            continue
+        
+        rows.append(batch_row(output, compiled, strings))
+    return rows, errors
+
+def match_matrix(patterns, strings, output, deadline=None):
+    """match_rows, spread over a process pool when the matrix is large.
+    
+    Pool chunks still running at ``deadline`` (a time.monotonic() value)
+    come back as errors, and the pool is replaced so its busy workers do
+    not hold up later requests.
+    """
+    workers = min(TEST_BATCH_WORKERS, len(patterns))
+    if len(patterns) * len(strings) < TEST_BATCH_PARALLEL_CELLS or workers < 2:
+        return match_rows(patterns, strings, output, deadline)
+    
+    global test_batch_pool
+    if test_batch_pool is None:
+        # spawn, like the guarded matcher: forking a process that runs
+        # request threads can copy a lock some other thread is holding
+        test_batch_pool = ProcessPoolExecutor(max_workers=TEST_BATCH_WORKERS,
+                                              mp_context=multiprocessing.get_context("spawn"))
+    
+    # Pool workers cannot be stopped mid-match, so flagged patterns stay here
+    # (and go to the guarded matcher); one chunk of the rest per worker, so
+    # the strings are shipped once per worker
+    risky, pooled = [], []
+    for i, pattern in enumerate(patterns):
+        (risky if find_redos_risks(pattern) else pooled).append(i)
+    chunk_size = max(1, -(-len(pooled) // workers))
+    chunks = [pooled[i:i + chunk_size] for i in range(0, len(pooled), chunk_size)]
+    futures = [test_batch_pool.submit(match_rows, [patterns[i] for i in chunk], strings, output) for chunk in chunks]
+    
+    rows = [None] * len(patterns)
+    errors = {}
+    results = [(risky, match_rows([patterns[i] for i in risky], strings, output, deadline))]
+    timed_out = False
+    for chunk, future in zip(chunks, futures):
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            results.append((chunk, future.result(timeout=timeout)))
+        except FutureTimeoutError:
+            timed_out = True
+            future.cancel()
+            errors.update({index: "Not run: the batch exceeded its time budget" for index in chunk})
+    if timed_out:
+        logger.warning("⏱️ Batch test pool chunks missed the deadline; starting a new pool")
+        test_batch_pool.shutdown(wait=False, cancel_futures=True)
+        test_batch_pool = None
+    for indices, (chunk_rows, chunk_errors) in results:
+        for index, row in zip(indices, chunk_rows):
+            rows[index] = row
+        errors.update({indices[i]: error for i, error in chunk_errors.items()})
+    return rows, errors
+
+def build_http_client():
+    """Create the pooled keep-alive client used for OpenRouter calls"""
+    return PooledHTTPClient(
+        pool_size=int(os.getenv('OPENROUTER_POOL_SIZE', 10)),
+        retries=int(os.getenv('OPENROUTER_RETRIES', 2)),
+        backoff_factor=float(os.getenv('OPENROUTER_BACKOFF', 0.5)),
+        connect_timeout=float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', 5)),
+        read_timeout=float(os.getenv('OPENROUTER_READ_TIMEOUT', 30))
+    )
+
+def build_circuit_breaker():
+    """Circuit breaker around the model API, unless CIRCUIT_BREAKER=false"""
+    if os.getenv('CIRCUIT_BREAKER', 'True').lower() != 'true':
+        return None
+    return CircuitBreaker(
+        window_seconds=int(os.getenv('CIRCUIT_WINDOW_SECONDS', 30)),
+        min_calls=int(os.getenv('CIRCUIT_MIN_CALLS', 10)),
+        failure_rate=float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5)),
+        slow_call_rate=float(os.getenv('CIRCUIT_SLOW_CALL_RATE', 0.5)),
+        slow_call_seconds=float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', 10)),
+        open_seconds=float(os.getenv('CIRCUIT_OPEN_SECONDS', 30)),
+        half_open_probes=int(os.getenv('CIRCUIT_HALF_OPEN_PROBES', 3))
+    )
+
+def build_hedger():
+    """Hedged upstream requests, only with HEDGING=true (a hedge is a second paid upstream call)"""
+    if os.getenv('HEDGING', 'False').lower() != 'true':
+        return None
+    return Hedger(
+        max_workers=int(os.getenv('HEDGE_WORKERS', 32)),
+        max_attempts=int(os.getenv('HEDGE_MAX_ATTEMPTS', 2)),
+        percentile=float(os.getenv('HEDGE_PERCENTILE', 95)),
+        default_delay=float(os.getenv('HEDGE_DEFAULT_DELAY_MS', 5000)) / 1000
+    )
+
+# Upper bound for client-supplied deadlines
+MAX_DEADLINE_MS = int(os.getenv('MAX_DEADLINE_MS', 120000))
+
+def request_deadline(header_value, body_value):
+    """Absolute time.monotonic() deadline from X-Request-Deadline-Ms or a deadline_ms body field.
+    
+    Both are a budget in milliseconds from now; the header wins. Returns
+    None when neither is given and raises ValueError for invalid values.
+    """
+    value = header_value if header_value not in (None, '') else body_value
+    if value is None:
+        return None
+    try:
+        deadline_ms = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("'deadline_ms' must be a number of milliseconds")
+    if deadline_ms <= 0:
+        raise ValueError("'deadline_ms' must be positive")
+    return time.monotonic() + min(deadline_ms, MAX_DEADLINE_MS) / 1000
+
+def build_model_router():
+    """Router over the MODEL_POOL endpoints, or None to use the single default model"""
+    spec = os.getenv('MODEL_POOL')
+    if not spec:
+        return None
+    endpoints = load_model_pool(spec, default_api_key=API_KEY, breaker_factory=build_circuit_breaker)
+    logger.info("🔀 Model pool: %s", ", ".join(endpoint.name for endpoint in endpoints))
+    return ModelRouter(
+        endpoints,
+        alpha=float(os.getenv('MODEL_ROUTER_ALPHA', 0.2)),
+        failure_penalty=float(os.getenv('MODEL_ROUTER_FAILURE_PENALTY', 10)),
+        explore=float(os.getenv('MODEL_ROUTER_EXPLORE', 0.05)),
+        recovery_half_life=float(os.getenv('MODEL_ROUTER_RECOVERY_SECONDS', 30))
+    )
+
+def build_single_flight():
+    """Coalescing of identical in-flight prompts, unless SINGLE_FLIGHT=false.
+    
+    SINGLE_FLIGHT_LOCK_DIR extends it across gunicorn workers.
+    """
+    if os.getenv('SINGLE_FLIGHT', 'True').lower() != 'true':
+        return None
+    return SingleFlight(
+        lock_dir=os.getenv('SINGLE_FLIGHT_LOCK_DIR') or None,
+        wait_timeout=float(os.getenv('SINGLE_FLIGHT_WAIT_SECONDS', 60)),
+        result_ttl=float(os.getenv('SINGLE_FLIGHT_RESULT_TTL', 5))
+    )
+
+def build_validator():
+    """Compile, backtracking and prompt-example checks on model patterns, unless VALIDATION=false"""
+    if os.getenv('VALIDATION', 'True').lower() != 'true':
+        return None
+    return RegexValidator(
+        guarded_matcher,
+        compiler=pattern_cache.compile,
+        fuzz_budget=int(os.getenv('VALIDATION_FUZZ_MS', 250)) / 1000,
+        example_budget=int(os.getenv('VALIDATION_EXAMPLES_MS', 100)) / 1000,
+        retries=int(os.getenv('VALIDATION_RETRIES', 1))
+    )
+
+def build_pattern_store():
+    """On-disk history of generated patterns in PATTERN_STORE_PATH, if set"""
+    path = os.getenv('PATTERN_STORE_PATH')
+    if not path:
+        return None
+    return PatternStore(
+        path,
+        compact_ratio=float(os.getenv('PATTERN_STORE_COMPACT_RATIO', 2.0)),
+        compact_min_records=int(os.getenv('PATTERN_STORE_COMPACT_MIN_RECORDS', 1000))
+    )
+
 # Initialize generator with API key from environment
 API_KEY = os.getenv('DEEPSEEK_API_KEY')
 if not API_KEY:
-    print("⚠️  Warning: DEEPSEEK_API_KEY environment variable not set")
+    logger.warning("⚠️  Warning: DEEPSEEK_API_KEY environment variable not set")
     generator = None
 else:
-    generator = SmartRegexGenerator(API_KEY)
-    print("✅ Smart Regex Generator initialized")
+    router = build_model_router()
+    generator = SmartRegexGenerator(
+        API_KEY,
+        response_cache=response_cache,
+        http_client=build_http_client(),
+        # With a pool every endpoint gets its own breaker
+        circuit_breaker=None if router else build_circuit_breaker(),
+        hedger=build_hedger(),
+        router=router,
+        pattern_store=build_pattern_store(),
+        semantic_cache=build_semantic_cache(),
+        single_flight=build_single_flight(),
+        validator=build_validator()
+    )
+    logger.info("✅ Smart Regex Generator initialized")
+
+# Optionally precompile the smart fallback table so first requests hit the cache
+if os.getenv('PATTERN_CACHE_WARM', 'False').lower() == 'true':
+    warmed = pattern_cache.warm(SMART_PATTERNS.values())
+    logger.info("🔥 Warmed pattern cache with %d patterns", warmed)
+
+def cache_lookup_samples():
+    """Hit/miss totals the caches already keep, exported at scrape time"""
+    caches = [("pattern", pattern_cache), ("linear", linear_cache), ("optimization", optimization_cache)]
+    if response_cache is not None:
+        caches.append(("response", response_cache))
+    if generator is not None and generator.semantic_cache is not None:
+        caches.append(("semantic", generator.semantic_cache))
+    for name, cache in caches:
+        stats = cache.stats()
+        yield CACHE_LOOKUPS.name, (name, "hit"), stats["hits"]
+        yield CACHE_LOOKUPS.name, (name, "miss"), stats["misses"]
+
+metrics.register_collector(cache_lookup_samples)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    span = tracer.start_trace(f"{request.method} {route}", traceparent=request.headers.get('traceparent'))
+    g.trace_span = span.__enter__()
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    span = g.pop('trace_span', None)
+    if span is not None:
+        span.__exit__(type(error) if error else None, error, None)
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Label by route template, not raw path, to keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route, request.method, response.status_code)
+    tracer.current_span().set_attribute("http.status_code", response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/', methods=['GET'])
 def health_check():
@@ -270,14 +1185,73 @@ def health_check():
         "service": "Smart AI Regex Generator",
         "powered_by": "DeepSeek R1",
         "timestamp": datetime.now().isoformat(),
+        "pattern_cache": pattern_cache.stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "http_pool": generator.http_client.stats() if generator else None,
+        "circuit_breaker": generator.circuit_breaker.stats() if generator and generator.circuit_breaker else None,
+        "hedging": generator.hedger.stats() if generator and generator.hedger else None,
+        "models": generator.router.stats() if generator and generator.router else None,
+        "pattern_store": generator.pattern_store.stats() if generator and generator.pattern_store else None,
+        "semantic_cache": generator.semantic_cache.stats() if generator and generator.semantic_cache else None,
+        "single_flight": generator.single_flight.stats() if generator and generator.single_flight else None,
+        "validation": generator.validator.stats() if generator and generator.validator else None,
+        "guarded_matcher": guarded_matcher.stats(),
+        "bench_matcher": bench_matcher.stats(),
+        "linear_cache": linear_cache.stats(),
+        "optimization_cache": optimization_cache.stats(),
         "endpoints": {
             "generate": "/api/generate (POST)",
+            "generate_stream": "/api/generate/stream (GET/POST, Server-Sent Events)",
+            "generate_batch": "/api/generate/batch (POST, NDJSON stream)",
             "test": "/api/test (POST)",
+            "test_batch": "/api/test/batch (POST)",
+            "scan": "/api/scan?regex=... (POST raw body, NDJSON stream)",
+            "bench": "/api/bench (POST, matches/sec on a generated corpus)",
             "examples": "/api/examples (GET)",
+            "metrics": "/metrics (GET, Prometheus text format)",
             "health": "/ (GET)"
         }
     })
 
+def generate_response_data(user_prompt, result):
+    """Response body for one generated prompt"""
+    # Frontend expects these exact fields
+    response_data = {
+        "success": result["success"],
+        "prompt": user_prompt,
+        "regex": result["regex"],
+        "full_response": result.get("full_response", ""),
+        "cached": result.get("cached", False),
+        "deadline_exceeded": result.get("deadline_exceeded", False),
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    # Which pool model answered, when MODEL_POOL is configured
+    if "model" in result:
+        response_data["model"] = result["model"]
+    
+    # Served for a near-duplicate of an earlier prompt
+    if "similar_to" in result:
+        response_data["similar_to"] = result["similar_to"]
+        response_data["similarity"] = result["similarity"]
+    
+    # Why a model pattern was accepted, or what it failed and how long checking took
+    if "validation" in result:
+        response_data["validation"] = result["validation"]
+    
+    # Same matches without the padding models add; the original stays in "regex"
+    if result["success"]:
+        optimization = optimization_cache.compile(result["regex"])
+        response_data["optimized_regex"] = optimization.regex
+        response_data["optimizations"] = {
+            "rewrites": optimization.rewrites,
+            "notes": optimization.notes
+        }
+    
+    if not result["success"]:
+        response_data["error"] = result["error"]
+    return response_data
+
 @app.route('/api/generate', methods=['POST'])
 def generate_regex():
     """Generate regex from user input"""
@@ -304,37 +1278,176 @@ def generate_regex():
                 "error": "Prompt cannot be empty"
             }), 400
         
-        print(f"📝 Generating regex for: '{user_prompt}'")
+        try:
+            deadline = request_deadline(request.headers.get('X-Request-Deadline-Ms'), data.get('deadline_ms'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        logger.info("📝 Generating regex for: '%s'", user_prompt)
         
         # Generate regex
-        result = generator.generate_regex(user_prompt)
+        result = generator.generate_regex(user_prompt, deadline=deadline)
         
-        # Frontend expects these exact fields
-        response_data = {
-            "success": result["success"],
-            "prompt": user_prompt,
-            "regex": result["regex"],
-            "full_response": result.get("full_response", ""),
-            "timestamp": datetime.now().isoformat()
-        }
+        response_data = generate_response_data(user_prompt, result)
         
         if not result["success"]:
-            response_data["error"] = result["error"]
-            print(f"❌ Generation failed: {result['error']}")
+            logger.error("❌ Generation failed: %s", result['error'])
             return jsonify(response_data), 500
         
-        print(f"✅ Generated regex: {result['regex']}")
+        logger.info("✅ Generated regex: %s", result['regex'])
         return jsonify(response_data)
         
     except Exception as e:
         error_msg = f"Server error: {str(e)}"
-        print(f"💥 Server error: {error_msg}")
+        logger.exception("💥 Server error: %s", error_msg)
         return jsonify({
             "success": False,
             "error": error_msg,
             "timestamp": datetime.now().isoformat()
         }), 500
 
+def sse_event(event, payload):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/generate/stream', methods=['GET', 'POST'])
+def generate_regex_stream():
+    """Generate regex, pushing progress and the final pattern as Server-Sent Events"""
+    if not generator:
+        return jsonify({
+            "success": False,
+            "error": "API key not configured. Please set DEEPSEEK_API_KEY environment variable."
+        }), 500
+    
+    # EventSource can only GET, so the prompt may come from the query string
+    if request.method == 'GET':
+        user_prompt = request.args.get('prompt', '')
+    else:
+        data = request.get_json(silent=True) or {}
+        user_prompt = data.get('prompt', '')
+    
+    if not isinstance(user_prompt, str) or not user_prompt.strip():
+        return jsonify({
+            "success": False,
+            "error": "Missing 'prompt' in request"
+        }), 400
+    
+    user_prompt = user_prompt.strip()
+    logger.info("📝 Streaming regex for: '%s'", user_prompt)
+    
+    def stream():
+        try:
+            for event, payload in generator.generate_regex_stream(user_prompt):
+                if event == "result":
+                    response_data = generate_response_data(user_prompt, payload)
+                    response_data["early_stop"] = payload.get("early_stop", False)
+                    yield sse_event("result", response_data)
+                else:
+                    yield sse_event(event, payload)
+        except Exception as e:
+            logger.exception("💥 Stream error: %s", e)
+            yield sse_event("error", {"success": False, "error": f"Server error: {str(e)}"})
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/generate/batch', methods=['POST'])
+def generate_regex_batch():
+    """Generate regexes for many prompts, streaming NDJSON results as they finish"""
+    if not generator:
+        return jsonify({
+            "success": False,
+            "error": "API key not configured. Please set DEEPSEEK_API_KEY environment variable."
+        }), 500
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('prompts'), list):
+        return jsonify({
+            "success": False,
+            "error": "Missing 'prompts' list in request body"
+        }), 400
+    
+    prompts = data['prompts']
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        return jsonify({
+            "success": False,
+            "error": f"Too many prompts: {len(prompts)} (limit {BATCH_MAX_PROMPTS})"
+        }), 400
+    
+    concurrency = BATCH_MAX_CONCURRENCY
+    if 'concurrency' in data:
+        try:
+            concurrency = max(1, min(int(data['concurrency']), BATCH_MAX_CONCURRENCY))
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "'concurrency' must be an integer"
+            }), 400
+    
+    # Deduplicate on the normalized prompt, remembering every original position
+    unique = {}
+    invalid = []
+    for index, prompt in enumerate(prompts):
+        if not isinstance(prompt, str) or not prompt.strip():
+            invalid.append((index, prompt if isinstance(prompt, str) else ""))
+            continue
+        key = normalize_prompt(prompt)
+        if key in unique:
+            unique[key]["indices"].append(index)
+        else:
+            unique[key] = {"prompt": prompt.strip(), "indices": [index]}
+    
+    logger.info("📦 Batch of %d prompts, %d unique, concurrency %d", len(prompts), len(unique), concurrency)
+    
+    def item_line(item, result):
+        response_data = generate_response_data(item["prompt"], result)
+        response_data["indices"] = item["indices"]
+        return json.dumps(response_data) + "\n"
+    
+    def stream():
+        # Same shape as every other line, so clients can read them all alike
+        for index, prompt in invalid:
+            item = {"prompt": prompt, "indices": [index]}
+            yield item_line(item, {"success": False, "regex": "", "error": "Prompt cannot be empty"})
+        
+        # Cached prompts are answered before any upstream call is made
+        pending = []
+        for item in unique.values():
+            cached = generator.get_cached(item["prompt"])
+            if cached is not None:
+                yield item_line(item, cached)
+            else:
+                pending.append(item)
+        
+        if not pending:
+            return
+        
+        # Not a with-block: a client that disconnects closes this generator, and
+        # waiting there for every queued prompt would keep paying for upstream calls
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, len(pending)))
+        try:
+            futures = {
+                executor.submit(generator.generate_regex, item["prompt"]): item
+                for item in pending
+            }
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "regex": "", "error": f"Server error: {str(e)}"}
+                yield item_line(item, result)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
 @app.route('/api/test', methods=['POST'])
 def test_regex():
     """Test regex pattern against test string"""
@@ -356,18 +1469,141 @@ def test_regex():
                 "error": "Regex pattern cannot be empty"
             }), 400
         
-        print(f"🧪 Testing regex: '{regex_pattern}' against: '{test_string[:50]}...'")
+        logger.debug("🧪 Testing regex: '%s' against: '%.50s...'", regex_pattern, test_string)
+        
+        # Patterns with catastrophic-backtracking shapes are always guarded
+        redos_warnings = find_redos_risks(regex_pattern)
+        explicit_guard = 'guarded' in data
+        requested_guard = data.get('guarded', GUARDED_MATCHING)
+        if not isinstance(requested_guard, bool):
+            return jsonify({
+                "success": False,
+                "error": "'guarded' must be true or false"
+            }), 400
+        guarded = requested_guard or bool(redos_warnings)
+        # Why an explicit 'guarded' was not followed, reported in the response
+        guard_override = None
+        if explicit_guard and guarded != requested_guard:
+            guard_override = "Pattern has catastrophic backtracking risks, so it is always guarded"
+        
+        try:
+            timeout_ms = min(int(data.get('timeout_ms', GUARDED_TIMEOUT_MS)), GUARDED_MAX_TIMEOUT_MS)
+        except (TypeError, ValueError):
+            timeout_ms = 0
+        if timeout_ms <= 0:
+            return jsonify({
+                "success": False,
+                "error": "'timeout_ms' must be a positive integer"
+            }), 400
+        
+        engine_choice = data.get('engine', MATCH_ENGINE)
+        if engine_choice not in MATCH_ENGINES:
+            return jsonify({
+                "success": False,
+                "error": f"'engine' must be one of: {', '.join(MATCH_ENGINES)}"
+            }), 400
+        
+        output_format = data.get('format', 'matches')
+        encoding = data.get('encoding', 'delta')
+        if output_format not in TEST_FORMATS or encoding not in COLUMNAR_ENCODINGS:
+            return jsonify({
+                "success": False,
+                "error": f"'format' must be one of: {', '.join(TEST_FORMATS)}; "
+                         f"'encoding' one of: {', '.join(COLUMNAR_ENCODINGS)}"
+            }), 400
+        
+        # count, exists and first skip building (and sending) the full match list
+        mode = data.get('mode', 'all')
+        if mode not in TEST_MODES:
+            return jsonify({
+                "success": False,
+                "error": f"'mode' must be one of: {', '.join(TEST_MODES)}"
+            }), 400
+        if output_format == 'columnar' and mode != 'all':
+            return jsonify({
+                "success": False,
+                "error": "The columnar format only supports mode 'all'"
+            }), 400
+        
+        # Paging over matches, for the columnar format
+        try:
+            offset = int(data.get('offset', 0))
+            limit = int(data['limit']) if data.get('limit') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "'offset' and 'limit' must be integers"
+            }), 400
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({
+                "success": False,
+                "error": "'offset' and 'limit' cannot be negative"
+            }), 400
+        if output_format != 'columnar' and (offset or limit is not None):
+            # Silently ignoring them would look like a page of a longer list
+            return jsonify({
+                "success": False,
+                "error": "'offset' and 'limit' only apply to the columnar format"
+            }), 400
+        
+        # Patterns without backreferences or lookarounds can run in linear time
+        linear = None
+        if engine_choice != 're':
+            try:
+                linear = linear_cache.compile(regex_pattern)
+            except UnsupportedPattern as e:
+                if engine_choice == 'linear':
+                    return jsonify({
+                        "success": False,
+                        "error": f"Pattern not supported by the linear engine: {str(e)}"
+                    }), 400
+            except re.error:
+                pass  # reported by the regular path below
+            if engine_choice == 'auto' and linear is not None:
+                if linear.engine != 're2' and not redos_warnings:
+                    linear = None  # the pure-Python VM only pays off on risky patterns
+        
+        engine = 're'
+        if linear is not None:
+            engine = linear.engine
+            if engine == 're2':
+                # Native and linear: a worker process would only add overhead
+                guarded = False
+                guard_override = ("re2 runs natively in linear time and is never guarded"
+                                  if explicit_guard and requested_guard else None)
+            else:
+                # The pure-Python VM cannot backtrack either, but at len(program) x
+                # len(test_string) steps it gets the same budget unless the client opts out
+                guarded = requested_guard if explicit_guard else True
+                guard_override = None
         
-        if generator:
-            result = generator.test_regex(regex_pattern, test_string)
+        if output_format == 'columnar':
+            if redos_warnings and linear is None:
+                logger.warning("⚠️ ReDoS risk in '%s': %s", regex_pattern, redos_warnings)
+            result = columnar_test_regex(regex_pattern, test_string, linear, guarded, timeout_ms,
+                                         encoding, offset, limit)
+        elif linear is not None and not guarded:
+            matches, match_count = linear_mode(mode, linear, test_string)
+            result = {
+                "success": True,
+                "matches": matches,
+                "match_count": match_count,
+                "is_valid": True
+            }
+        elif guarded:
+            if redos_warnings and linear is None:
+                logger.warning("⚠️ ReDoS risk in '%s': %s", regex_pattern, redos_warnings)
+            result = guarded_test_regex(regex_pattern, test_string, timeout_ms, mode, engine)
+        elif generator:
+            result = generator.test_regex(regex_pattern, test_string, mode)
         else:
             # Fallback testing without generator
             try:
-                matches = re.findall(regex_pattern, test_string)
+                matches, match_count = re_mode(mode, pattern_cache.compile(regex_pattern), test_string)
                 result = {
                     "success": True,
                     "matches": matches,
-                    "match_count": len(matches),
+                    "match_count": match_count,
                     "is_valid": True
                 }
             except re.error as e:
@@ -387,26 +1623,273 @@ def test_regex():
             "matches": result.get("matches", []),
             "match_count": result.get("match_count", 0),
             "is_valid": result.get("is_valid", False),
+            "status": result.get("status", "ok" if result["success"] else "error"),
+            "mode": mode,
+            "engine": engine,
+            "guarded": guarded,
+            "redos_warnings": redos_warnings,
             "timestamp": datetime.now().isoformat()
         }
         
+        if "columns" in result:
+            response_data["columns"] = result["columns"]
+        
+        if guard_override:
+            response_data["guard_override"] = guard_override
+        
+        # count / exists / first exist to keep responses small; echoing a large input would undo that
+        if mode != 'all':
+            del response_data["test_string"]
+        
         if not result["success"]:
             response_data["error"] = result["error"]
-            print(f"❌ Test failed: {result['error']}")
+            logger.info("❌ Test failed: %s", result['error'])
         else:
-            print(f"✅ Test successful: {result['match_count']} matches found")
+            logger.debug("✅ Test successful: %d matches found", result['match_count'])
         
         return jsonify(response_data)
         
     except Exception as e:
         error_msg = f"Server error: {str(e)}"
-        print(f"💥 Test error: {error_msg}")
+        logger.exception("💥 Test error: %s", error_msg)
+        return jsonify({
+            "success": False,
+            "error": error_msg,
+            "timestamp": datetime.now().isoformat()
+        }), 500
+
+@app.route('/api/test/batch', methods=['POST'])
+def test_regex_batch():
+    """Test N patterns against M strings and return a patterns x strings matrix"""
+    try:
+        data = request.get_json(silent=True)
+        
+        if (not data
+                or not isinstance(data.get('patterns'), list)
+                or not isinstance(data.get('strings'), list)):
+            return jsonify({
+                "success": False,
+                "error": "Missing 'patterns' or 'strings' list in request body"
+            }), 400
+        
+        patterns = data['patterns']
+        strings = data['strings']
+        output = data.get('output', 'counts')
+        
+        if output not in TEST_BATCH_OUTPUTS:
+            return jsonify({
+                "success": False,
+                "error": f"'output' must be one of: {', '.join(TEST_BATCH_OUTPUTS)}"
+            }), 400
+        
+        if not all(isinstance(p, str) for p in patterns) or not all(isinstance(s, str) for s in strings):
+            return jsonify({
+                "success": False,
+                "error": "'patterns' and 'strings' must contain only strings"
+            }), 400
+        
+        cells = len(patterns) * len(strings)
+        if cells > TEST_BATCH_MAX_CELLS:
+            return jsonify({
+                "success": False,
+                "error": f"Matrix too large: {cells} cells (limit {TEST_BATCH_MAX_CELLS})"
+            }), 400
+        
+        try:
+            deadline = request_deadline(request.headers.get('X-Request-Deadline-Ms'), data.get('deadline_ms'))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        budget_end = time.monotonic() + TEST_BATCH_TIMEOUT_MS / 1000
+        deadline = budget_end if deadline is None else min(deadline, budget_end)
+        
+        logger.info("🧪 Batch testing %d patterns x %d strings (%s)", len(patterns), len(strings), output)
+        
+        rows, errors = match_matrix(patterns, strings, output, deadline)
+        
+        return jsonify({
+            "success": not errors,
+            "output": output,
+            "pattern_count": len(patterns),
+            "string_count": len(strings),
+            "matrix": rows,
+            "errors": {str(i): error for i, error in errors.items()},
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        logger.exception("💥 Batch test error: %s", error_msg)
         return jsonify({
             "success": False,
             "error": error_msg,
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@app.route('/api/scan', methods=['POST'])
+def scan_regex():
+    """Run a pattern over a raw (optionally chunked) request body, streaming matches as NDJSON.
+    
+    The pattern and options come from the query string, so the body can be a
+    log file of any size; only a window of it is held in memory.
+    """
+    regex_pattern = request.args.get('regex', '')
+    if not regex_pattern:
+        return jsonify({
+            "success": False,
+            "error": "Missing 'regex' query parameter"
+        }), 400
+    
+    try:
+        max_match = min(int(request.args.get('max_match', SCAN_MATCH_WINDOW)), SCAN_MAX_MATCH_WINDOW)
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "'max_match' and 'limit' must be integers"
+        }), 400
+    if max_match < 1 or (limit is not None and limit < 0):
+        return jsonify({
+            "success": False,
+            "error": "'max_match' must be positive and 'limit' non-negative"
+        }), 400
+    
+    try:
+        compiled = pattern_cache.compile(regex_pattern)
+    except re.error as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid regex: {str(e)}"
+        }), 400
+    
+    # A runaway backtrack cannot be interrupted mid-stream, so risky shapes are refused
+    redos_warnings = find_redos_risks(regex_pattern)
+    if redos_warnings:
+        return jsonify({
+            "success": False,
+            "error": "Pattern has catastrophic backtracking risks and cannot be used to scan",
+            "redos_warnings": redos_warnings
+        }), 400
+    
+    window = match_window(regex_pattern, max_match)
+    stream_in = request.stream
+    read_bytes = 0
+    
+    def chunks():
+        nonlocal read_bytes
+        while True:
+            chunk = stream_in.read(SCAN_CHUNK_BYTES)
+            if not chunk:
+                return
+            read_bytes += len(chunk)
+            yield chunk
+    
+    def stream():
+        started = time.perf_counter()
+        match_count = 0
+        truncated = 0
+        limit_reached = False
+        for offset, match, is_truncated in scan_chunks(compiled, chunks(), window):
+            if limit is not None and match_count >= limit:
+                limit_reached = True
+                break
+            line = {"start": offset + match.start(), "end": offset + match.end(), "match": match.group()}
+            if compiled.groups:
+                line["groups"] = match.groups()
+            if is_truncated:
+                line["truncated"] = True
+                truncated += 1
+            match_count += 1
+            yield json.dumps(line) + "\n"
+        
+        logger.debug("🔎 Scanned %d bytes with '%s': %d matches", read_bytes, regex_pattern, match_count)
+        yield json.dumps({
+            "done": True,
+            "success": True,
+            "regex": regex_pattern,
+            "match_count": match_count,
+            "bytes_scanned": read_bytes,
+            "window": window,
+            "truncated_matches": truncated,
+            "limit_reached": limit_reached,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "timestamp": datetime.now().isoformat()
+        }) + "\n"
+    
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+@app.route('/api/bench', methods=['POST'])
+def bench_regex():
+    """Time a pattern (or a fallback table entry, by 'keyword') on a generated corpus.
+    
+    The corpus mixes strings the pattern matches with near misses of them
+    (see regex_examples.build_corpus) and is reproducible from 'seed',
+    'size' (characters), 'length' (per sample) and 'match_ratio'.
+    """
+    data = request.get_json(silent=True) or {}
+    keyword = data.get('keyword')
+    if keyword is not None and keyword not in SMART_PATTERNS:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown 'keyword': {keyword}",
+            "keywords": sorted(SMART_PATTERNS)
+        }), 400
+    regex_pattern = SMART_PATTERNS[keyword] if keyword is not None else data.get('regex')
+    if not isinstance(regex_pattern, str) or not regex_pattern.strip():
+        return jsonify({
+            "success": False,
+            "error": "Missing 'regex' or 'keyword' in request body"
+        }), 400
+    
+    try:
+        seed = int(data.get('seed', 0))
+        size = int(data.get('size', BENCH_DEFAULT_SIZE))
+        length = int(data['length']) if data.get('length') is not None else None
+        repeat = int(data.get('repeat', 3))
+        timeout_ms = min(int(data.get('timeout_ms', BENCH_TIMEOUT_MS)), BENCH_MAX_TIMEOUT_MS)
+        match_ratio = float(data.get('match_ratio', 0.5))
+    except (TypeError, ValueError):
+        return jsonify({
+            "success": False,
+            "error": "'seed', 'size', 'length', 'repeat' and 'timeout_ms' must be integers, 'match_ratio' a number"
+        }), 400
+    if not (0 < size <= BENCH_MAX_SIZE and 1 <= repeat <= BENCH_MAX_REPEAT and 0 <= match_ratio <= 1
+            and (length is None or 0 <= length <= BENCH_MAX_LENGTH) and timeout_ms > 0):
+        return jsonify({
+            "success": False,
+            "error": f"Need 0 < 'size' <= {BENCH_MAX_SIZE}, 1 <= 'repeat' <= {BENCH_MAX_REPEAT}, "
+                     f"0 <= 'match_ratio' <= 1, 0 <= 'length' <= {BENCH_MAX_LENGTH} and 'timeout_ms' > 0"
+        }), 400
+    
+    try:
+        pattern_cache.compile(regex_pattern)
+    except re.error as e:
+        return jsonify({
+            "success": False,
+            "error": f"Invalid regex: {str(e)}"
+        }), 400
+    
+    logger.debug("⏱️ Benchmarking '%s' on %d chars (seed %d)", regex_pattern, size, seed)
+    outcome = bench_matcher.bench(regex_pattern, timeout_ms / 1000, size=size, seed=seed, length=length,
+                                  match_ratio=match_ratio, repeat=repeat)
+    response_data = {
+        "success": outcome["status"] == "ok",
+        "regex": regex_pattern,
+        "keyword": keyword,
+        "status": outcome["status"],
+        "redos_warnings": find_redos_risks(regex_pattern),
+        "timestamp": datetime.now().isoformat()
+    }
+    if outcome["status"] == "ok":
+        response_data.update(outcome["bench"])
+    elif outcome["status"] == "timeout":
+        response_data["error"] = f"Benchmark exceeded time budget of {timeout_ms} ms"
+    else:
+        response_data["error"] = outcome["error"]
+    return jsonify(response_data)
+
 @app.route('/api/examples', methods=['GET'])
 def get_examples():
     """Get example prompts for the regex generator"""
@@ -459,7 +1942,7 @@ def not_found(error):
     return jsonify({
         "success": False,
         "error": "Endpoint not found",
-        "available_endpoints": ["/", "/api/generate", "/api/test", "/api/examples"],
+        "available_endpoints": ["/", "/api/generate", "/api/generate/stream", "/api/generate/batch", "/api/test", "/api/test/batch", "/api/scan", "/api/bench", "/api/examples", "/metrics"],
         "timestamp": datetime.now().isoformat()
     }), 404
 
@@ -475,9 +1958,9 @@ if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
     
-    print(f"🚀 Starting Smart Regex Generator on port {port}")
-    print(f"🔧 Debug mode: {debug_mode}")
-    print(f"🤖 Model: deepseek/deepseek-r1:free")
-    print(f"🔑 API Key configured: {'Yes' if API_KEY else 'No'}")
+    logger.info("🚀 Starting Smart Regex Generator on port %d", port)
+    logger.info("🔧 Debug mode: %s", debug_mode)
+    logger.info("🤖 Model: deepseek/deepseek-r1:free")
+    logger.info("🔑 API Key configured: %s", 'Yes' if API_KEY else 'No')
     
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
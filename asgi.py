@@ -0,0 +1,351 @@
+"""ASGI entry point with a non-blocking /api/generate.
+
+Run with:  gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+
+POST /api/generate is served natively on asyncio, so a single worker can keep
+hundreds of slow LLM round trips in flight. Every other route is delegated to
+the Flask app.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import aiohttp
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    API_KEY,
+    REQUEST_LATENCY,
+    UPSTREAM_LATENCY,
+    SmartRegexGenerator,
+    app,
+    generate_response_data,
+    generator,
+    is_shareable_result,
+    is_upstream_success,
+    request_deadline,
+    response_cache,
+    tracer,
+    validation_feedback
+)
+from circuit_breaker import CircuitOpenError
+from hedging import DeadlineExceeded, remaining_seconds
+from regex_validation import prompt_examples
+from response_cache import normalize_prompt
+
+logger = logging.getLogger("smart_regex.asgi")
+
+
+class AsyncSmartRegexGenerator(SmartRegexGenerator):
+    """SmartRegexGenerator variant that calls OpenRouter through aiohttp"""
+
+    def __init__(self, api_key, response_cache=None, max_connections=100,
+                 connect_timeout=5.0, read_timeout=30.0, circuit_breaker=None, hedger=None, router=None,
+                 pattern_store=None, semantic_cache=None, single_flight=None, validator=None):
+        super().__init__(api_key, response_cache=response_cache, circuit_breaker=circuit_breaker,
+                         hedger=hedger, router=router, pattern_store=pattern_store,
+                         semantic_cache=semantic_cache, single_flight=single_flight, validator=validator)
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout,
+            sock_read=read_timeout
+        )
+        self._session = None
+
+    def _get_session(self):
+        # Created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def _off_loop(self, fn, *args):
+        """Run a blocking call (SQLite, pattern store, matcher) in the default executor, inside the current span"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, contextvars.copy_context().run, fn, *args)
+
+    async def generate_regex_async(self, user_input, deadline=None):
+        """Generate regex without blocking the event loop"""
+        with tracer.span("generate_regex") as span:
+            # The disk cache and pattern store do file I/O
+            cached = await self._off_loop(self.get_cached, user_input)
+            span.set_attribute("cached", cached is not None)
+            if cached is not None:
+                return cached
+
+            if self.single_flight is None:
+                result, leader = await self._generate_checked_async(user_input, deadline), True
+            else:
+                try:
+                    result, leader = await self.single_flight.do_async(
+                        normalize_prompt(user_input),
+                        lambda: self._generate_checked_async(user_input, deadline),
+                        deadline,
+                        shareable=is_shareable_result
+                    )
+                except DeadlineExceeded:
+                    return self.deadline_result(user_input)
+                except TimeoutError:
+                    result, leader = await self._generate_checked_async(user_input, deadline), True
+                if not leader and not is_shareable_result(result):
+                    result, leader = await self._generate_checked_async(user_input, deadline), True
+
+            if leader:
+                await self._off_loop(self.remember, user_input, result)
+            return result
+
+    async def request_completion_async(self, user_input, deadline=None, attempt=1, feedback=None):
+        """Ask the model (or, with a pool, the best-ranked model that answers)"""
+        if self.router is None:
+            return await self.request_endpoint_async(user_input, None, deadline, attempt, feedback)
+
+        last_error = None
+        for endpoint in self.router.ranked():
+            started = time.perf_counter()
+            try:
+                result = await self.request_endpoint_async(user_input, endpoint, deadline, attempt, feedback)
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.router.record(endpoint, time.perf_counter() - started, False, str(e) or type(e).__name__)
+                logger.warning("🔀 Model '%s' failed (%s), failing over", endpoint.name, e)
+                last_error = e
+                continue
+            self.router.record(endpoint, time.perf_counter() - started, True)
+            return dict(result, model=endpoint.name)
+        raise last_error
+
+    async def request_endpoint_async(self, user_input, endpoint=None, deadline=None, attempt=1, feedback=None):
+        """One upstream round trip; raises on transport and HTTP errors"""
+        headers, data = self.build_request(user_input, endpoint, feedback)
+        kwargs = {}
+        remaining = remaining_seconds(deadline)
+        if remaining is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(
+                total=remaining,
+                sock_connect=self.timeout.sock_connect,
+                sock_read=self.timeout.sock_read
+            )
+
+        url = endpoint.url if endpoint else self.base_url
+        breaker = endpoint.circuit_breaker if endpoint else self.circuit_breaker
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("Upstream circuit is open")
+
+        logger.debug("🔑 Making async API call to: %s (attempt %d)", url, attempt)
+        started = time.perf_counter()
+        with tracer.span("upstream.post") as span:
+            try:
+                response = await self._get_session().post(url, headers=headers, json=data, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                elapsed = time.perf_counter() - started
+                UPSTREAM_LATENCY.observe(elapsed, "error")
+                if breaker is not None:
+                    breaker.record(elapsed, False)
+                raise
+            elapsed = time.perf_counter() - started
+            UPSTREAM_LATENCY.observe(elapsed, str(response.status))
+            success = is_upstream_success(response.status)
+            if breaker is not None:
+                breaker.record(elapsed, success)
+            if success and self.hedger is not None:
+                self.hedger.latency.record(elapsed)
+            span.set_attribute("http.status_code", response.status)
+        async with response:
+            logger.debug("📡 API Response Status: %s", response.status)
+            response.raise_for_status()
+            with tracer.span("upstream.decode_json"):
+                result = await response.json(content_type=None)
+
+        return self.parse_completion(result, user_input)
+
+    async def _generate_uncached_async(self, user_input, deadline=None, feedback=None):
+        try:
+            if self.hedger is None:
+                return await self.request_completion_async(user_input, deadline, feedback=feedback)
+            return await self.hedger.run_async(
+                lambda attempt: self.request_completion_async(user_input, deadline, attempt, feedback),
+                deadline
+            )
+
+        except DeadlineExceeded:
+            return self.deadline_result(user_input)
+        except CircuitOpenError:
+            logger.debug("⚡ Circuit open, skipping upstream for: '%s'", user_input)
+            return self.fallback_result(user_input, "Upstream unavailable (circuit open), using smart fallback")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                return self.deadline_result(user_input)
+            logger.warning("❌ API Request Error: %s", e)
+            return self.fallback_result(user_input, f"API Error: {str(e)}, using smart fallback")
+        except Exception as e:
+            logger.exception("❌ Unexpected Error: %s", e)
+            return self.fallback_result(user_input, f"Error: {str(e)}, using smart fallback")
+
+    async def _generate_checked_async(self, user_input, deadline=None):
+        """Async twin of SmartRegexGenerator._generate_checked"""
+        result = await self._generate_uncached_async(user_input, deadline)
+        if self.validator is None:
+            return result
+
+        examples = prompt_examples(user_input)
+        attempts = []
+        while result.get("source") == "model":
+            # The checks block on a matcher process, so they run off the event loop
+            result = await self._off_loop(self.validate_result, result, examples)
+            attempts.append(result)
+            if result["validation"]["passed"] or len(attempts) > self.validator.retries:
+                break
+            logger.warning("🔁 Model regex failed validation (%s), asking again", result["validation"]["error"])
+            result = await self._generate_uncached_async(user_input, deadline, feedback=validation_feedback(result))
+        return self.settle_validation(user_input, attempts, result)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+if API_KEY:
+    async_generator = AsyncSmartRegexGenerator(
+        API_KEY,
+        response_cache=response_cache,
+        max_connections=int(os.getenv('ASYNC_MAX_CONNECTIONS', 100)),
+        connect_timeout=float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', 5)),
+        read_timeout=float(os.getenv('OPENROUTER_READ_TIMEOUT', 30)),
+        # One view of upstream health per process, whichever route made the call
+        circuit_breaker=generator.circuit_breaker,
+        hedger=generator.hedger,
+        router=generator.router,
+        pattern_store=generator.pattern_store,
+        semantic_cache=generator.semantic_cache,
+        single_flight=generator.single_flight,
+        validator=generator.validator
+    )
+else:
+    async_generator = None
+
+flask_application = WsgiToAsgi(app)
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"access-control-allow-origin", b"*")
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def generate_regex(scope, receive, send):
+    """Async twin of the Flask /api/generate route"""
+    if not async_generator:
+        return await send_json(send, {
+            "success": False,
+            "error": "API key not configured. Please set DEEPSEEK_API_KEY environment variable."
+        }, 500)
+
+    try:
+        body = await read_body(receive)
+        data = json.loads(body) if body else None
+
+        if not isinstance(data, dict) or 'prompt' not in data:
+            return await send_json(send, {
+                "success": False,
+                "error": "Missing 'prompt' in request body"
+            }, 400)
+
+        user_prompt = data['prompt'].strip()
+
+        if not user_prompt:
+            return await send_json(send, {
+                "success": False,
+                "error": "Prompt cannot be empty"
+            }, 400)
+
+        try:
+            header_deadline = dict(scope.get("headers", [])).get(b"x-request-deadline-ms", b"").decode("latin-1")
+            deadline = request_deadline(header_deadline, data.get('deadline_ms'))
+        except ValueError as e:
+            return await send_json(send, {
+                "success": False,
+                "error": str(e)
+            }, 400)
+
+        logger.info("📝 Generating regex for: '%s'", user_prompt)
+
+        result = await async_generator.generate_regex_async(user_prompt, deadline=deadline)
+        response_data = generate_response_data(user_prompt, result)
+
+        if not result["success"]:
+            logger.error("❌ Generation failed: %s", result['error'])
+            return await send_json(send, response_data, 500)
+
+        logger.info("✅ Generated regex: %s", result['regex'])
+        return await send_json(send, response_data)
+
+    except Exception as e:
+        error_msg = f"Server error: {str(e)}"
+        logger.exception("💥 Server error: %s", error_msg)
+        return await send_json(send, {
+            "success": False,
+            "error": error_msg,
+            "timestamp": datetime.now().isoformat()
+        }, 500)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if async_generator:
+                await async_generator.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if (scope["type"] == "http"
+            and scope["path"] == "/api/generate"
+            and scope["method"] == "POST"):
+        started = time.perf_counter()
+        statuses = []
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            await send(message)
+
+        traceparent = dict(scope.get("headers", [])).get(b"traceparent", b"").decode("latin-1")
+        with tracer.start_trace("POST /api/generate", traceparent=traceparent) as span:
+            await generate_regex(scope, receive, recording_send)
+            status = statuses[0] if statuses else 500
+            span.set_attribute("http.status_code", status)
+        REQUEST_LATENCY.observe(time.perf_counter() - started, "/api/generate", "POST", status)
+        return
+
+    return await flask_application(scope, receive, send)
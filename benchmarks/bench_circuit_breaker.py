@@ -0,0 +1,85 @@
+"""Generate latency through an upstream outage, with and without the circuit breaker.
+
+Usage:  python benchmarks/bench_circuit_breaker.py [--requests N] [--slow-delay S]
+
+Runs the same scenario twice against tests/fake_upstream.py: healthy,
+then failing, then slow, then healthy again. For each phase it reports the
+mean and worst /api/generate latency, how many requests were answered by
+the smart fallback and the breaker state at the end of the phase. Without
+the breaker every request in the failing and slow phases pays for retries
+or the stall; with it, requests after the first few get the fallback
+immediately and the circuit closes again once probes succeed. The pause
+between phases stands in for the breaker's open period.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SmartRegexGenerator, build_http_client  # noqa: E402
+from circuit_breaker import CircuitBreaker  # noqa: E402
+from tests.fake_upstream import start_fake_upstream  # noqa: E402
+
+PHASES = ("healthy", "failing", "slow", "healthy")
+
+
+def run_scenario(generator, state, requests_per_phase, slow_delay, open_seconds):
+    rows = []
+    for phase in PHASES:
+        state.mode = phase
+        state.delay = slow_delay
+        if rows:
+            # Let the previous phase leave the window and an open circuit go half-open
+            time.sleep(open_seconds)
+        latencies = []
+        fallbacks = 0
+        for i in range(requests_per_phase):
+            started = time.perf_counter()
+            result = generator.generate_regex(f"email address {phase} {i}")
+            latencies.append(time.perf_counter() - started)
+            fallbacks += result["source"] == "fallback"
+        breaker = generator.circuit_breaker
+        rows.append((
+            phase,
+            sum(latencies) / len(latencies) * 1000,
+            max(latencies) * 1000,
+            fallbacks,
+            breaker.stats()["state"] if breaker else "-"
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50, help="requests per phase")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds the slow upstream stalls")
+    args = parser.parse_args()
+
+    open_seconds = 1.5
+    server, url, state = start_fake_upstream()
+    for label, breaker in (
+        ("no breaker", None),
+        ("breaker", CircuitBreaker(window_seconds=1, min_calls=5, slow_call_seconds=args.slow_delay / 2,
+                                   open_seconds=open_seconds, half_open_probes=2))
+    ):
+        generator = SmartRegexGenerator("benchmark", http_client=build_http_client(), circuit_breaker=breaker)
+        generator.base_url = url
+        calls_before = state.calls
+
+        print(f"\n{label}")
+        print(f"{'phase':<9} {'mean ms':>9} {'max ms':>9} {'fallbacks':>10} {'circuit':>10}")
+        for phase, mean_ms, max_ms, fallbacks, circuit in run_scenario(
+            generator, state, args.requests, args.slow_delay, open_seconds
+        ):
+            print(f"{phase:<9} {mean_ms:>9.1f} {max_ms:>9.1f} {fallbacks:>10} {circuit:>10}")
+        print(f"upstream calls: {state.calls - calls_before}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
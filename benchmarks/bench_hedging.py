@@ -0,0 +1,71 @@
+"""Tail latency of /api/generate with and without hedged upstream requests.
+
+Usage:  python benchmarks/bench_hedging.py [--requests N] [--slow-fraction F] [--slow-delay S]
+
+A fake upstream (tests/fake_upstream.py) answers at once except for a
+random --slow-fraction of calls, which stall for --slow-delay seconds. The
+same prompts are generated with hedging off and on, and the p50/p95/p99/max
+latency and number of upstream calls are printed. A last run sets a 300 ms
+deadline against an upstream that always stalls, to show the fallback
+arriving inside the budget.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SmartRegexGenerator, build_http_client  # noqa: E402
+from tests.fake_upstream import start_fake_upstream  # noqa: E402
+from hedging import Hedger  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def run(generator, requests, deadline_ms=None):
+    latencies = []
+    fallbacks = 0
+    for i in range(requests):
+        deadline = None if deadline_ms is None else time.monotonic() + deadline_ms / 1000
+        started = time.perf_counter()
+        result = generator.generate_regex(f"email address {i}", deadline=deadline)
+        latencies.append((time.perf_counter() - started) * 1000)
+        fallbacks += result["source"] == "fallback"
+    return sorted(latencies), fallbacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--slow-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server, url, state = start_fake_upstream(mode="slow", delay=args.slow_delay, slow_fraction=args.slow_fraction)
+    print(f"{'run':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'calls':>6} {'fallbacks':>10}")
+    for label, hedger in (("no hedging", None), ("hedging", Hedger(min_samples=20, default_delay=0.2))):
+        generator = SmartRegexGenerator("benchmark", http_client=build_http_client(), hedger=hedger)
+        generator.base_url = url
+        calls_before = state.calls
+        latencies, fallbacks = run(generator, args.requests)
+        print(f"{label:<12} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+              f"{percentile(latencies, 99):>8.1f} {latencies[-1]:>8.1f} {state.calls - calls_before:>6} {fallbacks:>10}")
+        if hedger is not None:
+            print(f"             {hedger.stats()}")
+
+    state.slow_fraction = 1.0
+    state.delay = 2.0
+    latencies, fallbacks = run(generator, 10, deadline_ms=300)
+    print(f"{'deadline 300':<12} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+          f"{percentile(latencies, 99):>8.1f} {latencies[-1]:>8.1f} {'-':>6} {fallbacks:>10}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Microbenchmark for the smart fallback keyword lookup.
+
+Usage:  python benchmarks/bench_keyword_index.py [--repeat N]
+
+Compares the original lookup (a substring check per keyword, then a
+generator over the words of every keyword) with match_fallback_keyword,
+which walks the token list build_keyword_index precompiles from
+SMART_PATTERNS (app.KEYWORD_TOKENS / KEYWORD_HITS), and checks both agree. Prompt sets: the /api/examples
+prompts, prompts that hit no keyword, and long data-dictionary style
+descriptions.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import SMART_PATTERNS, app, match_fallback_keyword  # noqa: E402
+
+
+def linear_scan(user_lower):
+    """The lookup generate_smart_fallback used before the keyword index"""
+    for keyword in SMART_PATTERNS:
+        if keyword in user_lower:
+            return keyword, True
+    for keyword in SMART_PATTERNS:
+        if any(word in user_lower for word in keyword.split()):
+            return keyword, False
+    return None, False
+
+
+def prompt_sets():
+    with app.test_client() as client:
+        examples = client.get('/api/examples').get_json()["examples"]
+    return {
+        "examples": [prompt.lower() for group in examples.values() for prompt in group],
+        "misses": [
+            "something completely unrelated to any table entry",
+            "quantity of widgets in stock",
+            "lorem ipsum dolor sit amet consectetur",
+        ],
+        "long": [
+            "the customer purchase order reference as printed on the invoice form, "
+            "followed by the warehouse bin location and a free-text remark " * 3,
+            "a very long description " * 20 + "ending with a zip code",
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="passes over the prompt set")
+    args = parser.parse_args()
+
+    print(f"{'prompt set':<12} {'old us':>8} {'index us':>9} {'speedup':>8}")
+    for name, prompts in prompt_sets().items():
+        mismatches = [p for p in prompts if linear_scan(p) != match_fallback_keyword(p)]
+        if mismatches:
+            print(f"MISMATCH on {len(mismatches)} prompts: {mismatches}")
+            sys.exit(1)
+
+        def run(func):
+            for prompt in prompts:
+                func(prompt)
+
+        old = min(timeit.repeat(lambda: run(linear_scan), number=args.repeat, repeat=3))
+        new = min(timeit.repeat(lambda: run(match_fallback_keyword), number=args.repeat, repeat=3))
+        lookups = args.repeat * len(prompts)
+        print(f"{name:<12} {old / lookups * 1e6:>8.2f} {new / lookups * 1e6:>9.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
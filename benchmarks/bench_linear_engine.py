@@ -0,0 +1,107 @@
+"""Compare the backtracking re engine with the linear-time engine.
+
+Usage:  python benchmarks/bench_linear_engine.py [--size BYTES] [--repeat N]
+
+Runs every smart_patterns entry the linear engine supports over a mixed text
+corpus, then times a catastrophic-backtracking pattern at growing input sizes
+to show where re goes exponential and the linear engine does not.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import SMART_PATTERNS  # noqa: E402
+from linear_match import LinearPattern, UnsupportedPattern, native_re2, compile_linear  # noqa: E402
+
+SAMPLE_LINES = [
+    "Contact jane.doe@example.com or (555) 123-4567 before 12/31/2024.",
+    "Server 192.168.10.254 answered https://example.org/path?q=1#top at 23:59",
+    "Order #A1B2C3 total $1,234.56 zip 90210-1234 ssn 123-45-6789",
+    "uuid 123e4567-e89b-12d3-a456-426614174000 hex #1a2B3c @mention #hashtag",
+]
+
+
+def build_corpus(size):
+    text = "\n".join(SAMPLE_LINES) + "\n"
+    return (text * (size // len(text) + 1))[:size]
+
+
+def best_of(repeat, func, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_corpus(size, repeat):
+    corpus = build_corpus(size)
+    # Corpus lines are matched one by one, as /api/test callers do
+    lines = corpus.splitlines()
+    print(f"smart_patterns corpus: {len(lines)} lines, {size} bytes")
+    print(f"{'pattern':<16} {'re ms':>10} {'nfa ms':>10} {'ratio':>8}")
+
+    seen = set()
+    total_re = total_nfa = 0.0
+    for keyword, pattern in SMART_PATTERNS.items():
+        if pattern in seen:
+            continue
+        seen.add(pattern)
+        try:
+            linear = LinearPattern(pattern)
+        except UnsupportedPattern:
+            print(f"{keyword:<16} {'(unsupported: lookaround/backreference)':>30}")
+            continue
+        compiled = re.compile(pattern)
+        re_time = best_of(repeat, lambda: [compiled.findall(line) for line in lines])
+        nfa_time = best_of(repeat, lambda: [linear.findall(line) for line in lines])
+        total_re += re_time
+        total_nfa += nfa_time
+        print(f"{keyword:<16} {re_time * 1000:>10.2f} {nfa_time * 1000:>10.2f} {nfa_time / re_time:>7.1f}x")
+    print(f"{'TOTAL':<16} {total_re * 1000:>10.2f} {total_nfa * 1000:>10.2f} {total_nfa / total_re:>7.1f}x")
+
+    if native_re2 is not None:
+        native_total = 0.0
+        for pattern in seen:
+            try:
+                native = compile_linear(pattern)
+            except UnsupportedPattern:
+                continue
+            native_total += best_of(repeat, lambda: [native.findall(line) for line in lines])
+        print(f"{'TOTAL (re2)':<16} {native_total * 1000:>10.2f}")
+
+
+def bench_redos(limit):
+    pattern = r"(a+)+$"
+    linear = LinearPattern(pattern)
+    compiled = re.compile(pattern)
+    print(f"\ncatastrophic pattern {pattern!r} against 'a' * n + '!'")
+    print(f"{'n':>6} {'re ms':>12} {'nfa ms':>10}")
+    for n in (10, 14, 18, 20, 22, limit):
+        text = "a" * n + "!"
+        nfa_time = best_of(1, linear.findall, text)
+        if n <= 22:
+            re_time = f"{best_of(1, compiled.findall, text) * 1000:>12.2f}"
+        else:
+            re_time = f"{'(skipped)':>12}"
+        print(f"{n:>6} {re_time} {nfa_time * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000, help="corpus size in bytes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--redos-limit", type=int, default=100_000, help="largest n for the ReDoS case")
+    args = parser.parse_args()
+
+    bench_corpus(args.size, args.repeat)
+    bench_redos(args.redos_limit)
+
+
+if __name__ == "__main__":
+    main()
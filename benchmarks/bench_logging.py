@@ -0,0 +1,101 @@
+"""Per-request cost of the old print() diagnostics versus queued logging.
+
+Usage:  python benchmarks/bench_logging.py [--requests N]
+
+Replays the diagnostics one /api/generate call used to print (request
+payload and full upstream response as indented JSON, response headers, raw
+model output) against what the request thread now does with the default
+settings (INFO level, LOG_PAYLOADS off, queue handler). Both write to the same
+temporary file, so the numbers only show the work left on the request path.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_config import LOGGER_NAME, PAYLOAD_LOGGER_NAME, LazyJSON, configure_logging, shutdown_logging  # noqa: E402
+
+REQUEST = {
+    "model": "deepseek/deepseek-r1:free",
+    "messages": [{"role": "user", "content": "You are a regex expert. " * 20}],
+    "temperature": 0.1,
+    "max_tokens": 400
+}
+RESPONSE = {
+    "id": "gen-123",
+    "model": "deepseek/deepseek-r1:free",
+    "choices": [{
+        "message": {
+            "role": "assistant",
+            "content": "Let me think about the structure of an email address. " * 30
+                       + "\nREGEX: ^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$"
+        },
+        "finish_reason": "stop"
+    }],
+    "usage": {"prompt_tokens": 120, "completion_tokens": 380, "total_tokens": 500}
+}
+HEADERS = {f"x-header-{i}": "value " * 4 for i in range(15)}
+AI_RESPONSE = RESPONSE["choices"][0]["message"]["content"]
+
+
+def old_request():
+    print("🔑 Making API call to: https://openrouter.ai/api/v1/chat/completions")
+    print(f"🔧 Request data: {json.dumps(REQUEST, indent=2)}")
+    print("📡 API Response Status: 200")
+    print(f"📡 Response Headers: {dict(HEADERS)}")
+    print(f"📄 Full API Response: {json.dumps(RESPONSE, indent=2)}")
+    print(f"🤖 AI Raw Response: '{AI_RESPONSE}'")
+    print("🎯 Final Pattern: '^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$'")
+    print("✅ Generated regex: ^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$")
+
+
+def new_request(logger, payload_logger):
+    logger.debug("🔑 Making API call to: %s", "https://openrouter.ai/api/v1/chat/completions")
+    payload_logger.debug("🔧 Request data: %s", LazyJSON(REQUEST))
+    logger.debug("📡 API Response Status: %s", 200)
+    payload_logger.debug("📡 Response Headers: %s", HEADERS)
+    payload_logger.debug("📄 Full API Response: %s", LazyJSON(RESPONSE))
+    payload_logger.debug("🤖 AI Raw Response: '%s'", AI_RESPONSE)
+    logger.debug("🎯 Final Pattern: '%s'", "^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$")
+    logger.info("✅ Generated regex: %s", "^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\\.[a-zA-Z]{2,}$")
+
+
+def timed(func, count, *args):
+    start = time.perf_counter()
+    for _ in range(count):
+        func(*args)
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000, help="simulated requests per variant")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryFile("w", encoding="utf-8") as sink:
+        with contextlib.redirect_stdout(sink):
+            old = timed(old_request, args.requests)
+
+        configure_logging(level="INFO", payloads=False, stream=sink)
+        logger = logging.getLogger(LOGGER_NAME)
+        payload_logger = logging.getLogger(PAYLOAD_LOGGER_NAME)
+        new = timed(new_request, args.requests, logger, payload_logger)
+
+        configure_logging(level="DEBUG", payloads=True, stream=sink)
+        debug = timed(new_request, args.requests, logger, payload_logger)
+        shutdown_logging()
+
+    print(f"{args.requests} simulated requests")
+    print(f"print() diagnostics:          {old * 1e6:8.1f} us/request")
+    print(f"queued logging (INFO):        {new * 1e6:8.1f} us/request  ({old / new:.0f}x less)")
+    print(f"queued logging (DEBUG+dumps): {debug * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Latency-based routing and failover across a pool of stub model servers.
+
+Usage:  python benchmarks/bench_model_router.py [--requests N]
+
+Starts three fake upstreams (tests/fake_upstream.py): "fast" answers
+at once, "slow" stalls 200 ms on every call and "flaky" returns 503. The
+pool is routed in three phases: all as started, then with "fast" failing
+(requests must fail over to "slow"), then with "fast" recovered. For each
+phase it prints the mean latency, the number of fallbacks and how many
+requests each model answered, followed by the router's per-model stats.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SmartRegexGenerator, build_http_client  # noqa: E402
+from tests.fake_upstream import start_fake_upstream  # noqa: E402
+from model_router import ModelRouter, load_model_pool  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="requests per phase")
+    args = parser.parse_args()
+
+    servers = {
+        "fast": start_fake_upstream(mode="healthy"),
+        "slow": start_fake_upstream(mode="slow", delay=0.2),
+        "flaky": start_fake_upstream(mode="failing")
+    }
+    pool = json.dumps([
+        {"name": name, "model": f"stub/{name}", "url": url}
+        for name, (_, url, _) in servers.items()
+    ])
+    # Phases last seconds, not minutes, so failures are forgiven faster than in production
+    router = ModelRouter(load_model_pool(pool, default_api_key="benchmark"), recovery_half_life=2.0)
+    generator = SmartRegexGenerator("benchmark", http_client=build_http_client(), router=router)
+
+    print(f"{'phase':<14} {'mean ms':>8} {'fallbacks':>10}  answered by")
+    for phase in ("initial", "fast failing", "fast back"):
+        if phase == "fast failing":
+            servers["fast"][2].mode = "failing"
+        elif phase == "fast back":
+            servers["fast"][2].mode = "healthy"
+            time.sleep(4)
+        answered = Counter()
+        fallbacks = 0
+        started = time.perf_counter()
+        for i in range(args.requests):
+            result = generator.generate_regex(f"email address {phase} {i}")
+            answered[result.get("model", "fallback")] += 1
+            fallbacks += result["source"] == "fallback"
+        mean_ms = (time.perf_counter() - started) / args.requests * 1000
+        print(f"{phase:<14} {mean_ms:>8.1f} {fallbacks:>10}  {dict(answered)}")
+
+    print()
+    for stats in router.stats():
+        print(f"{stats['name']:<6} requests={stats['requests']:<4} failures={stats['failures']:<4} "
+              f"success_rate={stats['success_rate']:<6} ewma_latency_ms={stats['ewma_latency_ms']} score={stats['score']}")
+    for server, _, _ in servers.values():
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Match speed of generated patterns before and after regex_optimizer.
+
+Usage:  python benchmarks/bench_optimizer.py [--lines N] [--repeat N]
+
+Builds a text of sample lines (valid emails, phone numbers, dates, URLs,
+IPs, times, ... mixed with near misses and random text) and, for every
+distinct pattern the optimizer changes, times one ``finditer`` pass (counting
+matches) and one ``findall`` over the whole text, with the original and the
+optimized pattern. Both are compiled with re.MULTILINE so the ^...$ patterns
+test each line. Before timing it checks that both match the same spans.
+
+The SMART_PATTERNS table is hand-written and already lean, so a second table
+runs MODEL_STYLE: the padded shapes model replies tend to have. Last, a
+nested quantifier is timed on a near miss, where the rewrite removes the
+exponential backtracking rather than shaving a constant.
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SMART_PATTERNS  # noqa: E402
+from regex_optimizer import optimize_regex  # noqa: E402
+
+SAMPLES = [
+    "waqas@gmail.com", "first.last+tag@example.co.uk", "someone@yahoo.com", "not-an-email@", "@example.com",
+    "(555) 123-4567", "555.123.4567", "+15551234567", "+44 20 7946 0958", "5551234",
+    "12/31/2024", "1/2/2024", "31-12-2024", "2024-12-31", "2024-13-45", "99/99/9999",
+    "https://example.com/path/to/page?query=1&x=2#top", "http://localhost:8080/", "ftp://nope",
+    "example.com", "sub-domain.example.org", "-bad-.com",
+    "192.168.1.1", "255.255.255.255", "256.1.1.1", "10.0.0", "01.02.03.004",
+    "Hello", "HELLO", "hello", "Hello123", "#hashtag", "@mention", "word_with_underscore",
+    "42", "-17", "3.14159", "-0.5", "$1,234.56", "1,23,456", "$12",
+    "4111 1111 1111 1111", "4111-1111-1111-1111", "123-45-6789", "12345", "12345-6789", "K1A 0B1",
+    "Passw0rd!", "weakpass", "550e8400-e29b-41d4-a716-446655440000", "A" * 32, "deadBEEF", "#1a2B3c",
+    "23:59", "24:00", "7:05", "12:30 PM", "13:00AM",
+]
+
+# Typical model output: unused groups, (?:x) wrappers, [0-9\d], flat alternations
+MODEL_STYLE = {
+    "month": r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b",
+    "email": r"\b(\w+)@(\w+)\.(com|org|net|co\.uk)\b",
+    "ipv4": r"((\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3}))",
+    "identifier": r"(?:[a-zA-Z]|[0-9]|_)+",
+    "number": r"(?:[0-9\d]+)(?:[.][0-9\d]+)?",
+    "key-value": r"((?:[A-Za-z0-9_])+)\s*(:)\s*((?:[0-9])+)",
+    "iso date": r"(\d{4})-(\d{2})-(\d{2})",
+    "domain": r"(?:(?:\w)+\.)+(?:com|org|net)",
+    "digits": r"^(?:(?:\d+)+)$",
+}
+NEAR_MISS = (r"^(?:\d+)+$", "1" * 24 + "x")
+
+
+def make_lines(rng, count):
+    lines = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            lines.append(rng.choice(SAMPLES))
+        else:
+            alphabet = string.ascii_letters + string.digits + " .-/:@#$%"
+            lines.append("".join(rng.choice(alphabet) for _ in range(rng.randint(3, 40))))
+    return lines
+
+
+def best_seconds(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    text = "\n".join(make_lines(random.Random(args.seed), args.lines))
+    print(f"{len(text) / 1e6:.1f} MB, {args.lines} lines")
+    for title, table in (("SMART_PATTERNS", SMART_PATTERNS), ("MODEL_STYLE", MODEL_STYLE)):
+        print(f"\n{title}")
+        compare(table, text, args.repeat)
+
+    pattern, near_miss = NEAR_MISS
+    optimized = optimize_regex(pattern).regex
+    timings = [best_seconds(lambda: re.match(p, near_miss), 1) for p in (pattern, optimized)]
+    print(f"\n{pattern} -> {optimized} on {len(near_miss)} chars that do not match: "
+          f"{timings[0] * 1000:.0f} ms -> {timings[1] * 1e6:.1f} us")
+
+
+def compare(table, text, repeat):
+    methods = {
+        "finditer": lambda compiled: sum(1 for _ in compiled.finditer(text)),
+        "findall": lambda compiled: compiled.findall(text)
+    }
+    totals = {method: [0.0, 0.0] for method in methods}
+    seen = set()
+    unchanged = []
+    print(f"{'pattern':<12} {'matches':>8} {'finditer ms':>12} {'opt':>7} {'findall ms':>11} {'opt':>7}  rewrites")
+    for keyword, pattern in table.items():
+        optimization = optimize_regex(pattern, re.MULTILINE)
+        if not optimization.rewrites:
+            unchanged.append(keyword)
+            continue
+        if pattern in seen:
+            continue  # the same pattern under another keyword
+        seen.add(pattern)
+        original = re.compile(pattern, re.MULTILINE)
+        optimized = re.compile(optimization.regex)
+        spans = [m.span() for m in original.finditer(text)]
+        if [m.span() for m in optimized.finditer(text)] != spans:
+            sys.exit(f"{keyword}: optimized pattern matches differently")
+
+        row = []
+        for method, run in methods.items():
+            for i, compiled in enumerate((original, optimized)):
+                seconds = best_seconds(lambda: run(compiled), repeat)
+                totals[method][i] += seconds
+                row.append(seconds * 1000)
+        print(f"{keyword:<12} {len(spans):>8} {row[0]:>12.1f} {row[1]:>7.1f} {row[2]:>11.1f} {row[3]:>7.1f}  "
+              f"{', '.join(optimization.rewrites)}")
+        print(f"{'':<12} {optimization.regex}")
+
+    if unchanged:
+        print(f"unchanged: {', '.join(unchanged)}")
+    for method, (before, after) in totals.items():
+        print(f"{method:<8} total {before * 1000:.1f} ms -> {after * 1000:.1f} ms ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Matches/sec and MB/sec of every fallback pattern on its own synthetic corpus.
+
+Usage:  python benchmarks/bench_patterns.py [--size-kb N] [--length N] [--seed N] [--repeat N]
+
+For each distinct SMART_PATTERNS entry, regex_examples.bench_pattern builds
+a corpus of strings the pattern matches mixed with near misses (same seed,
+size and per-sample length for all, so runs are comparable across commits)
+and times a full scan with re.MULTILINE. Columns:
+
+  samples ok   share of sample lines the pattern fullmatches (should be 100%)
+  misses ok    share of near-miss lines it fullmatches anyway (should be low)
+  gen ms       building the corpus, including those checks' retries
+  best ms      fastest of the timed scans
+
+This is the same measurement /api/bench makes, minus the worker process.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SMART_PATTERNS  # noqa: E402
+from regex_examples import bench_pattern  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=1024)
+    parser.add_argument("--length", type=int, default=None, help="target characters per sample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seen = set()
+    print(f"{'pattern':<14} {'lines':>7} {'samples ok':>10} {'misses ok':>9} {'gen ms':>7} {'best ms':>8} "
+          f"{'matches/s':>11} {'MB/s':>7}")
+    for keyword, pattern in SMART_PATTERNS.items():
+        if pattern in seen:
+            continue
+        seen.add(pattern)
+        report = bench_pattern(pattern, args.size_kb * 1024, seed=args.seed, length=args.length, repeat=args.repeat)
+        corpus = report["corpus"]
+        print(f"{keyword:<14} {corpus['lines']:>7} "
+              f"{report['samples_matched'] / max(1, corpus['samples']):>10.0%} "
+              f"{report['near_misses_matched'] / max(1, corpus['near_misses']):>9.0%} "
+              f"{corpus['generate_ms']:>7.0f} {report['best_ms']:>8.1f} "
+              f"{report['matches_per_second']:>11,} {report['bytes_per_second'] / 1e6:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
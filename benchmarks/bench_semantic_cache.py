@@ -0,0 +1,102 @@
+"""Lookup latency of the near-duplicate prompt cache against its size.
+
+Usage:  python benchmarks/bench_semantic_cache.py [--sizes 1000,10000,100000,1000000] [--queries N]
+
+Fills a SemanticCache with synthetic prompts (two to five words from a
+random vocabulary, so the LSH buckets see realistic collisions) and, at
+each size, times three kinds of lookup:
+
+  rephrased  a stored prompt with filler words and plurals added (must hit)
+  typo       a stored prompt of four or more words with one letter changed
+  miss       a fresh prompt that was never stored
+
+It prints the mean and p99 lookup latency, the hit ratio per kind, the
+insert rate and the peak RSS, so a flat latency column is the evidence
+that lookups do not scan the cache.
+"""
+import argparse
+import os
+import random
+import resource
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import SemanticCache  # noqa: E402
+
+FILLERS = ["regex for", "match a", "validate", "find all", "pattern for the"]
+
+
+def make_vocabulary(rng, size=20000):
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_prompt(rng, vocabulary):
+    return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 5)))
+
+
+def rephrase(rng, prompt):
+    words = [word + "s" if rng.random() < 0.5 and not word.endswith("s") else word for word in prompt.split()]
+    return f"{rng.choice(FILLERS)} {' '.join(words)}"
+
+
+def typo(rng, prompt):
+    i = rng.randrange(len(prompt))
+    while prompt[i] == " ":
+        i = rng.randrange(len(prompt))
+    return prompt[:i] + rng.choice(string.ascii_lowercase) + prompt[i + 1:]
+
+
+def time_lookups(cache, queries):
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        hits += cache.lookup(query) is not None
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    mean_us = sum(latencies) / len(latencies) * 1e6
+    p99_us = latencies[int(len(latencies) * 0.99)] * 1e6
+    return mean_us, p99_us, hits / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="comma separated cache sizes")
+    parser.add_argument("--queries", type=int, default=2000, help="lookups per kind and size")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    cache = SemanticCache(threshold=args.threshold, max_entries=sizes[-1])
+    stored = []
+
+    print(f"{'entries':>9} {'insert/s':>9} {'kind':<10} {'mean us':>8} {'p99 us':>8} {'hit ratio':>9} {'rss MB':>7}")
+    for size in sizes:
+        started = time.perf_counter()
+        added = size - len(stored)
+        while len(stored) < size:
+            prompt = make_prompt(rng, vocabulary)
+            cache.set(prompt, {"regex": prompt})
+            stored.append(prompt)
+        insert_rate = added / (time.perf_counter() - started)
+
+        long_prompts = [prompt for prompt in stored if prompt.count(" ") >= 3]
+        kinds = {
+            "rephrased": [rephrase(rng, rng.choice(stored)) for _ in range(args.queries)],
+            "typo": [typo(rng, rng.choice(long_prompts)) for _ in range(args.queries)],
+            "miss": [make_prompt(rng, vocabulary) for _ in range(args.queries)]
+        }
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        for kind, queries in kinds.items():
+            mean_us, p99_us, hit_ratio = time_lookups(cache, queries)
+            print(f"{len(cache):>9} {insert_rate:>9.0f} {kind:<10} {mean_us:>8.1f} {p99_us:>8.1f} {hit_ratio:>9.3f} {rss_mb:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
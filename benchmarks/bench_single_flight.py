@@ -0,0 +1,95 @@
+"""Upstream calls for a burst of identical prompts, with and without coalescing.
+
+Usage:  python benchmarks/bench_single_flight.py [--clients N] [--workers W] [--delay S]
+
+Against a fake upstream (tests/fake_upstream.py) that answers after
+``delay`` seconds, ``clients`` threads ask for the same prompt at once,
+first in one process and then spread over ``workers`` forked processes
+sharing a lock directory (as gunicorn workers would). Prints the upstream
+calls made and the slowest client's latency for each setup.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "off")
+os.environ.setdefault("SEMANTIC_CACHE", "false")
+os.environ.setdefault("HEDGING", "false")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SmartRegexGenerator  # noqa: E402
+from tests.fake_upstream import start_fake_upstream  # noqa: E402
+from http_client import PooledHTTPClient  # noqa: E402
+from single_flight import SingleFlight  # noqa: E402
+
+
+def burst(generator, prompt, clients):
+    """Slowest client's latency for clients concurrent identical requests"""
+    latencies = []
+
+    def client():
+        started = time.perf_counter()
+        generator.generate_regex(prompt)
+        latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return max(latencies)
+
+
+def forked_burst(url, prompt, clients, workers, lock_dir):
+    per_worker = max(1, clients // workers)
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            generator = SmartRegexGenerator("benchmark", http_client=PooledHTTPClient(pool_size=per_worker),
+                                            single_flight=SingleFlight(lock_dir=lock_dir))
+            generator.base_url = url
+            burst(generator, prompt, per_worker)
+            os._exit(0)
+        pids.append(pid)
+    started = time.perf_counter()
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.5, help="upstream latency in seconds")
+    args = parser.parse_args()
+
+    server, url, state = start_fake_upstream(mode="slow", delay=args.delay)
+    setups = [
+        ("no coalescing", None),
+        ("in-process", SingleFlight()),
+    ]
+    print(f"{'setup':<26} {'upstream calls':>14} {'slowest ms':>11}")
+    for i, (name, single_flight) in enumerate(setups):
+        generator = SmartRegexGenerator("benchmark", http_client=PooledHTTPClient(pool_size=args.clients),
+                                        single_flight=single_flight)
+        generator.base_url = url
+        state.calls = 0
+        slowest = burst(generator, f"email address {i}", args.clients)
+        print(f"{name:<26} {state.calls:>14} {slowest * 1000:>11.0f}")
+
+    with tempfile.TemporaryDirectory() as lock_dir:
+        state.calls = 0
+        elapsed = forked_burst(url, "email address forked", args.clients, args.workers, lock_dir)
+        print(f"{f'{args.workers} workers + lock dir':<26} {state.calls:>14} {elapsed * 1000:>11.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
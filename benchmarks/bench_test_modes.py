@@ -0,0 +1,96 @@
+"""Latency and memory of the /api/test modes on multi-megabyte inputs.
+
+Usage:  python benchmarks/bench_test_modes.py [--sizes-mb 1,4,16] [--repeat N]
+
+Builds a log-like text of the given size and, for a dense pattern (``\\d+``,
+a match every few characters) and a sparse one (an ISO date per line),
+runs each mode of match_results.re_mode and reports:
+
+  ms        best wall time of the mode itself
+  peak MB   tracemalloc peak while it runs (a separate, untimed run)
+  resp KB   size of the /api/test JSON body the mode produces, minus the
+            echoed test_string (identical for every mode)
+
+The same mode through the Flask route (``route ms``) includes JSON
+encoding, which is where the full match list costs the most.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("MATCH_ENGINE", "re")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import re  # noqa: E402
+
+from app import app  # noqa: E402
+from match_results import TEST_MODES, re_mode  # noqa: E402
+
+PATTERNS = [
+    ("dense", r"\d+"),
+    ("sparse", r"(\d{4})-(\d\d)-(\d\d)"),
+]
+
+
+def make_text(size):
+    lines = []
+    length = 0
+    i = 0
+    while length < size:
+        line = f"user{i % 997} logged in from 10.0.{i % 250}.{i % 200} on 2024-01-{i % 28 + 1:02d} status=ok\n"
+        lines.append(line)
+        length += len(line)
+        i += 1
+    return "".join(lines)[:size]
+
+
+def best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", default="1,4,16", help="comma separated input sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'MB':>4} {'pattern':<7} {'mode':<7} {'matches':>9} {'ms':>8} {'peak MB':>8} {'route ms':>9} {'resp KB':>9}")
+    for size_mb in (float(size) for size in args.sizes_mb.split(",")):
+        text = make_text(int(size_mb * 1024 * 1024))
+        for name, pattern in PATTERNS:
+            compiled = re.compile(pattern)
+            for mode in TEST_MODES:
+                _, match_count = re_mode(mode, compiled, text)
+                elapsed = best_ms(lambda: re_mode(mode, compiled, text), args.repeat)
+                peak = peak_mb(lambda: re_mode(mode, compiled, text))
+
+                body = {"regex": pattern, "test_string": text, "mode": mode}
+                route_ms = best_ms(lambda: client.post("/api/test", json=body), args.repeat)
+                response = client.post("/api/test", json=body).get_json()
+                response.pop("test_string")
+                resp_kb = len(json.dumps(response)) / 1024
+                print(f"{size_mb:>4g} {name:<7} {mode:<7} {match_count:>9} {elapsed:>8.1f} {peak:>8.1f} "
+                      f"{route_ms:>9.0f} {resp_kb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Latency of regex_validation on the fallback table and on known-bad patterns.
+
+Usage:  python benchmarks/bench_validation.py [--fuzz-ms N] [--repeat N]
+
+Validates every distinct SMART_PATTERNS entry (all of which should pass) and
+a few model-style failures: a pattern that does not compile, nested and
+overlapping quantifiers that backtrack catastrophically, and a pattern that
+misses the prompt's example. The guarded matcher is warmed first, so worker
+start-up is not counted. Per pattern it prints the outcome, the number of
+adversarial strings and the best compile / fuzz / examples / total times;
+a summary gives the median and worst total for passing patterns, which is
+what validation adds to every fresh generation.
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from app import SMART_PATTERNS  # noqa: E402
+from regex_validation import RegexValidator, prompt_examples  # noqa: E402
+from safe_match import GuardedMatcher  # noqa: E402
+
+BAD_PATTERNS = [
+    ("unbalanced", r"(\d{3}-\d{4}", ""),
+    ("nested", r"^(\w+\s?)*$", ""),
+    ("overlap", r"^(\d+|\d+\.\d+)+$", ""),
+    ("star height", r"(x+x+)+y", ""),
+    ("misses example", r"\d{3}-\d{4}", "phone numbers like '555 1234'"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fuzz-ms", type=int, default=250)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    validator = RegexValidator(GuardedMatcher(max_workers=1), fuzz_budget=args.fuzz_ms / 1000)
+    validator.validate(r"\d+")
+
+    cases = [(keyword, pattern, "") for keyword, pattern in SMART_PATTERNS.items()]
+    seen = set()
+    passed_totals = []
+    print(f"{'pattern':<16} {'outcome':<13} {'strings':>7} {'compile':>8} {'fuzz':>8} {'examples':>9} {'total ms':>9}")
+    for name, pattern, prompt in cases + BAD_PATTERNS:
+        if pattern in seen:
+            continue
+        seen.add(pattern)
+        positives, negatives = prompt_examples(prompt)
+        # Timeouts cost a whole budget, so the bad patterns run once
+        runs = 1 if (name, pattern, prompt) in BAD_PATTERNS else args.repeat
+        best = min((validator.validate(pattern, positives, negatives) for _ in range(runs)),
+                   key=lambda report: report["timing_ms"]["total"])
+        timing = best["timing_ms"]
+        if best["passed"]:
+            passed_totals.append(timing["total"])
+        print(f"{name:<16} {best['failed'] or 'passed':<13} {best['fuzz_strings']:>7} "
+              f"{timing.get('compile', 0):>8.2f} {timing.get('fuzz', 0):>8.2f} {timing.get('examples', 0):>9.2f} "
+              f"{timing['total']:>9.2f}")
+
+    print(f"\npassing patterns: {len(passed_totals)}, median {statistics.median(passed_totals):.2f} ms, "
+          f"worst {max(passed_totals):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
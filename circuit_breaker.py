@@ -0,0 +1,137 @@
+"""Circuit breaker for the model API.
+
+While OpenRouter is healthy every call goes through (CLOSED). The breaker
+keeps a rolling window of per-second buckets counting calls, failures and
+slow calls; once the window holds at least ``min_calls`` and either the
+failure rate or the slow-call rate crosses its threshold, the circuit OPENs
+and callers are told to skip the upstream entirely (the smart fallback is
+served in microseconds instead of after a 30 s timeout). After
+``open_seconds`` the circuit goes HALF_OPEN and lets ``half_open_probes``
+trial calls through: if they all succeed it closes again, if any fails it
+re-opens for another ``open_seconds``.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, window_seconds=30, min_calls=10, failure_rate=0.5,
+                 slow_call_rate=0.5, slow_call_seconds=10.0, open_seconds=30.0,
+                 half_open_probes=3, clock=time.monotonic):
+        self.window_seconds = max(1, int(window_seconds))
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        # One [second, calls, failures, slow] bucket per second of the window
+        self._buckets = [[-1, 0, 0, 0] for _ in range(self.window_seconds)]
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """True if a call may go to the upstream now; every allowed call must be recorded"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._half_open()
+            elif (self._probes_started >= self.half_open_probes
+                    and self.clock() - self._opened_at >= self.open_seconds):
+                # Probes that never reported back (the caller died); try again
+                self._half_open()
+            if self._probes_started < self.half_open_probes:
+                self._probes_started += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, duration, success):
+        """Report the outcome of a call that allow() let through"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if success and not slow:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.half_open_probes:
+                        self._close()
+                else:
+                    self._open()
+                return
+            if self.state == OPEN:
+                # A call that started before the circuit opened
+                return
+
+            now = int(self.clock())
+            bucket = self._buckets[now % self.window_seconds]
+            if bucket[0] != now:
+                bucket[:] = [now, 0, 0, 0]
+            bucket[1] += 1
+            bucket[2] += not success
+            bucket[3] += slow
+
+            calls, failures, slow_calls = self._window_totals(now)
+            if calls >= self.min_calls and (
+                failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate
+            ):
+                self._open()
+
+    def _window_totals(self, now):
+        # Caller holds the lock
+        calls = failures = slow_calls = 0
+        for second, bucket_calls, bucket_failures, bucket_slow in self._buckets:
+            if now - second < self.window_seconds:
+                calls += bucket_calls
+                failures += bucket_failures
+                slow_calls += bucket_slow
+        return calls, failures, slow_calls
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self.times_opened += 1
+
+    def _half_open(self):
+        self.state = HALF_OPEN
+        self._opened_at = self.clock()
+        self._probes_started = 0
+        self._probes_succeeded = 0
+
+    def _close(self):
+        self.state = CLOSED
+        for bucket in self._buckets:
+            bucket[:] = [-1, 0, 0, 0]
+
+    def stats(self):
+        with self._lock:
+            calls, failures, slow_calls = self._window_totals(int(self.clock()))
+            stats = {
+                "state": self.state,
+                "window_calls": calls,
+                "window_failures": failures,
+                "window_slow_calls": slow_calls,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened
+            }
+            if self.state == OPEN:
+                stats["retry_in_seconds"] = round(max(0.0, self._opened_at + self.open_seconds - self.clock()), 3)
+            return stats
@@ -0,0 +1,251 @@
+"""Hedged, deadline-aware upstream calls.
+
+The free model tier has a long latency tail: most answers arrive in a few
+seconds, a few take ten times longer. ``Hedger.run`` starts one attempt and,
+if it has not answered the recent p95 (``percentile``) upstream latency
+after it started running, sends a second identical request; whichever
+answers first wins. The timer starts when a worker picks the attempt up, so
+time spent queued behind a busy pool does not count, and no hedge is sent
+while every worker is taken. An attempt that fails early is replaced
+straight away. Callers can also pass an absolute ``time.monotonic()``
+deadline, after which ``DeadlineExceeded`` is raised so they can serve a
+fallback inside their SLO.
+
+Threads cannot be interrupted, so a losing synchronous attempt runs to
+completion in the background (its socket timeouts are clamped to the
+deadline by the caller); the asyncio variant cancels it.
+"""
+import asyncio
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed before any attempt answered"""
+
+
+def remaining_seconds(deadline):
+    """Seconds left before an absolute monotonic deadline (None: no deadline)"""
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return remaining
+
+
+def _consume_result(task):
+    # Abandoned attempts may still have failed; retrieve it so asyncio stays quiet
+    if not task.cancelled():
+        task.exception()
+
+
+class LatencyTracker:
+    """Sliding window of recent upstream latencies"""
+
+    def __init__(self, window=200, percentile=95, min_samples=20, default=5.0, floor=0.05):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default = default
+        self.floor = floor
+        self._samples = deque(maxlen=window)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            if len(self._samples) == self._samples.maxlen:
+                oldest = self._samples[0]
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._samples.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging: the configured percentile, or the default while warming up"""
+        with self._lock:
+            if len(self._sorted) < self.min_samples:
+                return self.default
+            index = min(len(self._sorted) - 1, int(len(self._sorted) * self.percentile / 100))
+            return max(self.floor, self._sorted[index])
+
+
+class Hedger:
+    def __init__(self, max_workers=32, max_attempts=2, percentile=95, window=200,
+                 min_samples=20, default_delay=5.0, min_delay=0.05, clock=time.monotonic):
+        self.max_workers = max_workers
+        self.max_attempts = max(1, max_attempts)
+        self.latency = LatencyTracker(window, percentile, min_samples, default_delay, min_delay)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.runs = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.deadlines_exceeded = 0
+
+    def _count(self, field, delta=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def _saturated(self):
+        with self._lock:
+            return self._in_flight >= self.max_workers
+
+    def _next_wake(self, launched, next_hedge, deadline):
+        wake = next_hedge if launched < self.max_attempts else None
+        if deadline is not None:
+            wake = deadline if wake is None else min(wake, deadline)
+        return wake
+
+    def run(self, attempt, deadline=None):
+        """Call attempt(number) with hedging; returns the first successful result.
+
+        Raises DeadlineExceeded, or the last attempt's exception if every
+        attempt failed.
+        """
+        self._count("runs")
+        if deadline is not None and self._clock() >= deadline:
+            raise DeadlineExceeded()
+        hedge_delay = self.latency.hedge_delay()
+        pending = set()
+        launched = 0
+        last_error = None
+
+        def started(future, number):
+            # Resolved with the start time once a worker picks the attempt up
+            future.set_result(self._clock())
+            return attempt(number)
+
+        def finished(future):
+            self._count("_in_flight", -1)
+
+        def launch():
+            """Submit the next attempt; returns a future of the time it starts running"""
+            nonlocal launched
+            launched += 1
+            if launched > 1:
+                self._count("hedges")
+            start = Future()
+            self._count("_in_flight")
+            # Copy the context so tracing spans nest under the caller's
+            future = self._executor.submit(contextvars.copy_context().run, started, start, launched)
+            future.attempt = launched
+            future.add_done_callback(finished)
+            pending.add(future)
+            return start
+
+        start = launch()
+        next_hedge = None
+        while pending:
+            if next_hedge is None and start.done():
+                next_hedge = start.result() + hedge_delay
+            wake = self._next_wake(launched, next_hedge, deadline)
+            timeout = None if wake is None else max(0.0, wake - self._clock())
+            # Until the newest attempt is running, its start is what the timer waits for
+            watched = pending if next_hedge is not None or launched >= self.max_attempts else pending | {start}
+            done, _ = wait(watched, timeout=timeout, return_when=FIRST_COMPLETED)
+            done.discard(start)
+            pending -= done
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future.attempt > 1:
+                    self._count("hedge_wins")
+                return result
+
+            now = self._clock()
+            if deadline is not None and now >= deadline:
+                self._count("deadlines_exceeded")
+                raise DeadlineExceeded()
+            if launched >= self.max_attempts:
+                continue
+            if not pending:
+                start = launch()
+                next_hedge = None
+            elif next_hedge is not None and now >= next_hedge:
+                if self._saturated():
+                    # A queued hedge would only delay other callers' first attempts
+                    self._count("hedges_skipped")
+                    next_hedge = now + hedge_delay
+                else:
+                    start = launch()
+                    next_hedge = None
+
+        if isinstance(last_error, DeadlineExceeded):
+            self._count("deadlines_exceeded")
+        raise last_error
+
+    async def run_async(self, attempt, deadline=None):
+        """asyncio twin of run(); attempt(number) returns an awaitable, losers are cancelled"""
+        self._count("runs")
+        remaining_seconds(deadline)
+        loop = asyncio.get_running_loop()
+        hedge_delay = self.latency.hedge_delay()
+        pending = set()
+        launched = 0
+        last_error = None
+
+        def launch():
+            nonlocal launched
+            launched += 1
+            if launched > 1:
+                self._count("hedges")
+            task = asyncio.ensure_future(attempt(launched))
+            task.attempt = launched
+            pending.add(task)
+
+        try:
+            launch()
+            next_hedge = loop.time() + hedge_delay
+            # Deadlines are time.monotonic() values; the loop clock may differ
+            loop_deadline = None if deadline is None else loop.time() + (deadline - time.monotonic())
+            while pending:
+                wake = self._next_wake(launched, next_hedge, loop_deadline)
+                timeout = None if wake is None else max(0.0, wake - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if task.attempt > 1:
+                        self._count("hedge_wins")
+                    return result
+
+                now = loop.time()
+                if loop_deadline is not None and now >= loop_deadline:
+                    self._count("deadlines_exceeded")
+                    raise DeadlineExceeded()
+                if launched < self.max_attempts and (now >= next_hedge or not pending):
+                    launch()
+                    next_hedge = now + hedge_delay
+
+            if isinstance(last_error, DeadlineExceeded):
+                self._count("deadlines_exceeded")
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_consume_result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_attempts": self.max_attempts,
+                "hedge_delay_ms": round(self.latency.hedge_delay() * 1000, 1),
+                "runs": self.runs,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedges_skipped": self.hedges_skipped,
+                "deadlines_exceeded": self.deadlines_exceeded
+            }
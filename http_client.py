@@ -0,0 +1,103 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Deadline of the post() running on this thread; urllib3 retries on the calling thread
+_call = threading.local()
+
+
+class _DeadlineRetry(Retry):
+    """Retry that gives up when the backoff would run past the current post()'s deadline"""
+
+    def is_exhausted(self):
+        deadline = getattr(_call, "deadline", None)
+        if deadline is not None and time.monotonic() + self.get_backoff_time() >= deadline:
+            return True
+        return super().is_exhausted()
+
+
+class PooledHTTPClient:
+    """Keep-alive HTTP client backed by one shared urllib3 connection pool.
+
+    ``requests.Session`` objects are not guaranteed to be thread-safe (cookie
+    jar, adapters dict), but the underlying urllib3 pool manager is. Each
+    thread therefore gets its own lightweight session, and all of them mount
+    the same ``HTTPAdapter`` so TCP/TLS connections are reused process-wide.
+
+    Only connection failures are retried: a POST that reached the upstream
+    may be billed, so read errors and 429/5xx answers go back to the caller
+    (and its circuit breaker) instead of being replayed.
+    """
+
+    def __init__(self, pool_size=10, retries=2, backoff_factor=0.5,
+                 connect_timeout=5.0, read_timeout=30.0, pool_block=False):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        retry = _DeadlineRetry(
+            total=retries,
+            connect=retries,
+            read=0,  # never replay a request the upstream may still be billing
+            status=0,
+            other=0,
+            backoff_factor=backoff_factor,
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            pool_block=pool_block
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+            self._local.session = session
+        return session
+
+    def post(self, url, deadline=None, **kwargs):
+        """session.post on this thread's session; deadline (a time.monotonic()
+        value) stops connect retries that could not start before it"""
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.requests_sent += 1
+        _call.deadline = deadline
+        try:
+            return self.session.post(url, **kwargs)
+        finally:
+            _call.deadline = None
+
+    def stats(self):
+        """Per-host pool usage, for sizing pool_size"""
+        pools = []
+        manager = self.adapter.poolmanager
+        with manager.pools.lock:
+            active = list(manager.pools._container.items())
+        for key, pool in active:
+            pools.append({
+                "host": f"{key.key_scheme}://{key.key_host}:{key.key_port}",
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                "max_size": pool.pool.maxsize if pool.pool is not None else 0
+            })
+        return {
+            "pool_size": self.pool_size,
+            "connect_timeout": self.timeout[0],
+            "read_timeout": self.timeout[1],
+            "requests_sent": self.requests_sent,
+            "pools": pools
+        }
+
+    def close(self):
+        self.adapter.close()
@@ -0,0 +1,384 @@
+"""Linear-time regex matching for the backtracking-free subset of patterns.
+
+Patterns are parsed with the ``re`` module's own parser and compiled into a
+Thompson NFA that is simulated Pike-VM style: every position of the input is
+visited once, with at most one thread per NFA state, so matching is
+O(len(pattern) * len(string)) regardless of how ambiguous the pattern is.
+Thread priorities replicate backtracking order, so results (including groups
+and lazy quantifiers) are the same as ``re.findall``.
+
+Backreferences, lookarounds, conditionals, atomic groups, possessive repeats
+and case-insensitive or locale flags are not supported; ``compile_linear``
+raises ``UnsupportedPattern`` for them. When the optional ``re2`` module
+(google-re2) is installed it is used instead of the pure-Python VM.
+"""
+import re
+import sys
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+try:
+    import re2 as native_re2
+except ImportError:
+    native_re2 = None
+
+from match_results import findall_item
+
+MAXREPEAT = sre_constants.MAXREPEAT
+MAX_PROGRAM_SIZE = 20000
+
+CHAR, SPLIT, JMP, SAVE, ASSERT, MATCH = range(6)
+
+
+class UnsupportedPattern(ValueError):
+    """Pattern uses a feature the linear-time engine cannot run"""
+
+
+def _category_test(category):
+    c = sre_constants
+    if category == c.CATEGORY_DIGIT:
+        return str.isdecimal
+    if category == c.CATEGORY_NOT_DIGIT:
+        return lambda ch: not ch.isdecimal()
+    if category == c.CATEGORY_SPACE:
+        return str.isspace
+    if category == c.CATEGORY_NOT_SPACE:
+        return lambda ch: not ch.isspace()
+    if category == c.CATEGORY_WORD:
+        return lambda ch: ch.isalnum() or ch == "_"
+    if category == c.CATEGORY_NOT_WORD:
+        return lambda ch: not (ch.isalnum() or ch == "_")
+    raise UnsupportedPattern(f"unsupported character category {category}")
+
+
+def _set_test(items):
+    """Predicate for a [...] character class"""
+    negate = False
+    literals = set()
+    ranges = []
+    categories = []
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            literals.add(chr(av))
+        elif op == sre_constants.RANGE:
+            ranges.append((chr(av[0]), chr(av[1])))
+        elif op == sre_constants.CATEGORY:
+            categories.append(_category_test(av))
+        else:
+            raise UnsupportedPattern(f"unsupported character class item {op}")
+
+    literals = frozenset(literals)
+    if not ranges and not categories:
+        test = literals.__contains__
+    else:
+        def test(ch):
+            if ch in literals:
+                return True
+            for lo, hi in ranges:
+                if lo <= ch <= hi:
+                    return True
+            for category in categories:
+                if category(ch):
+                    return True
+            return False
+
+    if negate:
+        return lambda ch: not test(ch)
+    return test
+
+
+def _nullable(items):
+    """True if a token list can match the empty string"""
+    for op, av in items:
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            if av[0] > 0 and not _nullable(av[2]):
+                return False
+        elif op == sre_constants.SUBPATTERN:
+            if not _nullable(av[3]):
+                return False
+        elif op == sre_constants.BRANCH:
+            if not any(_nullable(branch) for branch in av[1]):
+                return False
+        elif op != sre_constants.AT:
+            return False
+    return True
+
+
+class _Compiler:
+    def __init__(self, flags):
+        self.flags = flags
+        self.program = []
+
+    def emit(self, *instruction):
+        if len(self.program) >= MAX_PROGRAM_SIZE:
+            raise UnsupportedPattern("pattern expands to too many NFA states")
+        self.program.append(list(instruction))
+        return len(self.program) - 1
+
+    def sequence(self, items):
+        for op, av in items:
+            self.item(op, av)
+
+    def item(self, op, av):
+        c = sre_constants
+        if op == c.LITERAL:
+            self.emit(CHAR, chr(av).__eq__)
+        elif op == c.NOT_LITERAL:
+            self.emit(CHAR, chr(av).__ne__)
+        elif op == c.ANY:
+            if self.flags & re.DOTALL:
+                self.emit(CHAR, lambda ch: True)
+            else:
+                self.emit(CHAR, "\n".__ne__)
+        elif op == c.IN:
+            self.emit(CHAR, _set_test(av))
+        elif op == c.AT:
+            self.emit(ASSERT, av)
+        elif op == c.SUBPATTERN:
+            group, add_flags, del_flags, items = av
+            if add_flags or del_flags:
+                raise UnsupportedPattern("inline flag groups are not supported")
+            if group is None:
+                self.sequence(items)
+            else:
+                self.emit(SAVE, 2 * group)
+                self.sequence(items)
+                self.emit(SAVE, 2 * group + 1)
+        elif op == c.BRANCH:
+            self.branch(av[1])
+        elif op in (c.MAX_REPEAT, c.MIN_REPEAT):
+            self.repeat(av[0], av[1], av[2], greedy=op == c.MAX_REPEAT)
+        else:
+            raise UnsupportedPattern(f"{str(op).lower()} is not supported by the linear engine")
+
+    def branch(self, alternatives):
+        jumps = []
+        for i, alternative in enumerate(alternatives):
+            if i == len(alternatives) - 1:
+                self.sequence(alternative)
+                break
+            split = self.emit(SPLIT, None, None)
+            self.sequence(alternative)
+            jumps.append(self.emit(JMP, None))
+            self.program[split][1:] = [split + 1, len(self.program)]
+        for jump in jumps:
+            self.program[jump][1] = len(self.program)
+
+    def _split(self, at, out, greedy):
+        self.program[at][1:] = [at + 1, out] if greedy else [out, at + 1]
+
+    def repeat(self, minimum, maximum, body, greedy):
+        if maximum == MAXREPEAT and _nullable(body):
+            # sre stops iterating on an empty body match; the VM would not
+            raise UnsupportedPattern("unbounded repeat of a possibly-empty group")
+        for _ in range(minimum):
+            self.sequence(body)
+        if maximum == MAXREPEAT:
+            loop = self.emit(SPLIT, None, None)
+            self.sequence(body)
+            self.emit(JMP, loop)
+            self._split(loop, len(self.program), greedy)
+        else:
+            splits = []
+            for _ in range(maximum - minimum):
+                splits.append(self.emit(SPLIT, None, None))
+                self.sequence(body)
+            for split in splits:
+                self._split(split, len(self.program), greedy)
+
+
+def _is_word(string, pos):
+    return 0 <= pos < len(string) and (string[pos].isalnum() or string[pos] == "_")
+
+
+def _check_assertion(code, string, pos, multiline):
+    c = sre_constants
+    n = len(string)
+    if code in (c.AT_BEGINNING, c.AT_BEGINNING_LINE):
+        return pos == 0 or ((multiline or code == c.AT_BEGINNING_LINE) and string[pos - 1] == "\n")
+    if code == c.AT_BEGINNING_STRING:
+        return pos == 0
+    if code in (c.AT_END, c.AT_END_LINE):
+        if pos == n or (pos < n and string[pos] == "\n" and (pos == n - 1 or multiline or code == c.AT_END_LINE)):
+            return True
+        return False
+    if code == c.AT_END_STRING:
+        return pos == n
+    if code == c.AT_BOUNDARY:
+        return _is_word(string, pos - 1) != _is_word(string, pos)
+    if code == c.AT_NON_BOUNDARY:
+        return n > 0 and _is_word(string, pos - 1) == _is_word(string, pos)
+    raise UnsupportedPattern(f"unsupported assertion {code}")
+
+
+class LinearPattern:
+    """Compiled pattern executed by a Pike VM (no backtracking)"""
+
+    engine = "nfa"
+
+    def __init__(self, pattern, flags=0):
+        parsed = sre_parse.parse(pattern, flags)
+        flags = parsed.state.flags
+        if flags & (re.IGNORECASE | re.LOCALE):
+            raise UnsupportedPattern("case-insensitive and locale matching are not supported")
+        if flags & re.ASCII:
+            raise UnsupportedPattern("ASCII-only character classes are not supported")
+
+        self.pattern = pattern
+        self.flags = flags
+        self.groups = parsed.state.groups - 1
+        self.multiline = bool(flags & re.MULTILINE)
+
+        # Cheap search shortcuts: an anchored pattern can only start at 0, and
+        # a literal first character lets idle stretches be skipped with str.find
+        first_op, first_av = parsed[0] if len(parsed) else (None, None)
+        self.anchored = first_op == sre_constants.AT and (
+            first_av == sre_constants.AT_BEGINNING_STRING
+            or (first_av == sre_constants.AT_BEGINNING and not self.multiline)
+        )
+        self.first_char = chr(first_av) if first_op == sre_constants.LITERAL else None
+
+        compiler = _Compiler(flags)
+        compiler.emit(SAVE, 0)
+        compiler.sequence(list(parsed))
+        compiler.emit(SAVE, 1)
+        compiler.emit(MATCH)
+        self.program = compiler.program
+        for instruction in self.program:
+            if instruction[0] == ASSERT:
+                # Validate assertion codes up front rather than mid-match
+                _check_assertion(instruction[1], "", 0, self.multiline)
+
+    @property
+    def approximate_size(self):
+        """Rough memory footprint, used by CompiledPatternCache"""
+        return sys.getsizeof(self.pattern) + len(self.program) * 160
+
+    def _add(self, threads, marks, pc, caps, string, pos):
+        """Follow epsilon transitions from pc, appending runnable threads in priority order"""
+        program = self.program
+        stack = [(pc, caps)]
+        while stack:
+            pc, caps = stack.pop()
+            if marks[pc] == pos:
+                continue
+            marks[pc] = pos
+            instruction = program[pc]
+            op = instruction[0]
+            if op == JMP:
+                stack.append((instruction[1], caps))
+            elif op == SPLIT:
+                stack.append((instruction[2], caps))
+                stack.append((instruction[1], caps))
+            elif op == SAVE:
+                slot = instruction[1]
+                stack.append((pc + 1, caps[:slot] + (pos,) + caps[slot + 1:]))
+            elif op == ASSERT:
+                if _check_assertion(instruction[1], string, pos, self.multiline):
+                    stack.append((pc + 1, caps))
+            else:
+                threads.append((pc, caps))
+
+    def _search(self, string, start, must_advance):
+        """Leftmost-first match starting at or after start, as a capture tuple"""
+        program = self.program
+        n = len(string)
+        marks = [-1] * len(program)
+        empty_caps = (None,) * (2 * self.groups + 2)
+        threads = []
+        matched = None
+        pos = start
+
+        while True:
+            if matched is None:
+                if not threads:
+                    if self.anchored and pos > 0:
+                        break
+                    if self.first_char is not None:
+                        pos = string.find(self.first_char, pos)
+                        if pos < 0:
+                            break
+                self._add(threads, marks, 0, empty_caps, string, pos)
+            elif not threads:
+                break
+
+            next_threads = []
+            ch = string[pos] if pos < n else None
+            for pc, caps in threads:
+                instruction = program[pc]
+                if instruction[0] == MATCH:
+                    if must_advance and pos == start:
+                        continue  # empty match where the previous one ended
+                    matched = caps
+                    break  # lower-priority threads are cut
+                if ch is not None and instruction[1](ch):
+                    self._add(next_threads, marks, pc + 1, caps, string, pos + 1)
+
+            if pos >= n:
+                break
+            threads = next_threads
+            pos += 1
+        return matched
+
+    def finditer_spans(self, string):
+        """Yield capture tuples (start, end, g1_start, g1_end, ...) like re.finditer"""
+        pos = 0
+        must_advance = False
+        n = len(string)
+        while pos <= n:
+            caps = self._search(string, pos, must_advance)
+            if caps is None:
+                return
+            yield caps
+            must_advance = caps[0] == caps[1]
+            pos = caps[1]
+
+    def findall(self, string):
+        return [findall_item(string, caps, self.groups) for caps in self.finditer_spans(string)]
+
+
+class NativePattern:
+    """re2-backed pattern (linear time, implemented in C++)"""
+
+    engine = "re2"
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self._compiled = native_re2.compile(pattern, flags)
+        self.groups = self._compiled.groups
+
+    def findall(self, string):
+        return self._compiled.findall(string)
+
+    def finditer_spans(self, string):
+        """Capture tuples like LinearPattern.finditer_spans"""
+        for match in self._compiled.finditer(string):
+            yield tuple(
+                None if position < 0 else position
+                for group in range(self.groups + 1)
+                for position in match.span(group)
+            )
+
+
+def compile_linear(pattern, flags=0, native=True):
+    """Compile a pattern for linear-time matching.
+
+    Raises ``re.error`` for invalid patterns and ``UnsupportedPattern`` when
+    the pattern needs backtracking features.
+    """
+    # Always validate with the Python engine first so the supported subset
+    # (and every error message) is the same whichever backend runs it
+    linear = LinearPattern(pattern, flags)
+    if native and native_re2 is not None:
+        try:
+            return NativePattern(pattern, flags)
+        except Exception:
+            return linear
+    return linear
@@ -0,0 +1,106 @@
+"""Non-blocking, leveled logging for the service.
+
+Request threads only push records onto an in-memory queue (``QueueHandler``);
+a background ``QueueListener`` thread formats and writes them, so slow stdout
+or a slow log collector never adds latency to a request. Payload dumps
+(request bodies, upstream responses) go to a separate logger that is disabled
+unless LOG_PAYLOADS is set, so their JSON is never even serialized otherwise.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+
+LOGGER_NAME = "smart_regex"
+PAYLOAD_LOGGER_NAME = "smart_regex.payloads"
+
+_listener = None
+
+
+class LazyJSON:
+    """Defers json.dumps until a log record is actually formatted"""
+
+    __slots__ = ("obj", "indent")
+
+    def __init__(self, obj, indent=2):
+        self.obj = obj
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.obj, indent=self.indent, default=str)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _start_listener(handler):
+    global _listener
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    _listener = listener
+    return log_queue
+
+
+def configure_logging(level=None, fmt=None, payloads=None, stream=None):
+    """Install the queue-based handler on the service logger (idempotent).
+
+    Defaults come from LOG_LEVEL (INFO), LOG_FORMAT (text or json) and
+    LOG_PAYLOADS (false).
+    """
+    level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "text").lower()
+    if payloads is None:
+        payloads = os.getenv("LOG_PAYLOADS", "False").lower() == "true"
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    # Payload dumps are opt-in regardless of LOG_LEVEL
+    logging.getLogger(PAYLOAD_LOGGER_NAME).setLevel(logging.DEBUG if payloads else logging.CRITICAL + 1)
+
+    if _listener is not None:
+        return logger
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if fmt == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"))
+
+    queue_handler = logging.handlers.QueueHandler(_start_listener(handler))
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    # The listener thread does not survive fork (gunicorn --preload), so each
+    # child starts its own on a fresh queue
+    def restart_in_child():
+        queue_handler.queue = _start_listener(handler)
+
+    os.register_at_fork(after_in_child=restart_in_child)
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging():
+    """Flush queued records; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,172 @@
+"""Columnar match results for /api/test.
+
+``re.findall`` output loses offsets and turns grouped patterns into tuples,
+so the browser re-runs the regex just to highlight matches. The columnar
+format instead returns one integer column per span boundary, which is small
+to send and needs no client-side matching.
+
+Every engine's matches are first reduced to capture tuples
+``(start, end, g1_start, g1_end, ...)`` with None for groups that did not
+take part, the shape ``LinearPattern.finditer_spans`` already yields. They
+are then encoded in one of two ways:
+
+delta (JSON lists)
+    ``start`` holds each match's distance from the previous match's start,
+    and ``length`` holds its length. For each group, ``start`` is relative
+    to its match's start and ``length`` is the group's length; both are
+    null when the group did not match.
+base64 (typed arrays)
+    The same columns, each packed little-endian in the smallest integer
+    type that holds it and sent as ``{"dtype": "uint8", "data": <base64>}``.
+    Unmatched groups have length -1 (and start 0). In a browser a column
+    decodes with the typed array ``dtype`` names, e.g.
+    ``new Uint16Array(Uint8Array.from(atob(data), c => c.charCodeAt(0)).buffer)``.
+"""
+import base64
+import sys
+from array import array
+
+COLUMNAR_ENCODINGS = ("delta", "base64")
+
+# /api/test modes: every match, only how many, only whether any, or just the first
+TEST_MODES = ("all", "count", "exists", "first")
+
+
+def re_spans(compiled, string):
+    """Capture tuples for every match of a compiled ``re`` pattern"""
+    for match in compiled.finditer(string):
+        yield tuple(None if position < 0 else position for span in match.regs for position in span)
+
+
+def findall_item(string, caps, group_count):
+    """The re.findall entry for one capture tuple"""
+    if group_count == 0:
+        return string[caps[0]:caps[1]]
+    groups = tuple(
+        string[caps[2 * g]:caps[2 * g + 1]] if caps[2 * g] is not None else ""
+        for g in range(1, group_count + 1)
+    )
+    return groups[0] if group_count == 1 else groups
+
+
+def re_mode(mode, compiled, string):
+    """(matches, match_count) for a test mode, with a compiled ``re`` pattern.
+
+    count steps the pattern's scanner without keeping anything, so only one
+    Match is alive at a time (the fastest way to count in constant memory;
+    findall is a little quicker on very dense patterns but holds every
+    match). exists and first stop at the first hit; for those two
+    match_count is 0 or 1, and only first returns the match itself.
+    """
+    if mode == "count":
+        search = compiled.scanner(string).search
+        match_count = 0
+        while search():
+            match_count += 1
+        return [], match_count
+    if mode in ("exists", "first"):
+        match = compiled.search(string)
+        if match is None:
+            return [], 0
+        if mode == "exists":
+            return [], 1
+        groups = match.groups("")
+        return [match.group() if not groups else groups[0] if len(groups) == 1 else groups], 1
+    matches = compiled.findall(string)
+    return matches, len(matches)
+
+
+def batch_row(output, compiled, strings):
+    """One /api/test/batch row: per string, whether it matches (booleans), its findall (matches) or a count"""
+    if output == "booleans":
+        return [compiled.search(s) is not None for s in strings]
+    if output == "matches":
+        return [compiled.findall(s) for s in strings]
+    return [sum(1 for _ in compiled.finditer(s)) for s in strings]
+
+
+def linear_mode(mode, linear, string):
+    """re_mode for a linear_match pattern"""
+    if mode == "all":
+        matches = linear.findall(string)
+        return matches, len(matches)
+    spans = linear.finditer_spans(string)
+    if mode == "count":
+        return [], sum(1 for _ in spans)
+    caps = next(spans, None)
+    if caps is None:
+        return [], 0
+    return ([findall_item(string, caps, linear.groups)] if mode == "first" else []), 1
+
+
+def page_spans(spans, offset=0, limit=None):
+    """(page, total): matches offset .. offset + limit of spans, and how many there are in all"""
+    page = []
+    total = 0
+    for caps in spans:
+        if total >= offset and (limit is None or len(page) < limit):
+            page.append(caps)
+        total += 1
+    return page, total
+
+
+# Smallest first: (JavaScript typed array name, array typecode, exclusive bound)
+_UNSIGNED_TYPES = (("uint8", "B", 1 << 8), ("uint16", "H", 1 << 16), ("uint32", "I", 1 << 32))
+_SIGNED_TYPES = (("int8", "b", 1 << 7), ("int16", "h", 1 << 15), ("int32", "i", 1 << 31))
+
+
+def _typed_column(values):
+    """{"dtype", "data"} for a list of ints, packed in the narrowest type that fits"""
+    low = min(values, default=0)
+    high = max(values, default=0)
+    types = _UNSIGNED_TYPES if low >= 0 else _SIGNED_TYPES
+    for dtype, typecode, bound in types:
+        if high < bound and (low >= 0 or low >= -bound):
+            break
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return {"dtype": dtype, "data": base64.b64encode(packed.tobytes()).decode("ascii")}
+
+
+def _delta_columns(page, group_count):
+    starts = []
+    previous = 0
+    for caps in page:
+        starts.append(caps[0] - previous)
+        previous = caps[0]
+    columns = {
+        "start": starts,
+        "length": [caps[1] - caps[0] for caps in page],
+        "groups": []
+    }
+    for group in range(1, group_count + 1):
+        columns["groups"].append({
+            "start": [None if caps[2 * group] is None else caps[2 * group] - caps[0] for caps in page],
+            "length": [None if caps[2 * group] is None else caps[2 * group + 1] - caps[2 * group] for caps in page]
+        })
+    return columns
+
+
+def _base64_columns(page, group_count):
+    columns = _delta_columns(page, group_count)
+    columns["start"] = _typed_column(columns["start"])
+    columns["length"] = _typed_column(columns["length"])
+    for group in columns["groups"]:
+        group["start"] = _typed_column([0 if start is None else start for start in group["start"]])
+        group["length"] = _typed_column([-1 if length is None else length for length in group["length"]])
+    return columns
+
+
+def encode_columnar(page, group_count, group_names=None, encoding="delta"):
+    """Columns for a page of capture tuples; group_names maps group index -> name"""
+    if encoding == "base64":
+        columns = _base64_columns(page, group_count)
+    else:
+        columns = _delta_columns(page, group_count)
+    for index, group in enumerate(columns["groups"], start=1):
+        group["group"] = index
+        group["name"] = (group_names or {}).get(index)
+    columns["encoding"] = encoding
+    columns["count"] = len(page)
+    return columns
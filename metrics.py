@@ -0,0 +1,290 @@
+"""Minimal Prometheus-style metrics that aggregate across gunicorn workers.
+
+Every process keeps its counters and histograms in plain dicts (one lock,
+no I/O on the hot path). When METRICS_DIR is set, a background thread writes
+a snapshot of the process's values to ``<METRICS_DIR>/metrics_<pid>_<start>.json``
+every ``flush_interval`` seconds. ``/metrics`` then sums all snapshot files,
+so every worker's requests are counted whichever worker serves the scrape.
+When a scrape finds the file of a worker that has exited, it folds that file
+into ``metrics_retired.json`` and deletes it, so counters never go backwards
+and worker restarts do not pile up files.
+"""
+import bisect
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RETIRED_FILE = "metrics_retired.json"
+
+
+class Counter:
+    def __init__(self, registry, name, help_text, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *label_values, amount=1):
+        key = (self.name, label_values)
+        registry = self.registry
+        with registry.lock:
+            registry.counters[key] = registry.counters.get(key, 0) + amount
+
+
+class Histogram:
+    def __init__(self, registry, name, help_text, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = (self.name, label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        registry = self.registry
+        with registry.lock:
+            series = registry.histograms.get(key)
+            if series is None:
+                # Per-bucket (not cumulative) counts plus +Inf, then sum
+                series = registry.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class MetricsRegistry:
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.metrics = {}
+        self.collectors = []
+        self._path = None
+        self._stop = threading.Event()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._start_flusher()
+            # Forked workers must neither inherit the parent's values nor its (dead) thread
+            os.register_at_fork(after_in_child=self._reset_in_child)
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(self, name, help_text, labelnames)
+        self.metrics[name] = metric
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, help_text, labelnames, buckets)
+        self.metrics[name] = metric
+        return metric
+
+    def register_collector(self, collector):
+        """Register a callable returning (counter_name, label_values, total) samples.
+
+        Collectors run only when a snapshot is taken, which suits components
+        that already keep their own cumulative counters (caches, pools).
+        """
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: list(series) for key, series in self.histograms.items()}
+        for collector in self.collectors:
+            for name, label_values, value in collector():
+                counters[(name, tuple(label_values))] = value
+        return _as_snapshot(counters, histograms)
+
+    def _start_flusher(self):
+        self._path = os.path.join(self.directory, f"metrics_{os.getpid()}_{int(time.time() * 1000)}.json")
+        thread = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        thread.start()
+
+    def _reset_in_child(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._stop = threading.Event()
+        self._start_flusher()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        """Atomically write this process's snapshot file"""
+        if not self._path:
+            return
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, self._path)
+
+    def collect(self):
+        """Aggregate this process (and, in multi-process mode, every worker's snapshot)"""
+        if not self.directory:
+            return _merge([self.snapshot()])
+        self.flush()
+        # Scrapes in other workers may be retiring files at the same time
+        with self._directory_lock():
+            self._retire_dead()
+            return _merge(_read_snapshots(glob.glob(os.path.join(self.directory, "metrics_*.json"))))
+
+    @contextmanager
+    def _directory_lock(self):
+        with open(os.path.join(self.directory, ".metrics.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _retire_dead(self):
+        """Fold the snapshot files of exited processes into RETIRED_FILE; caller holds the directory lock"""
+        dead = []
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            pid = _snapshot_pid(path)
+            if pid is not None and not _pid_alive(pid):
+                dead.append(path)
+        if not dead:
+            return
+        retired_path = os.path.join(self.directory, RETIRED_FILE)
+        snapshots = _read_snapshots([retired_path])
+        readable = []
+        for path in dead:
+            loaded = _read_snapshots([path])
+            if loaded:
+                snapshots.extend(loaded)
+                readable.append(path)
+        if not readable:
+            return
+        tmp_path = f"{retired_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_as_snapshot(*_merge(snapshots)), f)
+        os.replace(tmp_path, retired_path)
+        for path in readable:
+            for leftover in (path, f"{path}.tmp"):
+                try:
+                    os.remove(leftover)
+                except FileNotFoundError:
+                    pass
+
+    def render(self):
+        """Prometheus text exposition format"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            if isinstance(metric, Counter):
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} counter")
+                for (sample_name, labels), value in sorted(counters.items()):
+                    if sample_name == name:
+                        lines.append(f"{name}{_labels(metric.labelnames, labels)} {value}")
+            else:
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} histogram")
+                for (sample_name, labels), series in sorted(histograms.items()):
+                    if sample_name != name:
+                        continue
+                    cumulative = 0
+                    bounds = [str(bound) for bound in metric.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, series[:-1]):
+                        cumulative += count
+                        bucket_labels = _labels(metric.labelnames + ("le",), labels + (bound,))
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {series[-1]}")
+                    lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _snapshot_pid(path):
+    """The pid in a metrics_<pid>_<start>.json name, or None (e.g. for RETIRED_FILE)"""
+    parts = os.path.basename(path)[len("metrics_"):-len(".json")].split("_")
+    if len(parts) == 2 and parts[0].isdigit():
+        return int(parts[0])
+    return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by someone else
+    return True
+
+
+def _read_snapshots(paths):
+    snapshots = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # missing, or being replaced; picked up next scrape
+    return snapshots
+
+
+def _as_snapshot(counters, histograms):
+    """JSON-ready snapshot of (name, labels)-keyed counter and histogram dicts"""
+    return {
+        "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+        "histograms": [[name, list(labels), series] for (name, labels), series in histograms.items()]
+    }
+
+
+def _merge(snapshots):
+    """Summed (counters, histograms) dicts of several snapshots"""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in snapshot["histograms"]:
+            key = (name, tuple(labels))
+            total = histograms.get(key)
+            if total is None or len(total) != len(series):
+                histograms[key] = list(series)
+            else:
+                histograms[key] = [a + b for a, b in zip(total, series)]
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
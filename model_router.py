@@ -0,0 +1,145 @@
+"""Routing between several models / providers.
+
+MODEL_POOL is a JSON list of endpoints, for example::
+
+    [{"name": "r1-free", "model": "deepseek/deepseek-r1:free"},
+     {"name": "r1-paid", "model": "deepseek/deepseek-r1", "cost": 0.5},
+     {"name": "local", "model": "qwen2.5-coder", "url": "http://127.0.0.1:8080/v1/chat/completions",
+      "api_key_env": "LOCAL_LLM_KEY", "latency_weight": 0.5}]
+
+``url`` defaults to OpenRouter and ``api_key_env`` to DEEPSEEK_API_KEY.
+Every call feeds an EWMA of the endpoint's latency and success rate, and
+endpoints are tried in order of
+
+    latency_weight * ewma_latency_seconds + cost + failure_penalty * (1 - success_rate) * decay
+
+(lower is better), where ``decay`` halves every ``recovery_half_life``
+seconds since the endpoint last failed, so a model that had an outage is
+retried once it has had time to recover. Callers fail over down that list
+when an endpoint errors. Endpoints that have never been called score zero
+latency, so each one is tried early on; afterwards a small ``explore``
+share of requests starts with a random other endpoint.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+DEFAULT_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+class ModelEndpoint:
+    def __init__(self, name, model, url=DEFAULT_URL, api_key=None, cost=0.0,
+                 latency_weight=1.0, circuit_breaker=None):
+        self.name = name
+        self.model = model
+        self.url = url
+        self.api_key = api_key
+        self.cost = cost
+        self.latency_weight = latency_weight
+        self.circuit_breaker = circuit_breaker
+        self.ewma_latency = None
+        self.success_rate = 1.0
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_failure_at = None
+
+
+class ModelRouter:
+    def __init__(self, endpoints, alpha=0.2, failure_penalty=10.0, explore=0.05,
+                 recovery_half_life=30.0, clock=time.monotonic):
+        if not endpoints:
+            raise ValueError("A model pool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.explore = explore
+        self.recovery_half_life = recovery_half_life
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def score(self, endpoint, now=None):
+        latency = endpoint.ewma_latency or 0.0
+        penalty = self.failure_penalty * (1.0 - endpoint.success_rate)
+        if penalty and endpoint.last_failure_at is not None and self.recovery_half_life > 0:
+            now = self.clock() if now is None else now
+            penalty *= 0.5 ** ((now - endpoint.last_failure_at) / self.recovery_half_life)
+        return endpoint.latency_weight * latency + endpoint.cost + penalty
+
+    def ranked(self):
+        """Endpoints in the order they should be tried for one request"""
+        now = self.clock()
+        with self._lock:
+            ranked = sorted(self.endpoints, key=lambda endpoint: self.score(endpoint, now))
+        if len(ranked) > 1 and self.explore > 0 and random.random() < self.explore:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def record(self, endpoint, latency, success, error=None):
+        """Feed one call's outcome into the endpoint's moving averages"""
+        alpha = self.alpha
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.success_rate = (1 - alpha) * endpoint.success_rate + alpha * (1.0 if success else 0.0)
+            if success:
+                # Failed calls often return fast and would flatter the latency
+                if endpoint.ewma_latency is None:
+                    endpoint.ewma_latency = latency
+                else:
+                    endpoint.ewma_latency = (1 - alpha) * endpoint.ewma_latency + alpha * latency
+            else:
+                endpoint.failures += 1
+                endpoint.last_error = error
+                endpoint.last_failure_at = self.clock()
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            return [
+                {
+                    "name": endpoint.name,
+                    "model": endpoint.model,
+                    "url": endpoint.url,
+                    "requests": endpoint.requests,
+                    "failures": endpoint.failures,
+                    "success_rate": round(endpoint.success_rate, 4),
+                    "ewma_latency_ms": round(endpoint.ewma_latency * 1000, 1) if endpoint.ewma_latency is not None else None,
+                    "cost": endpoint.cost,
+                    "latency_weight": endpoint.latency_weight,
+                    "score": round(self.score(endpoint, now), 4),
+                    "last_error": endpoint.last_error,
+                    "circuit": endpoint.circuit_breaker.stats()["state"] if endpoint.circuit_breaker else None
+                }
+                for endpoint in sorted(self.endpoints, key=lambda endpoint: self.score(endpoint, now))
+            ]
+
+
+def load_model_pool(spec, default_api_key=None, breaker_factory=None):
+    """Parse a MODEL_POOL JSON list into ModelEndpoints.
+
+    Raises ValueError for malformed specs so misconfiguration fails at startup.
+    """
+    try:
+        entries = json.loads(spec)
+    except ValueError as e:
+        raise ValueError(f"MODEL_POOL is not valid JSON: {e}")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("MODEL_POOL must be a non-empty JSON list")
+
+    endpoints = []
+    for entry in entries:
+        if not isinstance(entry, dict) or "model" not in entry:
+            raise ValueError(f"MODEL_POOL entry needs a 'model': {entry!r}")
+        api_key_env = entry.get("api_key_env")
+        endpoints.append(ModelEndpoint(
+            name=entry.get("name", entry["model"]),
+            model=entry["model"],
+            url=entry.get("url", DEFAULT_URL),
+            api_key=os.getenv(api_key_env) if api_key_env else default_api_key,
+            cost=float(entry.get("cost", 0.0)),
+            latency_weight=float(entry.get("latency_weight", 1.0)),
+            circuit_breaker=breaker_factory() if breaker_factory else None
+        ))
+    return endpoints
@@ -0,0 +1,107 @@
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+
+class CompiledPatternCache:
+    """Thread-safe LRU cache of compiled regex patterns.
+
+    Bounded both by entry count and by an approximate memory budget, so a
+    flood of distinct patterns from many tenants cannot grow it without limit
+    (unlike the tiny internal cache of the ``re`` module, which is cleared
+    wholesale once it fills up).
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, compiler=re.compile):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compiler = compiler
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _estimate_size(pattern, compiled):
+        """Rough memory footprint of a compiled pattern.
+
+        The compiled program size is not exposed by ``re``, so it is
+        approximated from the source length and the number of groups, unless
+        the compiled object reports its own ``approximate_size``.
+        """
+        hint = getattr(compiled, "approximate_size", None)
+        if hint is not None:
+            return hint
+        return (
+            sys.getsizeof(pattern)
+            + sys.getsizeof(compiled)
+            + len(pattern) * 32
+            + compiled.groups * 64
+        )
+
+    def compile(self, pattern, flags=0):
+        """Return a compiled pattern, compiling and caching it on a miss.
+
+        Raises whatever the compiler raises (``re.error`` for invalid
+        patterns); failures are never cached.
+        """
+        key = (pattern, flags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        compiled = self.compiler(pattern, flags)
+        size = self._estimate_size(pattern, compiled)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (compiled, size)
+                self._bytes += size
+                self._evict()
+        return compiled
+
+    def _evict(self):
+        # Caller holds the lock
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def warm(self, patterns, flags=0):
+        """Precompile an iterable of patterns, skipping invalid ones"""
+        warmed = 0
+        for pattern in patterns:
+            try:
+                self.compile(pattern, flags)
+                warmed += 1
+            except re.error:
+                continue
+        return warmed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
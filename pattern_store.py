@@ -0,0 +1,364 @@
+"""Persistent, append-only store of generated patterns.
+
+Layout of the store directory:
+
+``patterns.log``
+    Records appended back to back: an 8-byte header (payload length, CRC32)
+    followed by a compact JSON payload with the normalized prompt, regex,
+    model, timestamp and validation outcome. Never rewritten in place.
+``patterns.idx``
+    Open-addressing hash table, memory-mapped by every process: a 64-byte
+    header, then ``capacity`` 16-byte slots of (64-bit key hash, log offset).
+    A lookup hashes the prompt, probes a few slots and preads one record, so
+    answering from disk takes microseconds and nothing is loaded up front.
+``patterns.lock``
+    ``fcntl.flock`` target serializing writers across gunicorn workers.
+
+Readers take no file lock. Writers append the record before publishing its
+slot (offset first, hash last), and readers verify the CRC and the prompt
+of what they read, so a half-written entry is just a miss. Growing the
+table and compaction build new files and ``os.replace`` them in; the old
+index is then flagged as retired, which tells every process still mapping
+it to reopen.
+"""
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from response_cache import normalize_prompt
+
+MAGIC = b"RXSTORE1"
+# magic, version, retired, capacity, count (live keys), records (in log), indexed log size
+HEADER = struct.Struct("<8sIIQQQQ")
+HEADER_SIZE = 64
+SLOT = struct.Struct("<QQ")
+RECORD_HEADER = struct.Struct("<II")
+RETIRED_OFFSET = 12
+
+
+def _key_hash(key):
+    # Zero marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def _slot_capacity(entries, max_load):
+    capacity = 64
+    while entries > capacity * max_load:
+        capacity *= 2
+    return capacity
+
+
+class _Files:
+    """Open log descriptor and index mapping, closed only once no lookup uses them"""
+
+    def __init__(self, log_path, index_path):
+        self.log_fd = os.open(log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        with open(index_path, "r+b") as f:
+            self.index = mmap.mmap(f.fileno(), 0)
+        magic, _, _, self.capacity, _, _, _ = HEADER.unpack_from(self.index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a pattern store index")
+
+    def retired(self):
+        return struct.unpack_from("<I", self.index, RETIRED_OFFSET)[0] != 0
+
+    def read_record(self, offset):
+        """Decoded record at a log offset, or None if it is incomplete or corrupt"""
+        header = os.pread(self.log_fd, RECORD_HEADER.size, offset)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        length, crc = RECORD_HEADER.unpack(header)
+        payload = os.pread(self.log_fd, length, offset + RECORD_HEADER.size)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return None
+        return json.loads(payload)
+
+    def __del__(self):
+        try:
+            self.index.close()
+            os.close(self.log_fd)
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
+class PatternStore:
+    def __init__(self, directory, max_load=0.7, compact_ratio=2.0, compact_min_records=1000):
+        self.directory = directory
+        self.max_load = max_load
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        self.log_path = os.path.join(directory, "patterns.log")
+        self.index_path = os.path.join(directory, "patterns.idx")
+        self.lock_path = os.path.join(directory, "patterns.lock")
+        os.makedirs(directory, exist_ok=True)
+
+        # Reentrant: a writer holding it may need to reopen retired files
+        self._lock = threading.RLock()
+        # Lookups take no file lock; this only guards the hit/miss counters
+        self._stats_lock = threading.Lock()
+        self._open_lock_file()
+        self.hits = 0
+        self.misses = 0
+        self.appends = 0
+        self.compactions = 0
+
+        with self._file_lock():
+            if not os.path.exists(self.index_path):
+                self._write_index(self.index_path, _slot_capacity(0, max_load), [], 0, 0)
+            self._files = _Files(self.log_path, self.index_path)
+            self._catch_up()
+
+        # flock locks belong to the open file description, which a forked
+        # worker would share with its parent; give each worker its own
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _open_lock_file(self):
+        self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _after_fork(self):
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._open_lock_file()
+        self._files = _Files(self.log_path, self.index_path)
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _current_files(self):
+        files = self._files
+        if files.retired():
+            with self._lock:
+                if self._files is files:
+                    self._files = _Files(self.log_path, self.index_path)
+                files = self._files
+        return files
+
+    def _find(self, files, key, key_hash):
+        """(slot index, record) for a key, or (first empty slot index, None)"""
+        index = files.index
+        mask = files.capacity - 1
+        slot = key_hash & mask
+        for _ in range(files.capacity):
+            slot_hash, offset = SLOT.unpack_from(index, HEADER_SIZE + slot * SLOT.size)
+            if slot_hash == 0:
+                return slot, None
+            if slot_hash == key_hash:
+                record = files.read_record(offset)
+                if record is not None and record.get("prompt") == key:
+                    return slot, record
+            slot = (slot + 1) & mask
+        return None, None
+
+    def get(self, prompt):
+        """Latest record stored for a prompt (normalized like the response cache), or None"""
+        key = normalize_prompt(prompt)
+        _, record = self._find(self._current_files(), key, _key_hash(key))
+        with self._stats_lock:
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return record
+
+    def put(self, prompt, regex, model=None, validation=None):
+        """Append a record and point the index at it"""
+        key = normalize_prompt(prompt)
+        record = {
+            "prompt": key,
+            "regex": regex,
+            "model": model,
+            "timestamp": time.time(),
+            "validation": validation
+        }
+        payload = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        entry = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._file_lock():
+            self._current_files()
+            self._catch_up()
+            files = self._files
+            offset = os.fstat(files.log_fd).st_size
+            os.write(files.log_fd, entry)
+            self._publish(files, key, offset)
+            self._set_header(files, records_delta=1, indexed=offset + len(entry))
+            self.appends += 1
+
+            _, _, _, capacity, count, records, _ = HEADER.unpack_from(files.index, 0)
+            if records >= self.compact_min_records and records > count * self.compact_ratio:
+                self._compact()
+            elif count > capacity * self.max_load:
+                self._rebuild(self._live_slots(files), files)
+        return record
+
+    def _publish(self, files, key, offset):
+        # Caller holds the file lock
+        key_hash = _key_hash(key)
+        slot, existing = self._find(files, key, key_hash)
+        if slot is None:
+            raise RuntimeError("Pattern store index is full")
+        position = HEADER_SIZE + slot * SLOT.size
+        # Offset before hash, so a reader never sees a hash with a stale offset
+        struct.pack_into("<Q", files.index, position + 8, offset)
+        struct.pack_into("<Q", files.index, position, key_hash)
+        if existing is None:
+            self._set_header(files, count_delta=1)
+
+    def _set_header(self, files, count_delta=0, records_delta=0, indexed=None):
+        magic, version, retired, capacity, count, records, indexed_size = HEADER.unpack_from(files.index, 0)
+        HEADER.pack_into(
+            files.index, 0, magic, version, retired, capacity,
+            count + count_delta, records + records_delta,
+            indexed_size if indexed is None else indexed
+        )
+
+    def _iter_log(self, files, start=0):
+        """(offset, size, record) for every intact record from start on"""
+        offset = start
+        while True:
+            header = os.pread(files.log_fd, RECORD_HEADER.size, offset)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, _ = RECORD_HEADER.unpack(header)
+            record = files.read_record(offset)
+            if record is None:
+                return
+            size = RECORD_HEADER.size + length
+            yield offset, size, record
+            offset += size
+
+    def _catch_up(self):
+        """Index records a crashed writer appended but never published (caller holds the file lock)"""
+        files = self._files
+        indexed = HEADER.unpack_from(files.index, 0)[6]
+        log_size = os.fstat(files.log_fd).st_size
+        if indexed >= log_size:
+            return
+        end = indexed
+        for offset, size, record in self._iter_log(files, indexed):
+            self._publish(files, record["prompt"], offset)
+            self._set_header(files, records_delta=1)
+            end = offset + size
+        if end < log_size:
+            # Torn write at the tail
+            os.truncate(self.log_path, end)
+        self._set_header(files, indexed=end)
+
+    def _live_slots(self, files):
+        """(hash, offset) of every occupied slot"""
+        slots = []
+        for slot in range(files.capacity):
+            slot_hash, offset = SLOT.unpack_from(files.index, HEADER_SIZE + slot * SLOT.size)
+            if slot_hash:
+                slots.append((slot_hash, offset))
+        return slots
+
+    def _write_index(self, path, capacity, slots, records, indexed):
+        table = bytearray(HEADER_SIZE + capacity * SLOT.size)
+        HEADER.pack_into(table, 0, MAGIC, 1, 0, capacity, len(slots), records, indexed)
+        mask = capacity - 1
+        for key_hash, offset in slots:
+            slot = key_hash & mask
+            while SLOT.unpack_from(table, HEADER_SIZE + slot * SLOT.size)[0]:
+                slot = (slot + 1) & mask
+            SLOT.pack_into(table, HEADER_SIZE + slot * SLOT.size, key_hash, offset)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(table)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _retire_and_reopen(self, old_files):
+        struct.pack_into("<I", old_files.index, RETIRED_OFFSET, 1)
+        self._files = _Files(self.log_path, self.index_path)
+
+    def _rebuild(self, slots, files):
+        """Swap in a larger index over the same log (caller holds the file lock)"""
+        _, _, _, _, _, records, indexed = HEADER.unpack_from(files.index, 0)
+        capacity = _slot_capacity(len(slots) * 2, self.max_load)
+        self._write_index(self.index_path, capacity, slots, records, indexed)
+        self._retire_and_reopen(files)
+
+    def compact(self):
+        """Rewrite the log keeping only the latest record per prompt"""
+        with self._file_lock():
+            self._current_files()
+            return self._compact()
+
+    def _compact(self):
+        # Caller holds the file lock
+        files = self._files
+        live = {offset for _, offset in self._live_slots(files)}
+        before = os.fstat(files.log_fd).st_size
+        tmp_log = f"{self.log_path}.compact"
+        slots = []
+        new_offset = 0
+        with open(tmp_log, "wb") as out:
+            for offset, size, record in self._iter_log(files):
+                if offset not in live:
+                    continue
+                out.write(os.pread(files.log_fd, size, offset))
+                slots.append((_key_hash(record["prompt"]), new_offset))
+                new_offset += size
+            out.flush()
+            os.fsync(out.fileno())
+
+        capacity = _slot_capacity(len(slots) * 2, self.max_load)
+        tmp_index = f"{self.index_path}.compact"
+        self._write_index(tmp_index, capacity, slots, len(slots), new_offset)
+        # Readers keep using the old pair (their descriptors still point at
+        # the old files) until they see the retired flag
+        os.replace(tmp_log, self.log_path)
+        os.replace(tmp_index, self.index_path)
+        self._retire_and_reopen(files)
+        self.compactions += 1
+        return {"entries": len(slots), "bytes_before": before, "bytes_after": new_offset}
+
+    def stats(self):
+        files = self._current_files()
+        _, _, _, capacity, count, records, _ = HEADER.unpack_from(files.index, 0)
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": count,
+            "records": records,
+            "capacity": capacity,
+            "log_bytes": os.fstat(files.log_fd).st_size,
+            "hits": hits,
+            "misses": misses,
+            "appends": self.appends,
+            "compactions": self.compactions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or compact a pattern store")
+    parser.add_argument("directory")
+    parser.add_argument("command", choices=("stats", "compact", "get"))
+    parser.add_argument("prompt", nargs="?")
+    args = parser.parse_args()
+
+    store = PatternStore(args.directory)
+    if args.command == "compact":
+        print(json.dumps(store.compact(), indent=2))
+    elif args.command == "get":
+        print(json.dumps(store.get(args.prompt or ""), indent=2))
+    else:
+        print(json.dumps(store.stats(), indent=2))
@@ -0,0 +1,410 @@
+"""Strings built from a pattern's own parse tree.
+
+``Sampler`` walks the ``sre_parse`` tree of a pattern and emits text each
+node accepts: a literal for a literal, a member of a character class, a
+random alternative, a repeat count within the quantifier's bounds. Group
+references repeat what their group emitted. Lookarounds and ``\\b`` are not
+enforced, so a sample is what the pattern most likely matches, not a
+guarantee.
+
+``attack_strings`` uses it for catastrophic-backtracking probes: for each
+unbounded repeat, the text leading up to it, the repeat's body pumped many
+times, then a character that makes the match fail. That suffix is what forces
+a backtracking engine to try every way of splitting the pumped run.
+
+``build_corpus`` and ``bench_pattern`` use it for benchmarks: lines of
+samples mixed with near misses (a sample with one small edit, which the
+pattern usually rejects), reproducible from a seed, then timed with the
+pattern.
+"""
+import random
+import re
+import string
+import time
+
+from match_results import re_mode
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+MAXREPEAT = sre_constants.MAXREPEAT
+LITERAL = sre_constants.LITERAL
+NOT_LITERAL = sre_constants.NOT_LITERAL
+ANY = sre_constants.ANY
+IN = sre_constants.IN
+NEGATE = sre_constants.NEGATE
+RANGE = sre_constants.RANGE
+CATEGORY = sre_constants.CATEGORY
+BRANCH = sre_constants.BRANCH
+SUBPATTERN = sre_constants.SUBPATTERN
+GROUPREF = sre_constants.GROUPREF
+GROUPREF_EXISTS = sre_constants.GROUPREF_EXISTS
+ASSERT = sre_constants.ASSERT
+ASSERT_NOT = sre_constants.ASSERT_NOT
+ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)}
+
+# Characters samples are drawn from; no newline, so ``.`` and [^...] stay on one line
+PRINTABLE = string.ascii_letters + string.digits + string.punctuation + " "
+# Samples are cut off here, whatever the quantifiers ask for (a{100000000})
+MAX_SAMPLE_LENGTH = 1 << 16
+
+_CATEGORY_CHARS = {
+    sre_constants.CATEGORY_DIGIT: string.digits,
+    sre_constants.CATEGORY_NOT_DIGIT: string.ascii_letters + string.punctuation + " ",
+    sre_constants.CATEGORY_SPACE: " \t\n",
+    sre_constants.CATEGORY_NOT_SPACE: string.ascii_letters + string.digits + string.punctuation,
+    sre_constants.CATEGORY_WORD: string.ascii_letters + string.digits + "_",
+    sre_constants.CATEGORY_NOT_WORD: string.punctuation.replace("_", "") + " ",
+}
+_CATEGORY_TESTS = {
+    sre_constants.CATEGORY_DIGIT: lambda ch: ch.isdecimal(),
+    sre_constants.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdecimal(),
+    sre_constants.CATEGORY_SPACE: lambda ch: ch.isspace(),
+    sre_constants.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+    sre_constants.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == "_",
+    sre_constants.CATEGORY_NOT_WORD: lambda ch: not (ch.isalnum() or ch == "_"),
+}
+
+
+def in_class(items, ch):
+    """Whether a parsed character class (the av of an IN token) contains ch"""
+    negate = bool(items) and items[0][0] == NEGATE
+    code = ord(ch)
+    for op, av in items:
+        if op == LITERAL and code == av:
+            return not negate
+        if op == RANGE and av[0] <= code <= av[1]:
+            return not negate
+        if op == CATEGORY and _CATEGORY_TESTS.get(av, lambda ch: False)(ch):
+            return not negate
+    return negate
+
+
+def _children(op, av):
+    """Token lists nested in a parsed token"""
+    if op in _REPEATS:
+        return [av[2]]
+    if op == SUBPATTERN:
+        return [av[3]]
+    if op == BRANCH:
+        return av[1]
+    if op == ATOMIC_GROUP:
+        return [av]
+    if op in (ASSERT, ASSERT_NOT):
+        return [av[1]]
+    if op == GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch is not None]
+    return []
+
+
+def _path_to(items, target):
+    """ids of the token lists from items down to target (inclusive), or None if it is not inside"""
+    if items is target:
+        return {id(items)}
+    for op, av in items:
+        for child in _children(op, av):
+            path = _path_to(child, target)
+            if path is not None:
+                return path | {id(items)}
+    return None
+
+
+def _item_size(op, av):
+    if op == RANGE:
+        return av[1] - av[0] + 1
+    if op == CATEGORY:
+        return len(_CATEGORY_CHARS.get(av, PRINTABLE))
+    return 1
+
+
+class _Stop(Exception):
+    """Raised to end a sample right after the pumped repeat"""
+
+
+class Sampler:
+    """Random text accepted by a parsed pattern.
+
+    Repeats run between their minimum and minimum + extra_repeats times. With
+    target_length set, they keep going (up to their maximum) until the sample
+    is that long, the length shared out between the unbounded repeats. With
+    pump set to the body of one repeat (a list from the parse tree), that body
+    is emitted once and its text repeated pump_count times, and the sample
+    stops there; repeats and alternatives on the way to it are taken at least
+    once. No sample grows past max_length characters.
+    """
+
+    def __init__(self, rng, extra_repeats=3, pump=None, pump_count=0, target_length=None,
+                 max_length=MAX_SAMPLE_LENGTH):
+        self.rng = rng
+        self.extra_repeats = extra_repeats
+        self.pump = pump
+        self.pump_count = pump_count
+        self.target_length = target_length
+        self.max_length = max_length
+        self.out = []
+        self.length = 0
+        self.groups = {}
+        self._path = set()
+        self._share = 0
+        self._weights = {}
+
+    def sample(self, parsed):
+        self.out = []
+        self.length = 0
+        self.groups = {}
+        self._path = (_path_to(parsed, self.pump) or set()) if self.pump is not None else set()
+        if self.target_length is not None:
+            self._share = self.target_length / max(1, len(unbounded_repeats(parsed)))
+        try:
+            self._emit(parsed)
+        except _Stop:
+            pass
+        return "".join(self.out)
+
+    def _char(self, op, av):
+        if op == LITERAL:
+            return chr(av)
+        if op == NOT_LITERAL:
+            return self._pick(lambda ch: ord(ch) != av)
+        if op == ANY:
+            return self.rng.choice(PRINTABLE)
+        if av and av[0][0] == NEGATE:
+            return self._pick(lambda ch: in_class(av, ch))
+        # Weighted by how many characters each item covers, so [a-z._%+-] gives mostly letters
+        weights = self._weights.get(id(av))
+        if weights is None:
+            weights = self._weights[id(av)] = [_item_size(item_op, item) for item_op, item in av]
+        (item_op, item), = self.rng.choices(av, weights)
+        if item_op == LITERAL:
+            return chr(item)
+        if item_op == RANGE:
+            return chr(self.rng.randint(item[0], item[1]))
+        return self.rng.choice(_CATEGORY_CHARS.get(item, PRINTABLE))
+
+    def _pick(self, accepts):
+        """A printable character accepts() is true for, or the first one at all"""
+        for _ in range(8):
+            ch = self.rng.choice(PRINTABLE)
+            if accepts(ch):
+                return ch
+        return next((ch for ch in PRINTABLE + "\t\n\x00" if accepts(ch)), "\x00")
+
+    def _emit(self, items):
+        for op, av in items:
+            if op in (LITERAL, NOT_LITERAL, ANY, IN):
+                self._write(self._char(op, av))
+            elif op in _REPEATS:
+                self._repeat(*av)
+            elif op == SUBPATTERN:
+                mark = len(self.out)
+                self._emit(av[3])
+                if av[0] is not None:
+                    self.groups[av[0]] = "".join(self.out[mark:])
+            elif op == BRANCH:
+                toward_pump = [branch for branch in av[1] if id(branch) in self._path]
+                self._emit(toward_pump[0] if toward_pump else self.rng.choice(av[1]))
+            elif op == ATOMIC_GROUP:
+                self._emit(av)
+            elif op == GROUPREF:
+                self._write(self.groups.get(av, ""))
+            elif op == GROUPREF_EXISTS:
+                branch = av[1] if av[0] in self.groups else av[2]
+                if branch is not None:
+                    self._emit(branch)
+            # AT, ASSERT, ASSERT_NOT: zero-width, nothing to emit
+
+    def _repeat(self, minimum, maximum, body):
+        if body is self.pump:
+            mark = len(self.out)
+            self._emit(body)
+            text = "".join(self.out[mark:])
+            room = (self.max_length - self.length) // max(1, len(text))
+            self._write(text * min(self.pump_count - 1, room + 1))
+            raise _Stop()
+        # A body that emits nothing ends the sample no sooner, so the count is capped too
+        count = min(self.rng.randint(minimum, min(maximum, minimum + self.extra_repeats)), self.max_length)
+        if count == 0 and id(body) in self._path:
+            count = 1
+        start = self.length
+        emitted = 0
+        while emitted < count or (emitted < maximum and self._wants_more(start)):
+            before = self.length
+            self._emit(body)
+            emitted += 1
+            if emitted >= count and self.length == before:
+                break  # the body can match empty; more of it would not get longer
+
+    def _wants_more(self, start):
+        """Whether a repeat that began at length start should grow toward target_length"""
+        if self.target_length is None:
+            return False
+        return self.length < self.target_length and self.length - start < self._share
+
+    def _write(self, text):
+        if self.length + len(text) >= self.max_length:
+            self.out.append(text[:self.max_length - self.length])
+            self.length = self.max_length
+            raise _Stop()
+        self.out.append(text)
+        self.length += len(text)
+
+
+def unbounded_repeats(items):
+    """Bodies of the ``*``/``+``/``{n,}`` repeats in a parsed pattern, outermost first"""
+    found = []
+    for op, av in items:
+        if op in _REPEATS and av[1] == MAXREPEAT:
+            found.append(av[2])
+        for child in _children(op, av):
+            found.extend(unbounded_repeats(child))
+    return found
+
+
+def attack_strings(pattern, pumps=(24, 256), suffixes=("!", "\n", "\x00"), variants=3, max_repeats=8, seed=0,
+                   max_length=4096):
+    """Adversarial inputs for a pattern: prefix + pumped repeat body + failing suffix.
+
+    A pump of 24 makes exponential backtracking take seconds; 256 does the
+    same for polynomial backtracking of degree four and up, while quadratic
+    patterns (``\\s*\\w+\\s*=`` searched over a line) stay in the
+    milliseconds. Each repeat is pumped with a few differently seeded bodies,
+    since overlap between alternatives only shows for some characters, and
+    only the shortest pump gets every suffix. Prefix and pumped run together
+    stop at max_length characters, so huge counts (``a{100000000}b+``) cost
+    no more than small ones. Raises re.error for an invalid pattern.
+    """
+    parsed = sre_parse.parse(pattern)
+    seen = set()
+    strings = []
+    for body in unbounded_repeats(parsed)[:max_repeats]:
+        for variant in range(variants):
+            for pump in pumps:
+                sampler = Sampler(random.Random(seed * 1000 + variant), extra_repeats=0, pump=body, pump_count=pump,
+                                  max_length=max_length)
+                prefix = sampler.sample(parsed)
+                for suffix in suffixes if pump == pumps[0] else suffixes[:1]:
+                    text = prefix + suffix
+                    if text not in seen:
+                        seen.add(text)
+                        strings.append(text)
+    return strings
+
+
+def near_miss(text, rng):
+    """text with one small edit (drop, swap for another kind of character, insert, truncate)"""
+    if not text:
+        return rng.choice(string.punctuation)
+    i = rng.randrange(len(text))
+    edit = rng.randrange(4)
+    if edit == 0:
+        return text[:i] + text[i + 1:]
+    if edit == 1:
+        ch = text[i]
+        other = string.ascii_letters if ch.isdigit() else string.digits if ch.isalpha() else string.ascii_letters
+        return text[:i] + rng.choice(other) + text[i + 1:]
+    if edit == 2:
+        return text[:i] + rng.choice(string.punctuation) + text[i:]
+    return text[:-rng.randint(1, min(3, len(text)))]
+
+
+def build_corpus(pattern, size, seed=0, length=None, match_ratio=0.5, pool_size=256, accepts=None):
+    """(lines, is_sample): about size characters of sample and near-miss lines.
+
+    pool_size samples (and a near miss of each) are generated, then drawn at
+    random until the size is reached, so a large corpus costs little more to
+    build than a small one. length is the target characters per sample (None
+    leaves it to the pattern's own repeats); match_ratio is the share of
+    sample lines. Newlines inside samples become spaces, keeping one per
+    line. The same arguments always give the same corpus. Raises re.error for
+    an invalid pattern.
+
+    accepts, if given, is the pattern's matcher (e.g. a compiled fullmatch):
+    samples it rejects (a lookaround or ``\\b`` the sampler ignores) are
+    dropped while others remain, and near misses it still accepts are edited
+    again, a few times at most. It runs the pattern, so only pass it where a
+    runaway match can be stopped.
+    """
+    parsed = sre_parse.parse(pattern)
+    rng = random.Random(seed)
+    sampler = Sampler(rng, target_length=length)
+    samples = [sampler.sample(parsed).replace("\n", " ") for _ in range(pool_size)]
+    if accepts is not None:
+        samples = [sample for sample in samples if accepts(sample)] or samples
+    near_misses = []
+    for sample in samples:
+        miss = near_miss(sample, rng)
+        for _ in range(3 if accepts is not None else 0):
+            if not accepts(miss):
+                break
+            miss = near_miss(sample, rng)
+        near_misses.append(miss)
+    lines = []
+    is_sample = []
+    total = 0
+    while total < size:
+        kind = rng.random() < match_ratio
+        line = rng.choice(samples if kind else near_misses)
+        lines.append(line)
+        is_sample.append(kind)
+        total += len(line) + 1
+    return lines, is_sample
+
+
+def bench_pattern(pattern, size, seed=0, length=None, match_ratio=0.5, repeat=3, examples=5):
+    """Time a pattern over a build_corpus corpus (lines joined by newlines, re.MULTILINE).
+
+    Each run counts every match with the pattern's scanner; the best run
+    gives the rates. It also fullmatches each line once, to report how many
+    samples the pattern accepts and how many near misses it accepts anyway
+    (the few edits that still fit it). Raises re.error for an invalid
+    pattern; runs the pattern, so belongs in a guarded matcher process.
+    """
+    compiled = re.compile(pattern, re.MULTILINE)
+    started = time.perf_counter()
+    lines, is_sample = build_corpus(pattern, size, seed, length, match_ratio, accepts=compiled.fullmatch)
+    text = "\n".join(lines)
+    generate_seconds = time.perf_counter() - started
+
+    runs = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        _, match_count = re_mode("count", compiled, text)
+        runs.append(time.perf_counter() - started)
+    best = min(runs)
+
+    samples_matched = near_misses_matched = 0
+    for line, kind in zip(lines, is_sample):
+        if compiled.fullmatch(line):
+            if kind:
+                samples_matched += 1
+            else:
+                near_misses_matched += 1
+    sample_count = sum(is_sample)
+    size_bytes = len(text.encode("utf-8"))
+    return {
+        "corpus": {
+            "seed": seed,
+            "chars": len(text),
+            "bytes": size_bytes,
+            "lines": len(lines),
+            "samples": sample_count,
+            "near_misses": len(lines) - sample_count,
+            "examples": {
+                "samples": list(dict.fromkeys(line for line, kind in zip(lines, is_sample) if kind))[:examples],
+                "near_misses": list(dict.fromkeys(line for line, kind in zip(lines, is_sample) if not kind))[:examples]
+            },
+            "generate_ms": round(generate_seconds * 1000, 3)
+        },
+        "match_count": match_count,
+        "runs_ms": [round(seconds * 1000, 3) for seconds in runs],
+        "best_ms": round(best * 1000, 3),
+        "matches_per_second": round(match_count / best) if best else None,
+        "bytes_per_second": round(size_bytes / best) if best else None,
+        "samples_matched": samples_matched,
+        "near_misses_matched": near_misses_matched
+    }
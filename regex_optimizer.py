@@ -0,0 +1,486 @@
+"""Meaning-preserving rewrites for generated regex patterns.
+
+Patterns extracted from model replies tend to be padded: capturing groups
+nobody reads, ``(?:...)`` around single items, ``[0-9\\d]``, alternations
+that repeat their first characters. ``optimize_regex`` parses a pattern with
+``sre_parse``, rewrites the tree and prints it back:
+
+- capturing groups become non-capturing unless they are named or
+  back-referenced (the kept ones are renumbered)
+- non-capturing groups that need no parentheses are dropped
+- character classes lose duplicates and items another item covers
+  (``[0-9\\d]`` -> ``\\d``), and touching items merge into ranges
+- alternatives that start with the same item share it, trie style
+  (``Jan|Jun|Jul`` -> ``J(?:an|u[nl])``), and ``(?:x|)`` becomes ``x?``
+- nested greedy quantifiers over one character collapse (``(?:a+)*`` -> ``a*``)
+
+Whatever sre_parse already folds on its own (``(?:\\w)+``, ``a|b|c`` into a
+class) is kept when the printed pattern comes out shorter.
+
+Every rewrite keeps the set of strings matched and the leftmost-first choice
+between them, so the optimized pattern matches the same text at the same
+positions; only findall's output shape changes when groups are dropped.
+Anything the printer cannot reproduce exactly leaves the pattern unchanged,
+and so does any difference between the two patterns' ``finditer`` spans on
+short strings sampled from the original.
+"""
+import random
+import re
+import sys
+from collections import namedtuple
+
+from regex_examples import Sampler, near_miss
+from safe_match import find_redos_risks
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+MAXREPEAT = sre_constants.MAXREPEAT
+LITERAL = sre_constants.LITERAL
+NOT_LITERAL = sre_constants.NOT_LITERAL
+ANY = sre_constants.ANY
+IN = sre_constants.IN
+NEGATE = sre_constants.NEGATE
+RANGE = sre_constants.RANGE
+CATEGORY = sre_constants.CATEGORY
+AT = sre_constants.AT
+BRANCH = sre_constants.BRANCH
+SUBPATTERN = sre_constants.SUBPATTERN
+MAX_REPEAT = sre_constants.MAX_REPEAT
+MIN_REPEAT = sre_constants.MIN_REPEAT
+POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+GROUPREF = sre_constants.GROUPREF
+GROUPREF_EXISTS = sre_constants.GROUPREF_EXISTS
+ASSERT = sre_constants.ASSERT
+ASSERT_NOT = sre_constants.ASSERT_NOT
+
+_REPEAT_SUFFIX = {MAX_REPEAT: "", MIN_REPEAT: "?", POSSESSIVE_REPEAT: "+"}
+_SINGLE_CHAR = (LITERAL, NOT_LITERAL, ANY, IN)
+_FIXED_WIDTH = (*_SINGLE_CHAR, AT)
+
+# Strings optimize_regex compares the original and optimized patterns on; they
+# run in the caller's process, so they stay short, shorter still for patterns
+# find_redos_risks flags
+_CHECK_SAMPLES = 32
+_CHECK_LENGTH = 32
+_CHECK_RISKY_LENGTH = 12
+
+_CATEGORY_ESCAPES = {
+    sre_constants.CATEGORY_DIGIT: r"\d",
+    sre_constants.CATEGORY_NOT_DIGIT: r"\D",
+    sre_constants.CATEGORY_SPACE: r"\s",
+    sre_constants.CATEGORY_NOT_SPACE: r"\S",
+    sre_constants.CATEGORY_WORD: r"\w",
+    sre_constants.CATEGORY_NOT_WORD: r"\W",
+}
+_AT_ESCAPES = {
+    sre_constants.AT_BEGINNING: "^",
+    sre_constants.AT_BEGINNING_STRING: r"\A",
+    sre_constants.AT_END: "$",
+    sre_constants.AT_END_STRING: r"\Z",
+    sre_constants.AT_BOUNDARY: r"\b",
+    sre_constants.AT_NON_BOUNDARY: r"\B",
+}
+# Code point ranges a category is guaranteed to contain, whatever the flags
+# (LOCALE aside, which only applies to bytes patterns)
+_CATEGORY_COVERS = {
+    sre_constants.CATEGORY_DIGIT: ((0x30, 0x39),),
+    sre_constants.CATEGORY_WORD: ((0x30, 0x39), (0x41, 0x5A), (0x5F, 0x5F), (0x61, 0x7A)),
+    sre_constants.CATEGORY_SPACE: ((0x09, 0x0D), (0x20, 0x20)),
+}
+_FLAG_LETTERS = ((re.ASCII, "a"), (re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+_NAMED_ESCAPES = {0x09: r"\t", 0x0A: r"\n", 0x0B: r"\v", 0x0C: r"\f", 0x0D: r"\r"}
+_SPECIAL = set(".^$*+?{}[]\\|()")
+_CLASS_SPECIAL = set("\\]^-[&~|")
+
+
+class Optimization(namedtuple("Optimization", "regex rewrites notes")):
+    """optimize_regex's result: the pattern, the rewrites that changed it, and advice"""
+
+    __slots__ = ()
+
+    @property
+    def approximate_size(self):
+        """Rough memory footprint, used by CompiledPatternCache"""
+        return sys.getsizeof(self.regex) + 64 * (len(self.rewrites) + len(self.notes)) + 256
+
+
+class _Unprintable(Exception):
+    pass
+
+
+def _escape(code, special):
+    if code in _NAMED_ESCAPES:
+        return _NAMED_ESCAPES[code]
+    ch = chr(code)
+    if ch in special:
+        return "\\" + ch
+    if not ch.isprintable() or (code > 0x7F and ch.isspace()):
+        if code <= 0xFF:
+            return f"\\x{code:02x}"
+        return f"\\u{code:04x}" if code <= 0xFFFF else f"\\U{code:08x}"
+    return ch
+
+
+def _flag_letters(flags):
+    return "".join(letter for flag, letter in _FLAG_LETTERS if flags & flag)
+
+
+class _Optimizer:
+    def __init__(self, parsed, drop_groups):
+        state = parsed.state
+        self.flags = state.flags
+        self.rewrites = set()
+        names = {index: name for name, index in state.groupdict.items()}
+
+        # Group numbers that must survive, and what they are renumbered to
+        kept = set(range(1, state.groups))
+        if drop_groups:
+            kept = set(names) | self._referenced(parsed)
+            if len(kept) < state.groups - 1:
+                self.rewrites.add("unused capturing groups made non-capturing")
+        self.renumber = {old: new for new, old in enumerate(sorted(kept), start=1)}
+        self.names = {self.renumber[index]: name for index, name in names.items()}
+
+    def _referenced(self, items):
+        refs = set()
+        for op, av in items:
+            if op is GROUPREF:
+                refs.add(av)
+            elif op is GROUPREF_EXISTS:
+                refs.add(av[0])
+            for sub in self._children(op, av):
+                refs |= self._referenced(sub)
+        return refs
+
+    @staticmethod
+    def _children(op, av):
+        if op in _REPEAT_SUFFIX:
+            return [av[2]]
+        if op is SUBPATTERN:
+            return [av[3]]
+        if op is BRANCH:
+            return av[1]
+        if op in (ASSERT, ASSERT_NOT):
+            return [av[1]]
+        if op is ATOMIC_GROUP:
+            return [av]
+        if op is GROUPREF_EXISTS:
+            return [branch for branch in av[1:] if branch is not None]
+        return []
+
+    # Rewriting: every method takes and returns plain lists of (op, av)
+
+    def sequence(self, items, flags):
+        out = []
+        for op, av in items:
+            out.extend(self.item(op, av, flags))
+        return out
+
+    def item(self, op, av, flags):
+        """The rewritten item, as a list of items to splice into the sequence"""
+        if op is SUBPATTERN:
+            group, add_flags, del_flags, body = av
+            body = self.sequence(body, (flags | add_flags) & ~del_flags)
+            add_flags &= ~re.VERBOSE
+            del_flags &= ~re.VERBOSE
+            group = self.renumber.get(group)
+            if group is None and not add_flags and not del_flags:
+                if av[0] is None and not (len(body) == 1 and body[0][0] is BRANCH):
+                    self.rewrites.add("redundant groups removed")
+                return body
+            return [(SUBPATTERN, (group, add_flags, del_flags, body))]
+        if op is BRANCH:
+            return self.alternation([self.sequence(branch, flags) for branch in av[1]], flags)
+        if op is IN:
+            return [self.char_class(av)]
+        if op in _REPEAT_SUFFIX:
+            return self.repeat(op, av[0], av[1], self.sequence(av[2], flags))
+        if op in (ASSERT, ASSERT_NOT):
+            return [(op, (av[0], self.sequence(av[1], flags)))]
+        if op is ATOMIC_GROUP:
+            return [(op, self.sequence(av, flags))]
+        if op is GROUPREF:
+            return [(op, self.renumber[av])]
+        if op is GROUPREF_EXISTS:
+            group, yes, no = av
+            return [(op, (self.renumber[group], self.sequence(yes, flags),
+                          None if no is None else self.sequence(no, flags)))]
+        return [(op, av)]
+
+    def char_class(self, items):
+        """IN item without duplicates or covered members, or the items unchanged if nothing goes"""
+        negate = bool(items) and items[0][0] is NEGATE
+        body = items[1:] if negate else items
+        if any(op not in (LITERAL, RANGE, CATEGORY) for op, _ in body):
+            return (IN, items)
+        categories = []
+        for op, av in body:
+            if op is CATEGORY and av not in categories:
+                categories.append(av)
+        covered = [span for category in categories for span in _CATEGORY_COVERS.get(category, ())]
+        spans = []
+        for op, av in body:
+            if op is CATEGORY:
+                continue
+            low, high = (av, av) if op is LITERAL else av
+            if not any(start <= low and high <= end for start, end in covered):
+                spans.append([low, high])
+        spans.sort()
+        merged = []
+        for low, high in spans:
+            # Touching spans only merge within letters and digits; [!-&] reads worse than [!$%&]
+            touching = merged and low == merged[-1][1] + 1 and chr(low).isalnum() and chr(merged[-1][1]).isalnum()
+            if merged and (low <= merged[-1][1] or touching):
+                merged[-1][1] = max(merged[-1][1], high)
+            else:
+                merged.append([low, high])
+
+        collapsed = [(CATEGORY, category) for category in categories]
+        for low, high in merged:
+            if high - low < 3:
+                collapsed.extend((LITERAL, code) for code in range(low, high + 1))
+            else:
+                collapsed.append((RANGE, (low, high)))
+        if len(collapsed) >= len(body):
+            return (IN, items)
+        self.rewrites.add("character classes collapsed")
+        if len(collapsed) == 1 and collapsed[0][0] is LITERAL:
+            return (NOT_LITERAL if negate else LITERAL, collapsed[0][1])
+        return (IN, [(NEGATE, None)] * negate + collapsed)
+
+    def alternation(self, alternatives, flags):
+        """Items matching alternatives in order: shared first items factored out,
+        single characters merged into one class"""
+        alternatives = self.factor(alternatives, flags)
+        if len(alternatives) == 1:
+            return alternatives[0]
+        if all(len(alt) == 1 and alt[0][0] in (LITERAL, IN) for alt in alternatives):
+            members = []
+            for alt in alternatives:
+                op, av = alt[0]
+                if op is IN and av and av[0][0] is NEGATE:
+                    break
+                members.extend([(op, av)] if op is LITERAL else av)
+            else:
+                return [self.char_class(members)]
+        if len(alternatives) == 2 and [] in alternatives:
+            # (?:x|) is x? and (?:|x) is x??
+            self.rewrites.add("empty alternatives made optional")
+            other = alternatives[0] or alternatives[1]
+            return self.repeat(MAX_REPEAT if alternatives[0] else MIN_REPEAT, 0, 1, other)
+        return [(BRANCH, (None, alternatives))]
+
+    def factor(self, alternatives, flags):
+        # Only items that match one way (a single character or an anchor) are
+        # shared: after a quantifier or group, x(?:y|) and xy|x backtrack into x
+        # in a different order. Alternatives starting with different literals
+        # cannot match at the same position, so those may be regrouped;
+        # otherwise only neighbours merge
+        reorder = not flags & re.IGNORECASE and all(alt and alt[0][0] is LITERAL for alt in alternatives)
+        buckets = []
+        for alt in alternatives:
+            first = alt[0] if alt and alt[0][0] in _FIXED_WIDTH else None
+            candidates = buckets if reorder else buckets[-1:]
+            for bucket in candidates:
+                if first is not None and bucket[0] == first:
+                    bucket[1].append(alt)
+                    break
+            else:
+                buckets.append((first, [alt]))
+
+        factored = []
+        for first, members in buckets:
+            if len(members) == 1:
+                factored.append(members[0])
+                continue
+            self.rewrites.add("common alternation prefixes factored")
+            factored.append([first] + self.alternation([alt[1:] for alt in members], flags))
+        return factored
+
+    def repeat(self, op, minimum, maximum, body):
+        if minimum == maximum == 1 and op is not POSSESSIVE_REPEAT:
+            self.rewrites.add("redundant quantifiers removed")
+            return body
+        if len(body) == 1 and body[0][0] is MAX_REPEAT and op is MAX_REPEAT:
+            inner_min, inner_max, inner_body = body[0][1]
+            if (maximum == inner_max == MAXREPEAT and minimum <= 1 and inner_min <= 1
+                    and len(inner_body) == 1 and inner_body[0][0] in _SINGLE_CHAR):
+                self.rewrites.add("nested quantifiers flattened")
+                return [(MAX_REPEAT, (minimum * inner_min, MAXREPEAT, inner_body))]
+        return [(op, (minimum, maximum, body))]
+
+    # Printing
+
+    def unparse(self, items):
+        out = []
+        for i, (op, av) in enumerate(items):
+            text = self.unparse_item(op, av, len(items) > 1)
+            following = items[i + 1] if i + 1 < len(items) else None
+            if op is GROUPREF and text[1:].isdigit() and following and following[0] is LITERAL \
+                    and chr(following[1]).isdigit():
+                text = f"(?:{text})"  # \1 then 0 would read as \10
+            out.append(text)
+        return "".join(out)
+
+    def unparse_item(self, op, av, in_sequence):
+        if op is LITERAL:
+            return _escape(av, _SPECIAL)
+        if op is NOT_LITERAL:
+            return f"[^{_escape(av, _CLASS_SPECIAL)}]"
+        if op is ANY:
+            return "."
+        if op is IN:
+            return self.unparse_class(av)
+        if op is AT:
+            return _AT_ESCAPES[av]
+        if op is BRANCH:
+            text = "|".join(self.unparse(branch) for branch in av[1])
+            return f"(?:{text})" if in_sequence else text
+        if op is SUBPATTERN:
+            group, add_flags, del_flags, body = av
+            if group is not None:
+                name = self.names.get(group)
+                return f"(?P<{name}>{self.unparse(body)})" if name else f"({self.unparse(body)})"
+            flags = _flag_letters(add_flags) + ("-" + _flag_letters(del_flags) if del_flags else "")
+            return f"(?{flags}:{self.unparse(body)})"
+        if op in _REPEAT_SUFFIX:
+            minimum, maximum, body = av
+            if (minimum, maximum) == (0, MAXREPEAT):
+                quantifier = "*"
+            elif (minimum, maximum) == (1, MAXREPEAT):
+                quantifier = "+"
+            elif (minimum, maximum) == (0, 1):
+                quantifier = "?"
+            elif minimum == maximum:
+                quantifier = f"{{{minimum}}}"
+            elif maximum == MAXREPEAT:
+                quantifier = f"{{{minimum},}}"
+            else:
+                quantifier = f"{{{minimum},{maximum}}}"
+            return self.unparse_operand(body) + quantifier + _REPEAT_SUFFIX[op]
+        if op is ATOMIC_GROUP:
+            return f"(?>{self.unparse(av)})"
+        if op is GROUPREF:
+            name = self.names.get(av)
+            return f"(?P={name})" if name else f"\\{av}"
+        if op is GROUPREF_EXISTS:
+            group, yes, no = av
+            text = f"(?({self.names.get(group, group)}){self.unparse_alone(yes)}"
+            if no is not None:
+                text += "|" + self.unparse_alone(no)
+            return text + ")"
+        if op in (ASSERT, ASSERT_NOT):
+            direction, body = av
+            kind = ("=" if op is ASSERT else "!") if direction == 1 else ("<=" if op is ASSERT else "<!")
+            return f"(?{kind}{self.unparse(body)})"
+        raise _Unprintable(op)
+
+    def unparse_alone(self, items):
+        """A sequence that must not expose a top-level |"""
+        text = self.unparse(items)
+        return f"(?:{text})" if len(items) == 1 and items[0][0] is BRANCH else text
+
+    def unparse_operand(self, body):
+        if len(body) == 1 and body[0][0] in (*_SINGLE_CHAR, SUBPATTERN, ATOMIC_GROUP, GROUPREF):
+            return self.unparse_item(body[0][0], body[0][1], False)
+        return f"(?:{self.unparse(body)})"
+
+    def unparse_class(self, items):
+        negate = bool(items) and items[0][0] is NEGATE
+        body = items[1:] if negate else items
+        if not negate and len(body) == 1 and body[0][0] is CATEGORY:
+            return _CATEGORY_ESCAPES[body[0][1]]
+        parts = []
+        dash = False
+        for op, av in body:
+            if op is LITERAL and av == ord("-"):
+                dash = True  # printed last, where it needs no escape
+            elif op is LITERAL:
+                # & ~ | are only special doubled (reserved for set operations)
+                text = _escape(av, _CLASS_SPECIAL - set("&~|"))
+                parts.append("\\" + text if parts and parts[-1] == text and text in ("&", "~", "|") else text)
+            elif op is RANGE:
+                parts.append(f"{_escape(av[0], _CLASS_SPECIAL)}-{_escape(av[1], _CLASS_SPECIAL)}")
+            elif op is CATEGORY:
+                parts.append(_CATEGORY_ESCAPES[av])
+            else:
+                raise _Unprintable(op)
+        return f"[{'^' * negate}{''.join(parts)}{'-' * dash}]"
+
+
+def _notes(items):
+    """Advice the rewrites cannot act on without changing what matches"""
+    notes = []
+    first = items[0] if items else None
+    if first and first[0] in (MAX_REPEAT, MIN_REPEAT) and first[1][0] == 0 \
+            and first[1][1] == MAXREPEAT and first[1][2] == [(ANY, None)]:
+        notes.append("leading .* is retried from every position of an unanchored search; "
+                     "anchor it with ^ or drop it if only the rest of the match matters")
+    return notes
+
+
+def _check_strings(pattern, flags, seed=0):
+    """Samples of the pattern, a near miss of each and neighbouring samples run together"""
+    length = _CHECK_RISKY_LENGTH if find_redos_risks(pattern) else _CHECK_LENGTH
+    rng = random.Random(seed)
+    parsed = sre_parse.parse(pattern, flags)
+    sampler = Sampler(rng, extra_repeats=2, max_length=length)
+    samples = [sampler.sample(parsed) for _ in range(_CHECK_SAMPLES)]
+    strings = ["", *samples, *(near_miss(sample, rng) for sample in samples)]
+    strings.extend((first + second)[:length] for first, second in zip(samples, samples[1:]))
+    return list(dict.fromkeys(strings))
+
+
+def _same_matches(original, optimized, strings):
+    """Whether both compiled patterns find the same spans, named groups included, in every string"""
+    names = list(original.groupindex)
+    for text in strings:
+        expected = [(m.span(), [m.span(name) for name in names]) for m in original.finditer(text)]
+        found = [(m.span(), [m.span(name) for name in names]) for m in optimized.finditer(text)]
+        if expected != found:
+            return False
+    return True
+
+
+def optimize_regex(pattern, flags=0, drop_groups=True):
+    """Optimization(regex, rewrites, notes) for a str pattern.
+
+    Invalid or unprintable patterns come back unchanged with no rewrites,
+    as do patterns whose rewrite matches differently on a sampled string.
+    flags are folded into the optimized pattern as inline flags. With
+    drop_groups=False every capturing group is kept.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+        optimizer = _Optimizer(parsed, drop_groups)
+        items = optimizer.sequence(list(parsed), optimizer.flags)
+        global_flags = _flag_letters(optimizer.flags)
+        body = optimizer.unparse(items)
+        optimized = (f"(?{global_flags})" if global_flags else "") + body
+
+        # The printer must reproduce the tree: printing what it printed gives the same text
+        reparsed = sre_parse.parse(optimized)
+        printer = _Optimizer(reparsed, drop_groups=False)
+        reprinted = (f"(?{global_flags})" if global_flags else "") + printer.unparse(list(reparsed))
+        compiled = re.compile(optimized)
+        same = optimized == pattern or _same_matches(
+            re.compile(pattern, flags), compiled, _check_strings(pattern, flags)
+        )
+    except (re.error, _Unprintable, KeyError, RecursionError):
+        return Optimization(pattern, [], [])
+    if reprinted != optimized or set(compiled.groupindex) != set(parsed.state.groupdict):
+        return Optimization(pattern, [], [])
+    if not same:
+        return Optimization(pattern, [], _notes(items))
+    if not optimizer.rewrites and optimized != pattern and len(body) < len(pattern):
+        # Folded by sre_parse itself, e.g. (?:\w)+ or a|b|c
+        optimizer.rewrites.add("redundant syntax removed")
+    if not optimizer.rewrites:
+        return Optimization(pattern, [], _notes(items))
+    return Optimization(optimized, sorted(optimizer.rewrites), _notes(items))
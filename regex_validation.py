@@ -0,0 +1,221 @@
+"""Checks a generated pattern must pass before it is served.
+
+``RegexValidator.validate`` runs, in order and stopping at the first failure:
+
+compile
+    The pattern must compile.
+backtracking
+    ``regex_examples.attack_strings`` are searched in a guarded matcher
+    process under a wall-clock budget. Patterns that backtrack
+    catastrophically blow through it; linear and quadratic ones finish in
+    a few milliseconds.
+examples
+    Strings the prompt gives as examples: positives must be found by
+    ``search``, negatives must not ``fullmatch`` (a negative may still
+    contain a valid match, e.g. "not 555-1234-99").
+
+Compile and backtracking failures mean the pattern is unusable; an examples
+failure may as well be a misread prompt, so callers can still prefer it over
+a generic fallback. Every stage's time goes in the report's ``timing_ms``.
+"""
+import logging
+import re
+import threading
+import time
+
+from regex_examples import attack_strings
+from safe_match import find_redos_risks
+
+CHECKS = ("compile", "backtracking", "examples")
+
+# Words after which a quoted (or digit / @ bearing) token is an example, and of which polarity
+_NEGATIVE_CUES = {
+    "not", "never", "no", "nor", "exclude", "excludes", "excluding", "except", "reject", "rejects",
+    "rejecting", "invalid", "without", "don't", "doesn't", "shouldn't", "mustn't", "isn't", "aren't"
+}
+_POSITIVE_CUES = {
+    "like", "e.g", "eg", "i.e", "ie", "example", "examples", "instance", "as", "match", "matches", "matching",
+    "accept", "accepts", "accepting", "valid", "including", "includes", "allow", "allows", "but"
+}
+# May sit between a negation and the cue it negates: "not be like", "not to match"
+_LINKING_WORDS = {"be", "to", "ever", "even"}
+_TOKEN = re.compile(r'"([^"\n]{1,200})"|`([^`\n]{1,200})`|(?<!\w)\'([^\'\n]{1,200})\'(?!\w)|(\S+)')
+# Unquoted words that describe rather than exemplify: "24-hour", "3-digit", "10chars"
+_MEASURE = re.compile(r"\d+-?[a-z]+", re.IGNORECASE)
+_CUE_REACH = 4
+MAX_EXAMPLES = 10
+
+logger = logging.getLogger("smart_regex.validation")
+
+
+def prompt_examples(prompt):
+    """(positives, negatives): example strings given in a prompt.
+
+    Quoted strings are always examples; unquoted words only when they come
+    shortly after a cue word, hold a digit or an ``@`` and some punctuation
+    (so "555-1234" counts, a bare "100" or "24-hour" does not). Polarity
+    follows the nearest cue before them, so "like 'a@b.com' but not 'a@b'"
+    yields one of each, and "no '1' or '2'" two negatives.
+    """
+    positives, negatives = [], []
+    polarity = True
+    distance = None
+    negated = False
+    for match in _TOKEN.finditer(prompt):
+        quoted = next((group for group in match.groups()[:3] if group is not None), None)
+        if quoted is None:
+            word = match.group(4).strip(".,;:!?()[]{}")
+            lowered = word.lower()
+            if lowered in _NEGATIVE_CUES or lowered.endswith("n't"):
+                polarity, distance, negated = False, 0, True
+                continue
+            if lowered in _POSITIVE_CUES:
+                # "don't match", "not like", "not be like": a cue right after the negation keeps it
+                polarity, distance, negated = not negated, 0, False
+                continue
+            negated = negated and lowered in _LINKING_WORDS
+            is_example = (
+                distance is not None and distance <= _CUE_REACH
+                and (any(ch.isdigit() for ch in word) or "@" in word)
+                and not word.isalnum() and not _MEASURE.fullmatch(word)
+            )
+            if not is_example:
+                if distance is not None:
+                    distance += 1
+                continue
+            quoted = word
+        negated = False
+        # Examples do not move away from their cue, so lists keep its polarity
+        examples = positives if polarity else negatives
+        if quoted not in examples and len(examples) < MAX_EXAMPLES:
+            examples.append(quoted)
+    return positives, negatives
+
+
+class RegexValidator:
+    """Compile, backtracking and example checks for generated patterns.
+
+    matcher is a safe_match.GuardedMatcher; fuzz_budget and example_budget
+    are its timeouts in seconds. retries is how many corrected answers the
+    generator may ask for after a failure.
+    """
+
+    def __init__(self, matcher, compiler=re.compile, fuzz_budget=0.25, example_budget=0.1, retries=1):
+        self.matcher = matcher
+        self.compiler = compiler
+        self.fuzz_budget = fuzz_budget
+        self.example_budget = example_budget
+        self.retries = retries
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.failures = {check: 0 for check in CHECKS}
+        self.total_seconds = 0.0
+
+    def validate(self, pattern, positives=(), negatives=()):
+        """Report dict: passed, failed (the check that failed, or None), error,
+        checks ({check: passed/failed/skipped}), redos_warnings, fuzz_strings,
+        examples and timing_ms"""
+        started = time.perf_counter()
+        report = {
+            "passed": False,
+            "failed": None,
+            "error": None,
+            "checks": {check: "skipped" for check in CHECKS},
+            "redos_warnings": [],
+            "fuzz_strings": 0,
+            "examples": None,
+            "timing_ms": {}
+        }
+        try:
+            self._check(pattern, list(positives), list(negatives), report)
+        finally:
+            elapsed = time.perf_counter() - started
+            report["timing_ms"]["total"] = round(elapsed * 1000, 3)
+            with self._lock:
+                self.runs += 1
+                self.total_seconds += elapsed
+                if report["failed"]:
+                    self.failures[report["failed"]] += 1
+        return report
+
+    def _fail(self, report, check, error):
+        report["checks"][check] = "failed"
+        report["failed"] = check
+        report["error"] = error
+
+    def _check(self, pattern, positives, negatives, report):
+        timing = report["timing_ms"]
+        stage = time.perf_counter()
+        try:
+            self.compiler(pattern)
+        except re.error as e:
+            timing["compile"] = _ms_since(stage)
+            return self._fail(report, "compile", f"Invalid regex: {str(e)}")
+        timing["compile"] = _ms_since(stage)
+        report["checks"]["compile"] = "passed"
+
+        stage = time.perf_counter()
+        report["redos_warnings"] = find_redos_risks(pattern)
+        strings = attack_strings(pattern)
+        report["fuzz_strings"] = len(strings)
+        outcome = self.matcher.probe(pattern, strings, self.fuzz_budget) if strings else {"status": "ok"}
+        timing["fuzz"] = _ms_since(stage)
+        if outcome["status"] == "timeout":
+            return self._fail(report, "backtracking", (
+                f"Catastrophic backtracking: adversarial inputs took over {self.fuzz_budget * 1000:.0f} ms"
+            ))
+        if outcome["status"] == "ok":
+            report["checks"]["backtracking"] = "passed"
+        else:
+            # The matcher, not the pattern, failed; do not hold that against it
+            logger.warning("⚠️ Backtracking check skipped: %s", outcome["error"])
+
+        if not positives and not negatives:
+            report["passed"] = True
+            return
+        stage = time.perf_counter()
+        outcome = self.matcher.probe(pattern, positives + negatives, self.example_budget)
+        timing["examples"] = _ms_since(stage)
+        if outcome["status"] == "timeout":
+            return self._fail(report, "examples", (
+                f"Matching the prompt's examples took over {self.example_budget * 1000:.0f} ms"
+            ))
+        if outcome["status"] != "ok":
+            logger.warning("⚠️ Examples check skipped: %s", outcome["error"])
+            report["passed"] = True
+            return
+        hits = outcome["hits"]
+        results = {
+            "positive": [{"text": text, "passed": found} for text, (found, _) in zip(positives, hits)],
+            "negative": [{"text": text, "passed": not full} for text, (_, full) in zip(negatives, hits[len(positives):])]
+        }
+        failed = [item for item in results["positive"] + results["negative"] if not item["passed"]]
+        results["passed"] = len(hits) - len(failed)
+        results["total"] = len(hits)
+        report["examples"] = results
+        if failed:
+            missed = [item["text"] for item in results["positive"] if not item["passed"]]
+            matched = [item["text"] for item in results["negative"] if not item["passed"]]
+            reasons = []
+            if missed:
+                reasons.append(f"does not match {', '.join(map(repr, missed))}")
+            if matched:
+                reasons.append(f"matches {', '.join(map(repr, matched))}, which should be rejected")
+            return self._fail(report, "examples", f"Pattern {' and '.join(reasons)}")
+        report["checks"]["examples"] = "passed"
+        report["passed"] = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "fuzz_budget_ms": self.fuzz_budget * 1000,
+                "example_budget_ms": self.example_budget * 1000,
+                "retries": self.retries,
+                "runs": self.runs,
+                "failures": dict(self.failures),
+                "avg_ms": round(self.total_seconds / self.runs * 1000, 3) if self.runs else None
+            }
+
+
+def _ms_since(started):
+    return round((time.perf_counter() - started) * 1000, 3)
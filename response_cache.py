@@ -0,0 +1,154 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Punctuation at token boundaries ("addresses." / '"foo"') is noise, but inside
+# a token ("mm/dd/yyyy", "example.com") it changes the meaning of the prompt.
+_BOUNDARY_PUNCT = re.compile(r"(?:(?<=\s)|^)[^\w\s]+|[^\w\s]+(?=\s|$)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Canonical cache key for a prompt: case, whitespace and edge punctuation folded"""
+    text = prompt.lower().strip()
+    text = _BOUNDARY_PUNCT.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class MemoryStore:
+    """In-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskStore:
+    """SQLite-backed store that survives restarts and is shared between workers"""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._conn.commit()
+        self.evictions = 0
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def set(self, key, value, expires_at):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """Prompt -> generation result cache with TTL and LRU eviction"""
+
+    def __init__(self, store, ttl=86400, clock=time.time):
+        self.store = store
+        self.ttl = ttl
+        self._clock = clock
+        # The stores lock themselves; this guards the counters
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prompt):
+        value = self.store.get(normalize_prompt(prompt), self._clock())
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, prompt, value):
+        self.store.set(normalize_prompt(prompt), value, self._clock() + self.ttl)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "backend": type(self.store).__name__,
+            "entries": len(self.store),
+            "max_entries": self.store.max_entries,
+            "ttl": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "evictions": self.store.evictions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,310 @@
+"""Guarded regex execution for untrusted patterns.
+
+Python's ``re`` engine backtracks and cannot be interrupted, so a pattern like
+``(a+)+$`` against a long input pins the calling thread indefinitely. Matching
+is therefore run in separate worker processes that are killed once they
+exceed a wall-clock budget. ``find_redos_risks`` is a cheap static pre-check
+that flags the usual catastrophic-backtracking shapes before anything runs.
+"""
+import multiprocessing
+import re
+import threading
+import time
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+from linear_match import UnsupportedPattern, compile_linear
+from match_results import TEST_MODES, batch_row, linear_mode, page_spans, re_mode, re_spans
+from regex_examples import bench_pattern
+
+MAXREPEAT = sre_constants.MAXREPEAT
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+
+
+def _subpatterns(op, av):
+    """Child token lists of a parsed token"""
+    if op in _REPEATS:
+        return [av[2]]
+    if op == sre_constants.SUBPATTERN:
+        return [av[3]]
+    if op == sre_constants.BRANCH:
+        return av[1]
+    if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return [av[1]]
+    if op == sre_constants.GROUPREF_EXISTS:
+        return [branch for branch in av[1:] if branch is not None]
+    return []
+
+
+def _has_variable_repeat(items):
+    for op, av in items:
+        if op in _REPEATS and av[1] > 1 and av[0] != av[1]:
+            return True
+        if any(_has_variable_repeat(sub) for sub in _subpatterns(op, av)):
+            return True
+    return False
+
+
+def _can_be_empty(items):
+    for op, av in items:
+        if op in _REPEATS:
+            if av[0] > 0 and not _can_be_empty(av[2]):
+                return False
+        elif op == sre_constants.SUBPATTERN:
+            if not _can_be_empty(av[3]):
+                return False
+        elif op == sre_constants.BRANCH:
+            if not any(_can_be_empty(branch) for branch in av[1]):
+                return False
+        elif op not in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            return False
+    return True
+
+
+def _overlapping_branches(items):
+    """True if two alternatives of a branch start with the same literal"""
+    for op, av in items:
+        if op == sre_constants.BRANCH:
+            # Tokens can hold lists (character classes), so compare rather than hash
+            firsts = [branch[0] for branch in av[1] if branch]
+            if any(first in firsts[:i] for i, first in enumerate(firsts)):
+                return True
+        if any(_overlapping_branches(sub) for sub in _subpatterns(op, av)):
+            return True
+    return False
+
+
+def _walk(items, risks):
+    for op, av in items:
+        # Bounded repeats ({3}, {1,4}) only cost polynomial backtracking
+        if op in _REPEATS and av[1] == MAXREPEAT:
+            body = av[2]
+            if _has_variable_repeat(body):
+                risks.append("nested quantifier: a repeated group contains another quantifier")
+            elif _can_be_empty(body):
+                risks.append("quantifier applied to a group that can match the empty string")
+            elif _overlapping_branches(body):
+                risks.append("quantified alternation with overlapping alternatives")
+        # Atomic groups and possessive repeats never backtrack into themselves
+        if op == getattr(sre_constants, "ATOMIC_GROUP", None):
+            continue
+        if op == getattr(sre_constants, "POSSESSIVE_REPEAT", None):
+            continue
+        for sub in _subpatterns(op, av):
+            _walk(sub, risks)
+
+
+def find_redos_risks(pattern):
+    """Static check for catastrophic-backtracking shapes; returns a list of warnings"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    risks = []
+    _walk(list(parsed), risks)
+    return sorted(set(risks))
+
+
+def _run_op(op, pattern, test_string, options):
+    if options.pop("engine", "re") == "nfa":
+        # linear_match's pure-Python VM: no backtracking, but slow enough on long inputs to need the budget
+        linear = compile_linear(pattern, native=False)
+        if op == "spans":
+            return page_spans(linear.finditer_spans(test_string), **options)
+        return linear_mode(op, linear, test_string)
+    if op == "spans":
+        return page_spans(re_spans(re.compile(pattern), test_string), **options)
+    if op in TEST_MODES:
+        return re_mode(op, re.compile(pattern), test_string)
+    if op == "bench":
+        return bench_pattern(pattern, **options)
+    if op == "row":
+        return batch_row(options["output"], re.compile(pattern), test_string)
+    if op == "probe":
+        compiled = re.compile(pattern)
+        return [(compiled.search(text) is not None, compiled.fullmatch(text) is not None) for text in test_string]
+    return re.findall(pattern, test_string)
+
+
+def _worker_loop(conn):
+    """Runs in the child: match requests until the parent closes the pipe"""
+    conn.send(("ready", None))
+    while True:
+        try:
+            op, pattern, test_string, options = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send(("ok", _run_op(op, pattern, test_string, options)))
+        except re.error as e:
+            conn.send(("error", f"Invalid regex: {str(e)}"))
+        except UnsupportedPattern as e:
+            conn.send(("error", f"Pattern not supported by the linear engine: {str(e)}"))
+
+
+class GuardedMatcher:
+    """Pool of killable matcher processes with a per-call wall-clock budget.
+
+    Waiting for a free worker counts against the budget: a call that finds
+    every worker taken for all of it returns {"status": "busy"}.
+    """
+
+    def __init__(self, max_workers=2, default_timeout=1.0):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.timeouts = 0
+        self.busy = 0
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_loop, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        # Interpreter start-up takes tens of milliseconds; wait it out here so
+        # it is not charged to the first call's budget
+        try:
+            parent_conn.recv()
+        except EOFError:
+            process.join()
+            parent_conn.close()
+            raise
+        return process, parent_conn
+
+    def _acquire(self):
+        """An idle or new worker for a slot the caller holds"""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker[0].is_alive():
+                    return worker
+        try:
+            return self._spawn()
+        except (EOFError, OSError):
+            self._slots.release()
+            raise
+
+    def _release(self, worker):
+        with self._lock:
+            self._idle.append(worker)
+        self._slots.release()
+
+    def _discard(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._slots.release()
+
+    def run(self, op, pattern, test_string, timeout=None, **options):
+        """Run a matching operation in a worker.
+
+        Returns {"status": "ok", "result": ...}, {"status": "error",
+        "error": ...}, {"status": "timeout"} when the budget is exceeded (the
+        worker is killed and replaced) or {"status": "busy", "error": ...}
+        when no worker came free within it.
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.busy += 1
+            return {"status": "busy",
+                    "error": f"All {self.max_workers} matcher processes stayed busy for {timeout * 1000:.0f} ms"}
+        # Time spent queueing for a slot is charged to the budget; spawning a worker is not
+        timeout = max(0.0, timeout - (time.monotonic() - started))
+        try:
+            worker = self._acquire()
+        except (EOFError, OSError) as e:
+            return {"status": "error", "error": f"Matcher process failed to start: {str(e) or type(e).__name__}"}
+        process, conn = worker
+        with self._lock:
+            self.runs += 1
+        try:
+            conn.send((op, pattern, test_string, options))
+            if not conn.poll(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                self._discard(worker)
+                return {"status": "timeout"}
+            status, payload = conn.recv()
+        except (EOFError, OSError) as e:
+            self._discard(worker)
+            return {"status": "error", "error": f"Matcher process failed: {str(e)}"}
+
+        self._release(worker)
+        if status == "ok":
+            return {"status": "ok", "result": payload}
+        return {"status": "error", "error": payload}
+
+    def findall(self, pattern, test_string, timeout=None):
+        """re.findall in a worker; the matches are under "matches" when ok"""
+        outcome = self.run("findall", pattern, test_string, timeout)
+        if outcome["status"] == "ok":
+            return {"status": "ok", "matches": outcome["result"]}
+        return outcome
+
+    def match_mode(self, mode, pattern, test_string, timeout=None, engine="re"):
+        """match_results.re_mode in a worker; ok outcomes carry "matches" and a "match_count" total.
+
+        engine "nfa" runs linear_match's pure-Python VM (linear_mode) instead of re.
+        """
+        outcome = self.run(mode, pattern, test_string, timeout, engine=engine)
+        if outcome["status"] == "ok":
+            matches, match_count = outcome["result"]
+            return {"status": "ok", "matches": matches, "match_count": match_count}
+        return outcome
+
+    def probe(self, pattern, strings, timeout=None):
+        """search and fullmatch every string in one worker call; ok outcomes carry
+        "hits", a (searched, fully matched) pair per string"""
+        outcome = self.run("probe", pattern, strings, timeout)
+        if outcome["status"] == "ok":
+            return {"status": "ok", "hits": outcome["result"]}
+        return outcome
+
+    def row(self, pattern, strings, output, timeout=None):
+        """match_results.batch_row in a worker; the list is under "row" when ok"""
+        outcome = self.run("row", pattern, strings, timeout, output=output)
+        if outcome["status"] == "ok":
+            return {"status": "ok", "row": outcome["result"]}
+        return outcome
+
+    def bench(self, pattern, timeout=None, **options):
+        """regex_examples.bench_pattern in a worker; ok outcomes carry its report as "bench".
+
+        The timeout covers building the corpus as well as the timed runs.
+        """
+        outcome = self.run("bench", pattern, None, timeout, **options)
+        if outcome["status"] == "ok":
+            return {"status": "ok", "bench": outcome["result"]}
+        return outcome
+
+    def spans(self, pattern, test_string, timeout=None, offset=0, limit=None, engine="re"):
+        """match_results.page_spans in a worker, with re or (engine "nfa") the linear VM;
+        ok outcomes carry the "page" and the "total" count"""
+        outcome = self.run("spans", pattern, test_string, timeout, offset=offset, limit=limit, engine=engine)
+        if outcome["status"] == "ok":
+            page, total = outcome["result"]
+            return {"status": "ok", "page": page, "total": total}
+        return outcome
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "idle_workers": len(self._idle),
+                "default_timeout": self.default_timeout,
+                "runs": self.runs,
+                "timeouts": self.timeouts,
+                "busy": self.busy
+            }
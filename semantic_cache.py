@@ -0,0 +1,256 @@
+"""Near-duplicate prompt cache.
+
+The response cache only hits when two prompts normalize to the same string,
+so "validate emails", "regex for e-mail" and "match an e-mail" each cost an
+upstream call. SemanticCache compares prompts by the character n-grams of
+their content words instead (filler such as "regex for" / "match a" and
+plural endings are dropped first) and serves a cached answer when the
+Jaccard similarity of the two n-gram sets reaches ``threshold``.
+
+Candidates come from a MinHash / LSH index: every prompt gets a
+``bands * rows`` MinHash signature, and prompts sharing any band are
+compared exactly. A lookup therefore touches a handful of entries whatever
+the cache size. Similar n-grams are not enough on their own: prompts that
+differ in one word ("US" / "UK phone numbers", "lowercase" / "uppercase
+hex") want different regexes, so both prompts must also have the same
+content words. Numbers, negations, short tokens and date-format tokens
+("5 digit", "without spaces", "US", "MM-DD-YYYY") must match exactly; longer
+words may differ by one typo ("adress").
+"""
+import random
+import re
+import threading
+from collections import OrderedDict
+
+from response_cache import normalize_prompt
+
+# Words that say "I want a regex" rather than what it should match
+FILLER_WORDS = frozenset("""
+    a an the for to of that which me please i want need give write create make generate
+    regex regexp regular expression expressions pattern patterns match matches matching
+    validate validates validating validation check checks checking find finds finding
+    extract extracts extracting detect detects recognize recognise any some all every each valid
+""".split())
+NEGATIONS = frozenset("not no without except excluding non never".split())
+# Date / time layouts such as mmddyyyy or hhmmss, after inner hyphens are dropped
+_FORMAT_TOKEN = re.compile(r"[dmyhs]+")
+
+_INNER_HYPHEN = re.compile(r"(?<=\w)-(?=\w)")
+_TOKEN = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+# Memoised MinHash rows; prompts are short and mostly share the same n-grams
+_ROW_CACHE_SIZE = 1 << 15
+
+
+def _stem(token):
+    """Fold plurals: emails -> email, addresses -> address, cities -> city"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def _is_guard(token):
+    """Tokens a near-duplicate must repeat exactly"""
+    return (token in NEGATIONS or len(token) <= 3 or any(c.isdigit() for c in token)
+            or _FORMAT_TOKEN.fullmatch(token) is not None)
+
+
+def semantic_key(prompt):
+    """(content text, guard tokens, other content words) for a prompt; the text is what gets compared"""
+    text = _INNER_HYPHEN.sub("", normalize_prompt(prompt))
+    tokens = [_stem(token) for token in _TOKEN.findall(text)]
+    content = [token for token in tokens if token not in FILLER_WORDS]
+    guard = frozenset(token for token in content if _is_guard(token))
+    return " ".join(content), guard, frozenset(content) - guard
+
+
+def _one_edit(a, b):
+    """Whether b is a with one character changed, inserted or removed"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+def same_words(a, b):
+    """Whether two sets of content words pair up, equal or (for words of four
+    letters or more) one typo apart"""
+    if len(a) != len(b):
+        return False
+    unmatched = list(b - a)
+    for word in a - b:
+        partner = next((other for other in unmatched if min(len(word), len(other)) >= 4 and _one_edit(word, other)), None)
+        if partner is None:
+            return False
+        unmatched.remove(partner)
+    return True
+
+
+def shingles(text, n=3):
+    """Character n-grams of the text, padded so short words still produce some"""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SemanticCache:
+    """Prompt -> result cache that also answers for similar prompts"""
+
+    def __init__(self, threshold=0.8, max_entries=10000, ngram=3, bands=8, rows=4, seed=1):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = rows
+        generator = random.Random(seed)
+        self._perms = [
+            (generator.randrange(1, _MERSENNE_PRIME), generator.randrange(0, _MERSENNE_PRIME))
+            for _ in range(bands * rows)
+        ]
+        # entry id -> (text, guard, words, value); ids by text for exact repeats
+        self._entries = OrderedDict()
+        self._ids = {}
+        # One dict per band: band hash -> entry id, or a list of ids on collision
+        self._buckets = [{} for _ in range(bands)]
+        self._rows = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _minhash_row(self, shingle):
+        """The shingle's value under every permutation (30 bits, so comparisons stay cheap)"""
+        row = self._rows.get(shingle)
+        if row is None:
+            if len(self._rows) >= _ROW_CACHE_SIZE:
+                self._rows.clear()
+            x = hash(shingle) & _MERSENNE_PRIME
+            row = self._rows[shingle] = tuple(((a * x + b) % _MERSENNE_PRIME) >> 31 for a, b in self._perms)
+        return row
+
+    def _band_keys(self, text):
+        signature = list(map(min, zip(*map(self._minhash_row, shingles(text, self.ngram)))))
+        rows = self.rows
+        return [hash(tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def _candidates(self, band_keys):
+        candidates = set()
+        for bucket, key in zip(self._buckets, band_keys):
+            ids = bucket.get(key)
+            if ids is None:
+                continue
+            if isinstance(ids, list):
+                candidates.update(ids)
+            else:
+                candidates.add(ids)
+        return candidates
+
+    def lookup(self, prompt):
+        """Best match as (value, similarity, matched text), or None below the threshold"""
+        text, guard, words = semantic_key(prompt)
+        if not text:
+            return None
+        band_keys = self._band_keys(text)
+        query = shingles(text, self.ngram)
+        with self._lock:
+            best = None
+            entry_id = self._ids.get(text)
+            if entry_id is not None:
+                best = (1.0, entry_id)
+            else:
+                for entry_id in self._candidates(band_keys):
+                    entry_text, entry_guard, entry_words, _ = self._entries[entry_id]
+                    if entry_guard != guard or not same_words(words, entry_words):
+                        continue
+                    similarity = jaccard(query, shingles(entry_text, self.ngram))
+                    if similarity >= self.threshold and (best is None or similarity > best[0]):
+                        best = (similarity, entry_id)
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            similarity, entry_id = best
+            self._entries.move_to_end(entry_id)
+            entry_text, _, _, value = self._entries[entry_id]
+            return value, similarity, entry_text
+
+    def get(self, prompt):
+        match = self.lookup(prompt)
+        return None if match is None else match[0]
+
+    def set(self, prompt, value):
+        text, guard, words = semantic_key(prompt)
+        if not text:
+            return
+        band_keys = self._band_keys(text)
+        with self._lock:
+            entry_id = self._ids.get(text)
+            if entry_id is not None:
+                self._entries[entry_id] = (text, guard, words, value)
+                self._entries.move_to_end(entry_id)
+                return
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (text, guard, words, value)
+            self._ids[text] = entry_id
+            for bucket, key in zip(self._buckets, band_keys):
+                ids = bucket.get(key)
+                if ids is None:
+                    bucket[key] = entry_id
+                elif isinstance(ids, list):
+                    ids.append(entry_id)
+                else:
+                    bucket[key] = [ids, entry_id]
+
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        entry_id, (text, _, _, _) = self._entries.popitem(last=False)
+        del self._ids[text]
+        for bucket, key in zip(self._buckets, self._band_keys(text)):
+            ids = bucket.get(key)
+            if isinstance(ids, list):
+                ids.remove(entry_id)
+                if len(ids) == 1:
+                    bucket[key] = ids[0]
+            elif ids == entry_id:
+                del bucket[key]
+        self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
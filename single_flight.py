@@ -0,0 +1,279 @@
+"""Request coalescing for identical concurrent prompts.
+
+When many users click the same /api/examples prompt at once, only the first
+request (the leader) calls the model; the others wait for its result. With
+``lock_dir`` the same happens across gunicorn workers: the leader holds an
+``fcntl.flock`` on ``<lock_dir>/<sha1 of key>.lock`` while it generates and
+writes its result into that file, so a leader in another worker blocks on
+the lock and then reuses the answer instead of making its own call.
+
+A shared result is only as fresh as ``result_ttl``; after that the lock file
+is just a lock. Waiters give up after ``wait_timeout`` (or their deadline)
+and the caller decides what to do, usually calling the model itself.
+
+Lock files idle for ``sweep_age`` are deleted, but only while the sweeper
+holds their lock; a worker that locks a file the sweep has just unlinked
+notices (the inode at the path changed) and locks the new file instead.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+from hedging import DeadlineExceeded, remaining_seconds
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None, wait_timeout=60.0, result_ttl=5.0, poll_interval=0.02,
+                 sweep_age=600.0):
+        self.lock_dir = lock_dir
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.sweep_age = sweep_age
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.leaders = 0
+        self.followers = 0
+        self.shared_across_workers = 0
+        self.wait_timeouts = 0
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _wait_budget(self, deadline):
+        remaining = remaining_seconds(deadline)
+        return self.wait_timeout if remaining is None else min(remaining, self.wait_timeout)
+
+    def do(self, key, fn, deadline=None, shareable=None):
+        """Run fn() once per key among concurrent callers; returns (result, leader).
+
+        Followers raise DeadlineExceeded if the leader has not finished within
+        their deadline, or TimeoutError after wait_timeout. shareable(result)
+        decides whether a result may be handed to other workers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count("followers")
+            if not call.done.wait(self._wait_budget(deadline)):
+                return self._wait_expired(deadline)
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        self._count("leaders")
+        try:
+            call.result = self._run_locked(key, fn, deadline, shareable)
+            return call.result, True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn, deadline=None, shareable=None):
+        """asyncio twin of do(); fn() returns an awaitable"""
+        loop = asyncio.get_running_loop()
+        future = self._async_calls.get(key)
+        if future is not None:
+            self._count("followers")
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self._wait_budget(deadline)), False
+            except asyncio.TimeoutError:
+                return self._wait_expired(deadline)
+
+        future = self._async_calls[key] = loop.create_future()
+        self._count("leaders")
+        try:
+            result = await self._run_locked_async(key, fn, deadline, shareable)
+            future.set_result(result)
+            return result, True
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; retrieve it so asyncio stays quiet
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+
+    def _wait_expired(self, deadline):
+        self._count("wait_timeouts")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded()
+        raise TimeoutError("Timed out waiting for an identical in-flight request")
+
+    # Cross-worker coalescing
+
+    def _lock_path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}.lock")
+
+    def _try_lock(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _is_linked(self, fd, path):
+        """Whether fd is still the file at path (the sweep may have unlinked it since we opened it)"""
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def _reopen(self, fd, path):
+        # Closing the old descriptor drops its lock on the unlinked file
+        new_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.close(fd)
+        return new_fd
+
+    def _acquire(self, fd, path):
+        """(locked, fd): try to lock the file at path, reopening it if fd went stale"""
+        while self._try_lock(fd):
+            if self._is_linked(fd, path):
+                return True, fd
+            # A lock on an unlinked file excludes nobody; lock the file that is there now
+            fd = self._reopen(fd, path)
+        return False, fd
+
+    def _read_shared(self, fd):
+        """The result another worker left in the lock file, if still fresh"""
+        if time.time() - os.fstat(fd).st_mtime > self.result_ttl:
+            return None
+        data = os.pread(fd, os.fstat(fd).st_size, 0)
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def _write_shared(self, fd, result, shareable):
+        if shareable is not None and not shareable(result):
+            return
+        try:
+            data = json.dumps(result).encode("utf-8")
+        except (TypeError, ValueError):
+            return
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, data, 0)
+
+    def _open_lock(self, key):
+        self._sweep()
+        path = self._lock_path(key)
+        return os.open(path, os.O_RDWR | os.O_CREAT, 0o644), path
+
+    def _run_locked(self, key, fn, deadline, shareable):
+        if not self.lock_dir:
+            return fn()
+        fd, path = self._open_lock(key)
+        try:
+            give_up = time.monotonic() + self._wait_budget(deadline)
+            while True:
+                locked, fd = self._acquire(fd, path)
+                if locked:
+                    break
+                if time.monotonic() >= give_up:
+                    # The other worker is stuck; do not hold this request hostage
+                    return fn()
+                time.sleep(self.poll_interval)
+            return self._lead_or_reuse(fd, fn, shareable)
+        finally:
+            os.close(fd)
+
+    def _lead_or_reuse(self, fd, fn, shareable):
+        shared = self._read_shared(fd)
+        if shared is not None:
+            self._count("shared_across_workers")
+            return shared
+        result = fn()
+        self._write_shared(fd, result, shareable)
+        return result
+
+    async def _run_locked_async(self, key, fn, deadline, shareable):
+        if not self.lock_dir:
+            return await fn()
+        fd, path = self._open_lock(key)
+        try:
+            give_up = time.monotonic() + self._wait_budget(deadline)
+            while True:
+                locked, fd = self._acquire(fd, path)
+                if locked:
+                    break
+                if time.monotonic() >= give_up:
+                    return await fn()
+                await asyncio.sleep(self.poll_interval)
+            shared = self._read_shared(fd)
+            if shared is not None:
+                self._count("shared_across_workers")
+                return shared
+            result = await fn()
+            self._write_shared(fd, result, shareable)
+            return result
+        finally:
+            os.close(fd)
+
+    def _sweep(self):
+        """Delete lock files nobody has touched for sweep_age seconds.
+
+        A file is only unlinked while the sweep holds its lock, so a leader
+        (which holds it while generating) never loses its file.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_age:
+                return
+            self._last_sweep = now
+        cutoff = time.time() - self.sweep_age
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if not entry.name.endswith(".lock") or entry.stat().st_mtime >= cutoff:
+                    continue
+                fd = os.open(entry.path, os.O_RDWR)
+            except OSError:
+                continue
+            try:
+                # Touched while we were looking, or replaced by a fresh file: leave it
+                if (self._try_lock(fd) and os.fstat(fd).st_mtime < cutoff
+                        and self._is_linked(fd, entry.path)):
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cross_worker": bool(self.lock_dir),
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "shared_across_workers": self.shared_across_workers,
+                "wait_timeouts": self.wait_timeouts
+            }
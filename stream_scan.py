@@ -0,0 +1,72 @@
+"""Incremental regex scanning over text that arrives in chunks.
+
+``scan_chunks`` keeps a sliding buffer instead of the whole input. After each
+chunk it runs ``finditer`` from where the previous pass stopped and reports
+the matches that start at least ``window`` characters before the end of the
+buffer; anything later could still grow (or only begin to match) once more
+text arrives, so it is rescanned with the next chunk. ``window`` characters
+are also kept to the left of the resume position, so lookbehinds, ``\\b``
+and ``^`` see the real preceding text rather than a buffer edge.
+
+This is exact for matches no longer than ``window`` (lookarounds included).
+A longer match is reported with the part seen so far and flagged
+``truncated``. ``match_window`` derives a window from the pattern itself
+when its width is bounded.
+"""
+import codecs
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Slack on top of a bounded pattern width for lookarounds outside the match
+LOOKAROUND_CHARS = 64
+
+
+def match_window(pattern, max_window, flags=0):
+    """Characters of lookahead needed to decide a match of pattern, at most max_window"""
+    _, widest = sre_parse.parse(pattern, flags).getwidth()
+    if widest >= sre_constants.MAXREPEAT:
+        return max_window
+    return max(1, min(max_window, widest + LOOKAROUND_CHARS))
+
+
+def scan_chunks(compiled, chunks, window, encoding="utf-8"):
+    """Yield (offset, match, truncated) for every match in the concatenated chunks.
+
+    chunks is an iterable of bytes; offset + match.start() is the match's
+    character position in the decoded input.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = ""
+    offset = 0  # absolute position of buffer[0]
+    pos = 0  # where the next finditer starts, relative to buffer
+
+    def scan(final):
+        nonlocal pos
+        limit = len(buffer) if final else len(buffer) - window
+        # The final pass still looks for an empty match at the very end
+        if pos > limit or (pos == limit and not final):
+            return
+        for match in compiled.finditer(buffer, pos):
+            if match.start() >= limit and not final:
+                break
+            yield offset, match, not final and match.end() == len(buffer)
+            pos = match.end() if match.end() > match.start() else match.start() + 1
+        # No match starts in [pos, limit): those positions are settled
+        pos = max(pos, limit)
+
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        yield from scan(False)
+        keep_from = max(0, pos - window)
+        if keep_from:
+            buffer = buffer[keep_from:]
+            offset += keep_from
+            pos -= keep_from
+
+    buffer += decoder.decode(b"", final=True)
+    yield from scan(True)
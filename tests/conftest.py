@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+from fake_upstream import start_fake_upstream  # noqa: E402
+
+
+@pytest.fixture
+def start_upstream():
+    """Starts local fake OpenRouters, each returning (completions_url, state); all stop after the test"""
+    servers = []
+
+    def start(mode="healthy", delay=2.0):
+        server, url, state = start_fake_upstream(mode=mode, delay=delay)
+        servers.append(server)
+        return url, state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fake_upstream(start_upstream):
+    """(completions_url, state) of a local fake OpenRouter, healthy until state.mode changes"""
+    return start_upstream()
@@ -0,0 +1,147 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Usage:  python tests/fake_upstream.py [--port 8099] [--mode healthy|slow|failing] [--delay 2]
+
+Point the service at it with the generator's base_url (or import
+``start_fake_upstream`` from a test or benchmark). The behaviour can be switched at
+runtime:
+
+    curl 'http://127.0.0.1:8099/mode?mode=failing'
+    curl 'http://127.0.0.1:8099/mode?mode=slow&delay=5'
+    curl 'http://127.0.0.1:8099/mode?mode=slow&delay=3&slow_fraction=0.1'
+
+healthy answers immediately, slow sleeps ``delay`` seconds first (for a
+random ``slow_fraction`` of calls, to mimic a latency tail), failing
+returns 503. Requests with "stream": true get an SSE response.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MODES = ("healthy", "slow", "failing")
+
+
+class FakeUpstreamState:
+    def __init__(self, mode="healthy", delay=2.0, slow_fraction=1.0,
+                 regex=r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"):
+        self.mode = mode
+        self.delay = delay
+        self.slow_fraction = slow_fraction
+        self.regex = regex
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            "mode": self.mode,
+            "delay": self.delay,
+            "slow_fraction": self.slow_fraction,
+            "regex": self.regex,
+            "calls": self.calls
+        }
+
+
+def make_handler(state):
+    class FakeUpstreamHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (deadline, hedge loser)
+                self.close_connection = True
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            if "mode" in query and query["mode"][0] in MODES:
+                state.mode = query["mode"][0]
+            if "delay" in query:
+                state.delay = float(query["delay"][0])
+            if "slow_fraction" in query:
+                state.slow_fraction = float(query["slow_fraction"][0])
+            if "regex" in query:
+                state.regex = query["regex"][0]
+            self.send_body(200, json.dumps(state.to_dict()).encode("utf-8"))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with state.lock:
+                state.calls += 1
+
+            if state.mode == "slow" and random.random() < state.slow_fraction:
+                time.sleep(state.delay)
+            if state.mode == "failing":
+                return self.send_body(503, b'{"error": {"message": "upstream unavailable"}}')
+
+            content = f"Let me think about this.\nREGEX: {state.regex}\nThis matches the request."
+            if request.get("stream"):
+                return self.stream(content)
+            body = {"model": request.get("model"), "choices": [{"message": {"role": "assistant", "content": content}}]}
+            self.send_body(200, json.dumps(body).encode("utf-8"))
+
+        def stream(self, content):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for i in range(0, len(content), 8):
+                    chunk = {"choices": [{"delta": {"content": content[i:i + 8]}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return FakeUpstreamHandler
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops bursts of new connections, which
+    # then retry a second later and look like upstream latency
+    request_queue_size = 128
+
+
+def start_fake_upstream(port=0, mode="healthy", delay=2.0, slow_fraction=1.0):
+    """Serve in a daemon thread; returns (server, completions_url, state)"""
+    state = FakeUpstreamState(mode=mode, delay=delay, slow_fraction=slow_fraction)
+    server = FakeUpstreamServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions", state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--mode", choices=MODES, default="healthy")
+    parser.add_argument("--delay", type=float, default=2.0, help="seconds to stall in slow mode")
+    parser.add_argument("--slow-fraction", type=float, default=1.0, help="share of calls that stall in slow mode")
+    args = parser.parse_args()
+
+    server, url, _ = start_fake_upstream(args.port, args.mode, args.delay, args.slow_fraction)
+    print(f"Fake upstream ({args.mode}) listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def post_test(client, **body):
+    return client.post('/api/test', json=body)
+
+
+def test_plain_match(client):
+    response = post_test(client, regex=r"\d+", test_string="a1 b22")
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["matches"] == ["1", "22"]
+    assert data["engine"] == "re"
+
+
+@pytest.mark.parametrize("engine", ["auto", "linear"])
+def test_linear_vm_is_budgeted(client, engine):
+    if app_module.linear_cache.compile(r"(a{1,100}b?)+$").engine == "re2":
+        pytest.skip("re2 runs natively")
+    started = time.perf_counter()
+    response = post_test(client, regex=r"(a{1,100}b?)+$", test_string="a" * 40000 + "!",
+                         engine=engine, timeout_ms=300)
+    data = response.get_json()
+    assert time.perf_counter() - started < 3
+    assert data["status"] == "timeout"
+    assert data["engine"] == "nfa"
+    assert data["guarded"] is True
+
+
+def test_linear_vm_results_from_worker(client):
+    response = post_test(client, regex=r"(a+)+b", test_string="aab ab", engine="linear")
+    data = response.get_json()
+    assert data["success"] and data["guarded"]
+    assert data["matches"] == ["aa", "a"]
+    assert data["match_count"] == 2
+    response = post_test(client, regex=r"(a+)+b", test_string="aab ab", engine="linear", format="columnar")
+    assert response.get_json()["match_count"] == 2
+
+
+@pytest.mark.parametrize("body", [
+    {"guarded": "false"},
+    {"guarded": 1},
+    {"timeout_ms": 0},
+    {"timeout_ms": -5},
+    {"timeout_ms": "soon"},
+])
+def test_bad_guard_options_rejected(client, body):
+    response = post_test(client, regex=r"\d+", test_string="1", **body)
+    assert response.status_code == 400
+
+
+def test_guarded_flag(client):
+    data = post_test(client, regex=r"\d+", test_string="1 2", guarded=True, engine="re").get_json()
+    assert data["guarded"] is True and data["matches"] == ["1", "2"]
+    data = post_test(client, regex=r"\d+", test_string="1 2", guarded=False, engine="re").get_json()
+    assert data["guarded"] is False
+
+
+def test_explicit_guarded_false_is_respected_by_the_linear_engine(client):
+    if app_module.linear_cache.compile(r"(a+)+b").engine == "re2":
+        pytest.skip("re2 is never guarded")
+    data = post_test(client, regex=r"(a+)+b", test_string="aab ab", engine="linear", guarded=False).get_json()
+    assert data["guarded"] is False
+    assert data["matches"] == ["aa", "a"]
+    assert "guard_override" not in data
+
+
+def test_guard_overrides_are_reported(client):
+    data = post_test(client, regex=r"^(a+)+$", test_string="aaa", engine="re", guarded=False).get_json()
+    assert data["guarded"] is True
+    assert "backtracking" in data["guard_override"]
+    data = post_test(client, regex=r"^(a+)+$", test_string="aaa", engine="re").get_json()
+    assert data["guarded"] is True
+    assert "guard_override" not in data
+
+
+def test_re2_is_never_guarded(client):
+    if app_module.linear_cache.compile(r"\d+").engine != "re2":
+        pytest.skip("re2 not installed")
+    data = post_test(client, regex=r"\d+", test_string="1 2", engine="linear", guarded=True).get_json()
+    assert data["guarded"] is False
+    assert "re2" in data["guard_override"]
@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_matrix(client):
+    response = client.post('/api/test/batch', json={
+        "patterns": [r"\d+", r"[a-z]"], "strings": ["a1b22", "x"], "output": "counts"
+    })
+    data = response.get_json()
+    assert data["success"]
+    assert data["matrix"] == [[2, 0], [2, 1]]
+
+
+def test_risky_pattern_is_guarded(client):
+    started = time.perf_counter()
+    response = client.post('/api/test/batch', json={
+        "patterns": [r"\d+", r"^(a+)+$", r"(ab+)+c"],
+        "strings": ["a" * 40 + "!", "abbc"],
+        "output": "booleans"
+    })
+    data = response.get_json()
+    assert time.perf_counter() - started < 5
+    assert data["matrix"][0] == [False, False]
+    assert data["matrix"][1] is None
+    assert "time budget" in data["errors"]["1"]
+    assert data["matrix"][2] == [False, True]
+    assert set(data["errors"]) == {"1"}
+
+
+def test_guarded_budget_is_shared(monkeypatch):
+    monkeypatch.setattr(app_module, "TEST_BATCH_GUARDED_BUDGET_MS", 0)
+    rows, errors = app_module.match_rows([r"(a+)+b", r"x"], ["aab"], "counts")
+    assert rows == [None, [0]]
+    assert errors[0].startswith("Not run")
+
+
+def test_parallel_matrix_keeps_row_order(monkeypatch):
+    monkeypatch.setattr(app_module, "TEST_BATCH_PARALLEL_CELLS", 1)
+    monkeypatch.setattr(app_module, "TEST_BATCH_WORKERS", 2)
+    patterns = [r"a", r"(ab+)+c", r"(", r"b+", r"^(a+)+$"]
+    rows, errors = app_module.match_matrix(patterns, ["abbc", "a" * 40 + "!"], "counts")
+    assert rows[:4] == [[1, 40], [1, 0], None, [1, 0]]
+    assert errors[2].startswith("Invalid regex")
+    assert rows[4] is None and "time budget" in errors[4]
+    assert set(errors) == {2, 4}
+
+
+def test_parallel_matrix_stops_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(app_module, "TEST_BATCH_PARALLEL_CELLS", 1)
+    monkeypatch.setattr(app_module, "TEST_BATCH_WORKERS", 2)
+    rows, errors = app_module.match_matrix([r"a", r"b", r"(a+)+b"], ["ab"] * 1000, "counts",
+                                           deadline=time.monotonic())
+    assert rows == [None, None, None]
+    assert all(error.startswith("Not run") for error in errors.values())
+    assert set(errors) == {0, 1, 2}
+    # The abandoned pool is not reused
+    assert app_module.test_batch_pool is None
+    rows, errors = app_module.match_matrix([r"a", r"b"], ["ab"], "counts", deadline=time.monotonic() + 30)
+    assert rows == [[1], [1]] and not errors
+
+
+def test_bad_deadline(client):
+    response = client.post('/api/test/batch', json={"patterns": ["a"], "strings": ["a"], "deadline_ms": 0})
+    assert response.status_code == 400
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import asgi
+
+MODEL_REGEX = r"model-\d+"
+
+
+async def call(application, path, body, headers=()):
+    """Drive one ASGI http request; returns (status, decoded JSON body)"""
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers)}
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": json.dumps(body).encode("utf-8"), "more_body": False}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    status = messages[0]["status"]
+    payload = b"".join(message.get("body", b"") for message in messages[1:])
+    return status, json.loads(payload)
+
+
+@pytest.fixture
+def upstream(fake_upstream, monkeypatch):
+    """asgi.async_generator pointed at the fake upstream; returns its state"""
+    url, state = fake_upstream
+    state.regex = MODEL_REGEX
+    # No caches, single flight or validation, so every request reaches the upstream
+    generator = asgi.AsyncSmartRegexGenerator("test", read_timeout=0.5)
+    generator.base_url = url
+    monkeypatch.setattr(asgi, "async_generator", generator)
+
+    return state
+
+
+def generate(*prompts, **body):
+    """(status, body) per prompt, all sent at once; the session is closed after"""
+    async def run():
+        try:
+            return await asyncio.gather(*(
+                call(asgi.application, "/api/generate", dict(body, prompt=prompt)) for prompt in prompts
+            ))
+        finally:
+            await asgi.async_generator.close()
+
+    return asyncio.run(run())
+
+
+def test_model_answer(upstream):
+    (status, data), = generate("order numbers")
+    assert status == 200
+    assert data["regex"] == MODEL_REGEX
+    assert upstream.calls == 1
+
+
+def test_concurrent_requests_overlap(upstream):
+    upstream.mode, upstream.delay = "slow", 0.3
+    started = time.perf_counter()
+    results = generate(*(f"order numbers {i}" for i in range(8)))
+    elapsed = time.perf_counter() - started
+    assert [data["regex"] for _, data in results] == [MODEL_REGEX] * 8
+    # Eight 0.3 s upstream calls one after another would take 2.4 s
+    assert elapsed < 1.2
+    assert upstream.calls == 8
+
+
+def test_upstream_error_serves_fallback(upstream):
+    upstream.mode = "failing"
+    (status, data), = generate("email addresses")
+    assert status == 200
+    assert data["regex"] == asgi.async_generator.generate_smart_fallback("email addresses")
+    assert data["regex"] != MODEL_REGEX
+    assert "fallback" in data["full_response"]
+
+
+def test_upstream_timeout_serves_fallback(upstream):
+    upstream.mode, upstream.delay = "slow", 2
+    started = time.perf_counter()
+    (status, data), = generate("email addresses")
+    assert time.perf_counter() - started < 1.5
+    assert status == 200
+    assert data["regex"] == asgi.async_generator.generate_smart_fallback("email addresses")
+    assert "fallback" in data["full_response"]
+
+
+def test_deadline_serves_fallback(upstream):
+    upstream.mode, upstream.delay = "slow", 2
+    (status, data), = generate("email addresses", deadline_ms=200)
+    assert status == 200
+    assert data["deadline_exceeded"] is True
+    assert data["regex"] != MODEL_REGEX
+
+
+def test_cache_io_runs_off_the_event_loop(upstream, monkeypatch):
+    loop_threads = []
+    generator = asgi.async_generator
+    get_cached, remember = generator.get_cached, generator.remember
+
+    def record(fn):
+        def wrapper(*args):
+            loop_threads.append(threading.current_thread() is threading.main_thread())
+            return fn(*args)
+        return wrapper
+
+    monkeypatch.setattr(generator, "get_cached", record(get_cached))
+    monkeypatch.setattr(generator, "remember", record(remember))
+    (status, data), = generate("order numbers")
+    assert status == 200 and data["regex"] == MODEL_REGEX
+    # asyncio.run drives the loop on the main thread; both calls went to the executor
+    assert loop_threads == [False, False]
@@ -0,0 +1,143 @@
+import json
+
+import requests
+
+from app import SmartRegexGenerator
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StubHTTPClient:
+    """PooledHTTPClient stand-in answering every POST with status"""
+
+    timeout = (5.0, 30.0)
+
+    def __init__(self, status=200):
+        self.status = status
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = self.status
+        response.url = url
+        response._content = json.dumps({"choices": [{"message": {"content": "REGEX: model-\\d+"}}]}).encode()
+        return response
+
+
+def make_breaker(clock, **options):
+    options = dict(dict(window_seconds=10, min_calls=4, failure_rate=0.5, slow_call_seconds=5,
+                        open_seconds=30, half_open_probes=2), **options)
+    return CircuitBreaker(clock=clock, **options)
+
+
+def fail(breaker, times, duration=0.1):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record(duration, False)
+
+
+def test_opens_at_failure_rate():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(0.1, True)
+    fail(breaker, 1)
+    assert breaker.state == CLOSED  # 3 calls, under min_calls
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_old_failures_leave_the_window():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 3)
+    clock.advance(11)
+    fail(breaker, 1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_failures"] == 1
+
+
+def test_slow_calls_open():
+    clock = FakeClock()
+    breaker = make_breaker(clock, slow_call_rate=0.5)
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(6.0, True)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probes_close_or_reopen():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.advance(29)
+    assert not breaker.allow()
+    clock.advance(1)
+
+    # A failed probe reopens for another open_seconds
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    breaker.record(0.1, False)
+    assert breaker.state == OPEN
+    assert breaker.stats()["retry_in_seconds"] == 30
+    clock.advance(30)
+
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()  # only half_open_probes at once
+    breaker.record(0.1, True)
+    assert breaker.state == HALF_OPEN
+    breaker.record(0.1, True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 0
+    assert breaker.stats()["times_opened"] == 2
+
+
+def test_lost_probes_are_retried():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.advance(30)
+    assert breaker.allow() and breaker.allow()
+    clock.advance(30)
+    assert breaker.allow()
+
+
+def test_generator_serves_fallback_while_open():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    upstream = StubHTTPClient(status=503)
+    generator = SmartRegexGenerator("test", http_client=upstream, circuit_breaker=breaker)
+    fallback = generator.generate_smart_fallback("email addresses")
+
+    for _ in range(4):
+        result = generator.generate_regex("email addresses")
+        assert result["source"] == "fallback" and result["regex"] == fallback
+    assert breaker.state == OPEN
+    assert upstream.calls == 4
+
+    result = generator.generate_regex("email addresses")
+    assert result["regex"] == fallback
+    assert "circuit open" in result["full_response"]
+    assert upstream.calls == 4
+
+    # The upstream recovers; the probes close the circuit again
+    upstream.status = 200
+    clock.advance(30)
+    for _ in range(2):
+        assert generator.generate_regex("email addresses")["regex"] == r"model-\d+"
+    assert breaker.state == CLOSED
+    assert upstream.calls == 6
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app as app_module
+
+
+class StubGenerator:
+    """Answers prompt -> "re:<prompt>" after ``delays[prompt]`` seconds; cached prompts skip the call"""
+
+    def __init__(self, delays=None, cached=()):
+        self.delays = delays or {}
+        self.cached = set(cached)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_cached(self, prompt):
+        if prompt in self.cached:
+            return {"success": True, "regex": f"re:{prompt}", "cached": True}
+        return None
+
+    def generate_regex(self, prompt, deadline=None):
+        with self.lock:
+            self.calls.append(prompt)
+        time.sleep(self.delays.get(prompt, 0))
+        if prompt == "boom":
+            raise RuntimeError("upstream broke")
+        return {"success": True, "regex": f"re:{prompt}"}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    def install(**options):
+        generator = StubGenerator(**options)
+        monkeypatch.setattr(app_module, "generator", generator)
+        return generator
+    return install
+
+
+def post_batch(prompts, **body):
+    client = app_module.app.test_client()
+    response = client.post('/api/generate/batch', json=dict(body, prompts=prompts))
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_duplicates_share_one_call(stub):
+    generator = stub()
+    lines = post_batch(["Emails", "phone numbers", "  emails. ", "EMAILS"])
+    assert sorted(generator.calls) == ["Emails", "phone numbers"]
+    by_prompt = {line["prompt"]: line for line in lines}
+    assert by_prompt["Emails"]["indices"] == [0, 2, 3]
+    assert by_prompt["phone numbers"]["indices"] == [1]
+
+
+def test_lines_come_in_completion_order(stub):
+    stub(delays={"slow": 0.3, "fast": 0.0}, cached=["cached"])
+    lines = post_batch(["slow", "fast", "cached"])
+    # Cached answers go out before any upstream call, then whichever call finishes first
+    assert [line["prompt"] for line in lines] == ["cached", "fast", "slow"]
+    assert lines[0]["cached"] is True
+    assert sorted(i for line in lines for i in line["indices"]) == [0, 1, 2]
+
+
+def test_invalid_items_have_the_same_shape(stub):
+    stub()
+    lines = post_batch(["", 42, "   ", "boom", "digits"])
+    by_index = {line["indices"][0]: line for line in lines}
+    assert set(by_index) == {0, 1, 2, 3, 4}
+    for index in (0, 1, 2):
+        assert by_index[index]["success"] is False
+        assert by_index[index]["error"] == "Prompt cannot be empty"
+    assert by_index[3]["error"] == "Server error: upstream broke"
+    assert by_index[4]["regex"] == "re:digits"
+    keys = {frozenset(line) - {"error", "optimized_regex", "optimizations"} for line in lines}
+    assert len(keys) == 1
+    assert {"prompt", "success", "regex", "indices", "timestamp"} <= next(iter(keys))
+
+
+def test_disconnect_does_not_wait_for_queued_prompts(stub):
+    generator = stub(delays={f"p{i}": 0.5 for i in range(6)})
+    client = app_module.app.test_client()
+    response = client.post('/api/generate/batch', json={"prompts": [f"p{i}" for i in range(6)],
+                                                        "concurrency": 1},
+                           buffered=False)
+    lines = iter(response.response)
+    next(lines)
+    started = time.perf_counter()
+    response.close()
+    # Only the call already running may finish; the queued ones are cancelled
+    assert time.perf_counter() - started < 0.4
+    time.sleep(0.6)
+    assert len(generator.calls) <= 2
+
+
+def test_bad_body(stub):
+    stub()
+    client = app_module.app.test_client()
+    assert client.post('/api/generate/batch', json={"prompts": "x"}).status_code == 400
+    assert client.post('/api/generate/batch', json={"prompts": ["x"], "concurrency": "many"}).status_code == 400
@@ -0,0 +1,126 @@
+import itertools
+import json
+
+import pytest
+
+import app as app_module
+
+
+class StreamingResponse:
+    """A streamed completion that keeps sending text after the REGEX line, and never ends"""
+
+    status_code = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.read = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            self.read += 1
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+class StubClient:
+    def __init__(self, response):
+        self.response = response
+        self.posts = []
+
+    def post(self, url, **kwargs):
+        self.posts.append(kwargs)
+        return self.response
+
+
+def delta(text):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": text}}]})
+
+
+def test_stream_closes_after_the_regex_line():
+    chatter = itertools.cycle([delta("and some more "), "", ": OPENROUTER PROCESSING"])
+    lines = itertools.chain([delta("Thinking.\nREG"), delta("EX: \\d+"), delta("\nThis")], chatter)
+    response = StreamingResponse(lines)
+    client = StubClient(response)
+    generator = app_module.SmartRegexGenerator("test", http_client=client)
+
+    events = list(generator.generate_regex_stream("numbers"))
+    *progress, (kind, result) = events
+    assert [event for event, _ in progress] == ["progress"] * 3
+    assert kind == "result"
+    assert result["regex"] == r"\d+"
+    assert (result["early_stop"], result["chunks"], result["streamed"]) == (True, 3, True)
+    # Nothing past the finished line was read, and the connection was let go
+    assert response.read == 3 and response.closed
+    assert client.posts[0]["stream"] is True and client.posts[0]["json"]["stream"] is True
+
+
+def test_stream_without_a_regex_line_reads_to_the_end():
+    lines = [delta("`[a-z]+`"), "data: [DONE]", delta("ignored")]
+    response = StreamingResponse(lines)
+    generator = app_module.SmartRegexGenerator("test", http_client=StubClient(response))
+
+    *_, (_, result) = generator.generate_regex_stream("words")
+    assert result["regex"] == "[a-z]+"
+    assert result["early_stop"] is False
+    assert response.read == 2 and response.closed
+
+
+def test_cached_prompt_is_not_streamed():
+    response = StreamingResponse([])
+    client = StubClient(response)
+    generator = app_module.SmartRegexGenerator("test", http_client=client)
+    cached = {"success": True, "regex": r"\d+", "cached": True}
+    generator.get_cached = {"numbers": cached}.get
+    assert list(generator.generate_regex_stream("numbers")) == [("result", cached)]
+    assert client.posts == []
+
+
+def parse_sse(body):
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def stream_generator(fake_upstream, monkeypatch):
+    url, state = fake_upstream
+    generator = app_module.SmartRegexGenerator("test")
+    generator.base_url = url
+    monkeypatch.setattr(app_module, "generator", generator)
+    return state
+
+
+def test_stream_route_stops_early(stream_generator):
+    stream_generator.regex = r"\d{3}"
+    response = app_module.app.test_client().get('/api/generate/stream', query_string={"prompt": "three digits"})
+    assert response.mimetype == "text/event-stream"
+    *progress, (kind, result) = parse_sse(response.get_data(as_text=True))
+    assert kind == "result"
+    assert result["success"] and result["regex"] == r"\d{3}"
+    assert result["early_stop"] is True
+    # The fake keeps talking after the REGEX line; those chunks were never read
+    content = f"Let me think about this.\nREGEX: {stream_generator.regex}\nThis matches the request."
+    assert len(progress) < len(range(0, len(content), 8))
+    assert "".join(payload["delta"] for _, payload in progress).startswith("Let me think")
+
+
+def test_stream_route_falls_back_when_upstream_fails(stream_generator):
+    stream_generator.mode = "failing"
+    response = app_module.app.test_client().post('/api/generate/stream', json={"prompt": "email addresses"})
+    (kind, result), = parse_sse(response.get_data(as_text=True))
+    assert kind == "result"
+    assert result["early_stop"] is False
+    assert "fallback" in result["full_response"]
+
+
+def test_stream_route_needs_a_prompt():
+    response = app_module.app.test_client().post('/api/generate/stream', json={"prompt": "  "})
+    assert response.status_code == 400
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from hedging import DeadlineExceeded, Hedger, LatencyTracker
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_hedger(clock, **options):
+    # min_samples is never reached, so the hedge delay stays default_delay
+    options.setdefault("default_delay", 1.0)
+    return Hedger(min_samples=10 ** 6, clock=clock, **options)
+
+
+def wait_for(condition, timeout=5.0):
+    stop = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < stop, "condition never became true"
+        time.sleep(0.005)
+
+
+def test_hedge_after_delay_and_hedge_wins():
+    clock = FakeClock()
+    hedger = make_hedger(clock)
+    release = threading.Event()
+
+    def attempt(number):
+        if number == 1:
+            # Still running past the hedge delay
+            clock.advance(2)
+            release.wait(5)
+            return "first"
+        return "hedge"
+
+    try:
+        assert hedger.run(attempt) == "hedge"
+    finally:
+        release.set()
+    assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+
+
+def test_fast_answer_sends_no_hedge():
+    hedger = make_hedger(FakeClock())
+    calls = []
+    assert hedger.run(lambda number: calls.append(number) or "ok") == "ok"
+    assert calls == [1]
+    assert hedger.hedges == 0
+
+
+def test_failed_attempt_is_replaced_at_once():
+    hedger = make_hedger(FakeClock(), default_delay=3600)
+
+    def attempt(number):
+        if number == 1:
+            raise ConnectionError("reset")
+        return "second"
+
+    assert hedger.run(attempt) == "second"
+    assert hedger.hedges == 1
+
+
+def test_every_attempt_failing_raises_the_last_error():
+    hedger = make_hedger(FakeClock())
+
+    def attempt(number):
+        raise ValueError(f"attempt {number}")
+
+    with pytest.raises(ValueError, match="attempt 2"):
+        hedger.run(attempt)
+
+
+def test_deadline():
+    clock = FakeClock()
+    hedger = make_hedger(clock, max_attempts=1)
+    release = threading.Event()
+
+    def attempt(number):
+        clock.advance(1)
+        release.wait(5)
+        return "late"
+
+    try:
+        with pytest.raises(DeadlineExceeded):
+            hedger.run(attempt, deadline=clock() + 0.5)
+    finally:
+        release.set()
+    assert hedger.deadlines_exceeded == 1
+    with pytest.raises(DeadlineExceeded):
+        hedger.run(attempt, deadline=clock() - 1)
+
+
+def test_queued_time_does_not_count_and_saturated_pool_is_not_hedged():
+    clock = FakeClock()
+    hedger = make_hedger(clock, max_workers=1, default_delay=0.05)
+    release = threading.Event()
+    calls = []
+
+    def blocking(number):
+        calls.append(("blocking", number))
+        release.wait(5)
+        return "blocking"
+
+    def quick(number):
+        calls.append(("quick", number))
+        return "quick"
+
+    results = {}
+    blocker = threading.Thread(target=lambda: results.setdefault("blocking", hedger.run(blocking)))
+    blocker.start()
+    wait_for(lambda: calls)
+    queued = threading.Thread(target=lambda: results.setdefault("quick", hedger.run(quick)))
+    queued.start()
+    # Both runs are well past the hedge delay, but the only worker is taken
+    clock.advance(10)
+    wait_for(lambda: hedger.hedges_skipped >= 1)
+    release.set()
+    blocker.join(5)
+    queued.join(5)
+    assert results == {"blocking": "blocking", "quick": "quick"}
+    # The queued run's timer started when it got the worker, so it never hedged
+    assert calls == [("blocking", 1), ("quick", 1)]
+    assert hedger.hedges == 0
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker(window=10, percentile=90, min_samples=5, default=5.0, floor=0.05)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracker.record(seconds)
+    assert tracker.hedge_delay() == 5.0
+    for seconds in range(1, 11):
+        tracker.record(seconds)
+    # The window keeps the last ten samples
+    assert tracker.hedge_delay() == 10
+
+
+def test_hedging_is_opt_in(monkeypatch):
+    monkeypatch.delenv("HEDGING", raising=False)
+    assert app_module.build_hedger() is None
+    monkeypatch.setenv("HEDGING", "true")
+    assert isinstance(app_module.build_hedger(), Hedger)
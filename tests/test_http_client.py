@@ -0,0 +1,29 @@
+import socket
+import time
+
+import pytest
+import requests
+
+from http_client import PooledHTTPClient
+
+
+def test_error_statuses_are_not_replayed(fake_upstream):
+    url, state = fake_upstream
+    state.mode = "failing"
+    client = PooledHTTPClient(retries=2, backoff_factor=0)
+    response = client.post(url, json={})
+    assert response.status_code == 503
+    assert state.calls == 1
+
+
+def test_connect_retries_stop_at_the_deadline():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    url = f"http://127.0.0.1:{port}/v1/chat/completions"
+    client = PooledHTTPClient(retries=5, backoff_factor=1)
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post(url, deadline=started + 0.5, json={})
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,131 @@
+import io
+import json
+import logging
+import logging.handlers
+import threading
+import time
+
+import pytest
+
+import logging_config
+from logging_config import LOGGER_NAME, PAYLOAD_LOGGER_NAME, LazyJSON
+
+
+class SlowStream(io.StringIO):
+    """A stdout that takes a while per write, like a pipe nobody is draining"""
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+        self.writers = set()
+
+    def write(self, text):
+        self.writers.add(threading.current_thread().name)
+        time.sleep(self.seconds)
+        return super().write(text)
+
+
+class Counted:
+    """Counts how often it is turned into text"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "counted"
+
+
+def queue_handlers(logger):
+    # pytest hangs its own capture handlers on non-propagating loggers too
+    return [handler for handler in logger.handlers if isinstance(handler, logging.handlers.QueueHandler)]
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    """configure_logging on a fresh listener; the app's own setup is put back afterwards"""
+    logger = logging.getLogger(LOGGER_NAME)
+    payloads = logging.getLogger(PAYLOAD_LOGGER_NAME)
+    saved = (queue_handlers(logger), logger.level, payloads.level)
+    monkeypatch.setattr(logging_config, "_listener", None)
+    for handler in saved[0]:
+        logger.removeHandler(handler)
+
+    def configure(stream=None, **kwargs):
+        stream = stream or io.StringIO()
+        return logging_config.configure_logging(stream=stream, **kwargs), stream
+
+    yield configure
+    logging_config.shutdown_logging()
+    for handler in queue_handlers(logger):
+        logger.removeHandler(handler)
+    for handler in saved[0]:
+        logger.addHandler(handler)
+    logger.setLevel(saved[1])
+    payloads.setLevel(saved[2])
+
+
+def test_text_records_are_written_by_the_listener(configure):
+    logger, stream = configure(level="INFO", fmt="text")
+    assert len(queue_handlers(logger)) == 1
+    logger.info("hello %s", "there")
+    logger.debug("too quiet")
+    logging_config.shutdown_logging()
+    output = stream.getvalue()
+    assert "INFO" in output and "smart_regex: hello there" in output
+    assert "too quiet" not in output
+
+
+def test_json_format(configure):
+    logger, stream = configure(level="INFO", fmt="json")
+    logging.getLogger(LOGGER_NAME + ".cache").warning("miss for %r", "emails")
+    logging_config.shutdown_logging()
+    entry = json.loads(stream.getvalue())
+    assert (entry["level"], entry["logger"], entry["message"]) == ("WARNING", "smart_regex.cache", "miss for 'emails'")
+    assert entry["time"].endswith("+00:00")
+
+
+def test_slow_output_does_not_block_the_caller(configure):
+    logger, stream = configure(stream=SlowStream(0.1), level="INFO")
+    started = time.perf_counter()
+    for i in range(5):
+        logger.info("record %d", i)
+    assert time.perf_counter() - started < 0.1
+    logging_config.shutdown_logging()
+    assert stream.getvalue().count("record") == 5
+    assert threading.current_thread().name not in stream.writers
+
+
+def test_configuring_twice_keeps_one_handler(configure):
+    logger, _ = configure(level="INFO")
+    again, _ = configure(level="ERROR")
+    assert again is logger
+    assert len(queue_handlers(logger)) == 1
+    assert logger.level == logging.ERROR
+
+
+def test_defaults_come_from_the_environment(configure, monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL", "warning")
+    monkeypatch.setenv("LOG_PAYLOADS", "true")
+    logger, _ = configure()
+    assert logger.level == logging.WARNING
+    assert logging.getLogger(PAYLOAD_LOGGER_NAME).isEnabledFor(logging.DEBUG)
+
+
+def test_payloads_are_not_serialized_unless_enabled(configure):
+    payload = Counted()
+    _, stream = configure(level="DEBUG", payloads=False)
+    payload_logger = logging.getLogger(PAYLOAD_LOGGER_NAME)
+    # LOG_LEVEL=DEBUG alone does not turn payload dumps on
+    payload_logger.debug("Request data: %s", LazyJSON({"body": payload}))
+    logging_config.shutdown_logging()
+    assert payload.calls == 0
+    assert stream.getvalue() == ""
+
+
+def test_enabled_payloads_are_logged(configure):
+    _, stream = configure(level="INFO", payloads=True)
+    payload_logger = logging.getLogger(PAYLOAD_LOGGER_NAME)
+    payload_logger.debug("Request data: %s", LazyJSON({"body": Counted()}))
+    logging_config.shutdown_logging()
+    assert '"body": "counted"' in stream.getvalue()
@@ -0,0 +1,151 @@
+import base64
+import re
+from array import array
+
+import pytest
+
+import app as app_module
+from linear_match import compile_linear
+from match_results import encode_columnar, linear_mode, page_spans, re_mode, re_spans
+
+TYPECODES = {"uint8": "B", "uint16": "H", "uint32": "I", "int8": "b", "int16": "h", "int32": "i"}
+
+
+def decode_column(column):
+    """A base64 column back to ints, the way a browser's typed arrays read it (little-endian)"""
+    values = array(TYPECODES[column["dtype"]], base64.b64decode(column["data"]))
+    if array("H", [1]).tobytes() != b"\x01\x00":
+        values.byteswap()
+    return list(values)
+
+
+def decode(columns):
+    """Capture tuples (start, end, g1_start, g1_end, ...) from either encoding"""
+    if columns["encoding"] == "base64":
+        starts, lengths = decode_column(columns["start"]), decode_column(columns["length"])
+        groups = [(decode_column(g["start"]), [None if n == -1 else n for n in decode_column(g["length"])])
+                  for g in columns["groups"]]
+    else:
+        starts, lengths = columns["start"], columns["length"]
+        groups = [(g["start"], g["length"]) for g in columns["groups"]]
+    spans = []
+    position = 0
+    for i, (delta, length) in enumerate(zip(starts, lengths)):
+        position += delta
+        caps = [position, position + length]
+        for group_starts, group_lengths in groups:
+            if group_lengths[i] is None:
+                caps += [None, None]
+            else:
+                caps += [position + group_starts[i], position + group_starts[i] + group_lengths[i]]
+        spans.append(tuple(caps))
+    return spans
+
+
+@pytest.mark.parametrize("encoding", ["delta", "base64"])
+@pytest.mark.parametrize("pattern, text", [
+    (r"\d+", "a1 b22 c333"),
+    # The second group does not take part in every match
+    (r"(?P<user>\w+)@(\w+)(\.com)?", "x@y.com and a@b, long.name@host.com"),
+    (r"(a)|(b)", "ab" * 200 + "c" * 70000 + "a"),
+    (r"x*", "axxb"),
+    (r"\d", ""),
+])
+def test_round_trip(encoding, pattern, text):
+    compiled = re.compile(pattern)
+    spans = list(re_spans(compiled, text))
+    names = {index: name for name, index in compiled.groupindex.items()}
+    columns = encode_columnar(spans, compiled.groups, names, encoding)
+    assert decode(columns) == spans
+    assert columns["count"] == len(spans)
+    assert [group["name"] for group in columns["groups"]] == [names.get(i) for i in range(1, compiled.groups + 1)]
+
+
+def test_base64_columns_use_the_narrowest_type():
+    spans = list(re_spans(re.compile(r"(a)|(b)"), "ab" + "c" * 70000 + "a"))
+    columns = encode_columnar(spans, 2, encoding="base64")
+    assert columns["start"]["dtype"] == "uint32"
+    assert columns["length"]["dtype"] == "uint8"
+    # An unmatched group is a length of -1, so the column is signed
+    assert columns["groups"][0]["length"]["dtype"] == "int8"
+    assert decode_column(columns["groups"][1]["length"]) == [-1, 1, -1]
+
+
+def test_page_spans():
+    spans = [(i, i + 1) for i in range(10)]
+    assert page_spans(iter(spans), 3, 2) == ([(3, 4), (4, 5)], 10)
+    assert page_spans(iter(spans), 8) == ([(8, 9), (9, 10)], 10)
+    assert page_spans(iter(spans), 20, 5) == ([], 10)
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("encoding", ["delta", "base64"])
+def test_columnar_pages(client, encoding):
+    text = "a1 b22 c333 d4444"
+    columns = client.post('/api/test', json={"regex": r"\d+", "test_string": text, "format": "columnar",
+                                              "encoding": encoding, "offset": 1, "limit": 2}).get_json()["columns"]
+    # The first start of a page is absolute, so pages decode on their own
+    assert decode(columns) == [(4, 6), (8, 11)]
+    assert columns["offset"] == 1 and columns["next_offset"] == 3
+
+
+@pytest.mark.parametrize("body", [{"offset": 1}, {"limit": 2}, {"offset": 1, "limit": 2, "format": "matches"}])
+def test_paging_needs_the_columnar_format(client, body):
+    response = client.post('/api/test', json=dict(body, regex=r"\d", test_string="1 2 3"))
+    assert response.status_code == 400
+    assert "columnar" in response.get_json()["error"]
+
+
+MODE_CASES = [
+    (r"\d+", "a1 b22 c333"),
+    (r"(\w)@(\w)", "a@b c@d"),
+    (r"(\d)x", "1x 2y 3x"),
+    (r"(a)|(b)", "b a"),
+    (r"\d", "none here"),
+    (r"x*", "ab"),
+]
+
+
+def expected_mode(mode, pattern, text):
+    matches = re.findall(pattern, text)
+    if mode == "count":
+        return [], len(matches)
+    if mode == "exists":
+        return [], min(1, len(matches))
+    return matches[:1], min(1, len(matches))
+
+
+@pytest.mark.parametrize("mode", ["count", "exists", "first"])
+@pytest.mark.parametrize("pattern, text", MODE_CASES)
+def test_re_mode(mode, pattern, text):
+    assert re_mode(mode, re.compile(pattern), text) == expected_mode(mode, pattern, text)
+
+
+@pytest.mark.parametrize("mode", ["all", "count", "exists", "first"])
+@pytest.mark.parametrize("pattern, text", MODE_CASES)
+def test_linear_mode_agrees_with_re(mode, pattern, text):
+    linear = compile_linear(pattern)
+    assert linear_mode(mode, linear, text) == re_mode(mode, re.compile(pattern), text)
+
+
+@pytest.mark.parametrize("mode", ["count", "exists", "first"])
+@pytest.mark.parametrize("engine, guarded", [("re", False), ("re", True), ("linear", None)])
+def test_modes_on_every_path(client, mode, engine, guarded):
+    body = {"regex": r"(\w)@(\w)", "test_string": "a@b c@d", "mode": mode, "engine": engine}
+    if guarded is not None:
+        body["guarded"] = guarded
+    data = client.post('/api/test', json=body).get_json()
+    assert data["success"] and data["mode"] == mode
+    matches, match_count = expected_mode(mode, body["regex"], body["test_string"])
+    # JSON has no tuples
+    assert (data["matches"], data["match_count"]) == ([list(groups) for groups in matches], match_count)
+    assert "test_string" not in data
+
+
+def test_all_mode_echoes_the_test_string(client):
+    data = client.post('/api/test', json={"regex": r"\d", "test_string": "1 2"}).get_json()
+    assert data["test_string"] == "1 2"
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import RETIRED_FILE, MetricsRegistry
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_worker_snapshot(directory, pid, requests, latencies):
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ["route"]).inc("/", amount=requests)
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in latencies:
+        histogram.observe(value)
+    path = os.path.join(directory, f"metrics_{pid}_123.json")
+    with open(path, "w") as f:
+        json.dump(registry.snapshot(), f)
+    return path
+
+
+def test_single_process_render():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ["route"]).inc("/")
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).observe(0.5)
+    text = registry.render()
+    assert 'requests_total{route="/"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert "latency_seconds_count 1" in text
+
+
+def test_dead_worker_snapshots_are_folded_in(tmp_path):
+    directory = str(tmp_path)
+    registry = MetricsRegistry(directory=directory, flush_interval=3600)
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc("/")
+
+    first = write_worker_snapshot(directory, dead_pid(), 2, [0.05, 0.5])
+    counters, histograms = registry.collect()
+    assert counters[("requests_total", ("/",))] == 3
+    assert histograms[("latency_seconds", ())] == [1, 1, 0, 0.55]
+    assert not os.path.exists(first)
+    assert os.path.exists(os.path.join(directory, RETIRED_FILE))
+
+    # Counts of exited workers stay, and keep adding up as more exit
+    write_worker_snapshot(directory, dead_pid(), 4, [2.0])
+    requests.inc("/")
+    counters, histograms = registry.collect()
+    assert counters[("requests_total", ("/",))] == 8
+    assert histograms[("latency_seconds", ())] == [1, 1, 1, 2.55]
+    files = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    assert files == sorted([RETIRED_FILE, os.path.basename(registry._path)])
+    assert registry.collect()[0][("requests_total", ("/",))] == 8
+
+
+def test_live_worker_snapshots_are_kept(tmp_path):
+    directory = str(tmp_path)
+    registry = MetricsRegistry(directory=directory, flush_interval=3600)
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        path = write_worker_snapshot(directory, live.pid, 5, [])
+        assert registry.collect()[0][("requests_total", ("/",))] == 5
+        assert os.path.exists(path)
+    finally:
+        live.kill()
+        live.wait()
+    assert registry.collect()[0][("requests_total", ("/",))] == 5
+    assert not os.path.exists(path)
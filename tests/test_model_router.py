@@ -0,0 +1,132 @@
+import asyncio
+import socket
+
+import pytest
+
+import asgi
+from app import SmartRegexGenerator
+from http_client import PooledHTTPClient
+from model_router import ModelEndpoint, ModelRouter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_router(endpoints, clock=None, **options):
+    return ModelRouter(endpoints, explore=0, clock=clock or FakeClock(), **options)
+
+
+def names(router):
+    return [endpoint.name for endpoint in router.ranked()]
+
+
+def test_ranks_by_latency():
+    fast, slow = ModelEndpoint("fast", "m"), ModelEndpoint("slow", "m")
+    router = make_router([slow, fast])
+    router.record(slow, 2.0, True)
+    router.record(fast, 0.5, True)
+    assert names(router) == ["fast", "slow"]
+
+
+def test_untried_endpoints_go_first():
+    tried, untried = ModelEndpoint("tried", "m"), ModelEndpoint("untried", "m")
+    router = make_router([tried, untried])
+    router.record(tried, 0.2, True)
+    assert names(router) == ["untried", "tried"]
+
+
+def test_cost_and_latency_weight():
+    cheap = ModelEndpoint("cheap", "m", cost=0.0)
+    paid = ModelEndpoint("paid", "m", cost=1.0)
+    router = make_router([paid, cheap])
+    router.record(cheap, 0.8, True)
+    router.record(paid, 0.2, True)
+    assert names(router) == ["cheap", "paid"]
+    cheap.latency_weight = 2.0
+    assert names(router) == ["paid", "cheap"]
+
+
+def test_failures_rank_down_then_recover():
+    clock = FakeClock()
+    flaky, steady = ModelEndpoint("flaky", "m"), ModelEndpoint("steady", "m")
+    router = make_router([flaky, steady], clock=clock, recovery_half_life=30)
+    router.record(flaky, 0.1, True)
+    router.record(steady, 1.0, True)
+    assert names(router) == ["flaky", "steady"]
+    router.record(flaky, 0.1, False, "boom")
+    assert names(router) == ["steady", "flaky"]
+    assert flaky.failures == 1 and flaky.last_error == "boom"
+    assert flaky.ewma_latency == pytest.approx(0.1)  # failed calls do not move latency
+    clock.now += 300
+    assert names(router) == ["flaky", "steady"]
+
+
+def test_explore_moves_another_endpoint_first():
+    first, second = ModelEndpoint("first", "m"), ModelEndpoint("second", "m", cost=1.0)
+    router = ModelRouter([first, second], explore=1.0)
+    assert names(router) == ["second", "first"]
+
+
+def unused_url():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}/v1/chat/completions"
+
+
+@pytest.fixture
+def pool(start_upstream):
+    """Router over a failing, an unreachable and a healthy endpoint, tried in that order at first"""
+    failing_url, failing = start_upstream(mode="failing")
+    healthy_url, healthy = start_upstream()
+    failing.regex, healthy.regex = "failing", "healthy"
+    endpoints = [
+        ModelEndpoint("failing", "m", url=failing_url, api_key="k"),
+        ModelEndpoint("unreachable", "m", url=unused_url(), api_key="k"),
+        ModelEndpoint("healthy", "m", url=healthy_url, api_key="k"),
+    ]
+    return make_router(endpoints), failing, healthy
+
+
+def check_failover(router, result, failing, healthy):
+    assert result["model"] == "healthy"
+    assert result["regex"] == "healthy"
+    assert failing.calls == 1 and healthy.calls == 1
+    stats = {endpoint["name"]: endpoint for endpoint in router.stats()}
+    assert stats["failing"]["failures"] == 1 and stats["unreachable"]["failures"] == 1
+    assert stats["healthy"]["failures"] == 0 and stats["healthy"]["requests"] == 1
+    assert names(router)[0] == "healthy"
+
+
+def test_sync_failover(pool):
+    router, failing, healthy = pool
+    generator = SmartRegexGenerator("test", http_client=PooledHTTPClient(retries=0), router=router)
+    result = generator.request_completion("order numbers")
+    check_failover(router, result, failing, healthy)
+
+
+def test_async_failover(pool):
+    router, failing, healthy = pool
+    generator = asgi.AsyncSmartRegexGenerator("test", router=router)
+
+    async def run():
+        try:
+            return await generator.request_completion_async("order numbers")
+        finally:
+            await generator.close()
+
+    result = asyncio.run(run())
+    check_failover(router, result, failing, healthy)
+
+
+def test_all_endpoints_failing_serves_fallback(start_upstream):
+    url, _ = start_upstream(mode="failing")
+    router = make_router([ModelEndpoint("a", "m", url=url), ModelEndpoint("b", "m", url=unused_url())])
+    generator = SmartRegexGenerator("test", http_client=PooledHTTPClient(retries=0), router=router)
+    result = generator.generate_regex("email addresses")
+    assert result["source"] == "fallback"
+    assert result["regex"] == generator.generate_smart_fallback("email addresses")
@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import zlib
+
+import pytest
+
+from pattern_store import RECORD_HEADER, PatternStore
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / "store")
+
+
+def raw_record(prompt, regex):
+    """Log bytes for a record, as put() writes them"""
+    payload = json.dumps({"prompt": prompt, "regex": regex, "model": None, "timestamp": 0,
+                          "validation": None}, separators=(",", ":")).encode("utf-8")
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def append_to_log(store, data):
+    with open(store.log_path, "ab") as f:
+        f.write(data)
+
+
+def test_put_get_round_trip(directory):
+    store = PatternStore(directory)
+    stored = store.put("Email addresses", r"\S+@\S+", model="m", validation={"ok": True})
+    assert stored["prompt"] == "email addresses"
+    record = store.get("  EMAIL addresses. ")
+    assert (record["regex"], record["model"], record["validation"]) == (r"\S+@\S+", "m", {"ok": True})
+    assert store.get("phone numbers") is None
+
+    store.put("email addresses", r"[^@\s]+@[^@\s]+")
+    assert store.get("email addresses")["regex"] == r"[^@\s]+@[^@\s]+"
+    stats = store.stats()
+    assert (stats["entries"], stats["records"], stats["hits"], stats["misses"]) == (1, 2, 2, 1)
+
+    reopened = PatternStore(directory)
+    assert reopened.get("email addresses")["regex"] == r"[^@\s]+@[^@\s]+"
+
+
+def test_unpublished_records_are_indexed_and_torn_tail_is_dropped(directory):
+    store = PatternStore(directory)
+    store.put("dates", r"\d{4}-\d{2}-\d{2}")
+    # A writer that crashed after appending "times" and half of "zip codes"
+    append_to_log(store, raw_record("times", r"\d{2}:\d{2}"))
+    intact_size = os.path.getsize(store.log_path)
+    append_to_log(store, raw_record("zip codes", r"\d{5}")[:-4])
+
+    reopened = PatternStore(directory)
+    assert reopened.get("times")["regex"] == r"\d{2}:\d{2}"
+    assert reopened.get("zip codes") is None
+    assert os.path.getsize(store.log_path) == intact_size
+    assert reopened.get("dates")["regex"] == r"\d{4}-\d{2}-\d{2}"
+
+
+def test_corrupt_tail_is_dropped(directory):
+    store = PatternStore(directory)
+    store.put("dates", r"\d{4}-\d{2}-\d{2}")
+    intact_size = os.path.getsize(store.log_path)
+    corrupt = bytearray(raw_record("times", r"\d{2}:\d{2}"))
+    corrupt[-2] ^= 0xFF
+    append_to_log(store, bytes(corrupt))
+
+    reopened = PatternStore(directory)
+    assert reopened.get("times") is None
+    assert os.path.getsize(store.log_path) == intact_size
+    # The next append lands right after the last intact record
+    reopened.put("times", r"\d{2}:\d{2}")
+    assert PatternStore(directory).get("times")["regex"] == r"\d{2}:\d{2}"
+
+
+def test_compaction_while_another_handle_is_open(directory):
+    writer = PatternStore(directory)
+    reader = PatternStore(directory)
+    for i in range(50):
+        writer.put("hex colors", f"#[0-9a-f]{{{i}}}")
+    writer.put("dates", r"\d{4}")
+    assert reader.get("hex colors")["regex"] == "#[0-9a-f]{49}"
+
+    result = writer.compact()
+    assert result["entries"] == 2
+    assert result["bytes_after"] < result["bytes_before"]
+    # The reader still maps the old index; it sees the retired flag and reopens
+    assert reader.get("hex colors")["regex"] == "#[0-9a-f]{49}"
+    assert reader.get("dates")["regex"] == r"\d{4}"
+    assert reader.stats()["records"] == 2
+
+    reader.put("times", r"\d{2}:\d{2}")
+    assert writer.get("times")["regex"] == r"\d{2}:\d{2}"
+
+
+def test_automatic_compaction(directory):
+    store = PatternStore(directory, compact_ratio=2.0, compact_min_records=20)
+    for i in range(25):
+        store.put("same prompt", f"v{i}")
+    assert store.compactions >= 1
+    assert store.get("same prompt")["regex"] == "v24"
+    assert store.stats()["records"] < 20
+
+
+def test_reopen_after_the_index_grows(directory):
+    writer = PatternStore(directory)
+    reader = PatternStore(directory)
+    capacity = reader.stats()["capacity"]
+    for i in range(capacity):
+        writer.put(f"prompt {i}", f"r{i}")
+    assert writer.stats()["capacity"] > capacity
+    assert all(reader.get(f"prompt {i}")["regex"] == f"r{i}" for i in range(capacity))
+    assert reader.stats()["capacity"] == writer.stats()["capacity"]
+
+
+def test_concurrent_lookups_are_all_counted(directory):
+    store = PatternStore(directory)
+    store.put("dates", r"\d{4}")
+
+    def lookup():
+        for i in range(500):
+            store.get("dates" if i % 2 else "nothing")
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (2000, 2000)
@@ -0,0 +1,23 @@
+import random
+import re
+
+from regex_examples import Sampler, attack_strings, sre_parse
+
+
+def test_attack_strings_pump_the_repeat():
+    strings = attack_strings(r"^(\w+\s?)*$")
+    assert strings
+    assert any(len(text) > 200 and not re.fullmatch(r"[\w\s]*", text) for text in strings)
+
+
+def test_attack_strings_cap_huge_counts():
+    for pattern in (r"a{100000000}b+", r"(a{10000}b?)+$", r"(?:\b){100000000}x+"):
+        strings = attack_strings(pattern, max_length=1000)
+        assert strings
+        assert all(len(text) <= 1001 for text in strings)
+
+
+def test_sampler_stops_at_max_length():
+    sampler = Sampler(random.Random(0), max_length=50)
+    assert len(sampler.sample(sre_parse.parse(r"x{1000000}"))) == 50
+    assert Sampler(random.Random(0)).sample(sre_parse.parse(r"ab{3}")) == "abbb"
@@ -0,0 +1,59 @@
+import random
+import re
+
+import pytest
+
+from regex_optimizer import _check_strings, _same_matches, optimize_regex
+
+# Rewrites an earlier factoring produced, each matching differently from its source
+UNSAFE_REWRITES = [
+    (r"a*ab|a*", r"a*(?:ab)?", "aab"),
+    (r"https?://\S+\.com|https?://\S+", r"https?://\S+(?:\.com)?", "see https://x.com/a.com!"),
+    (r"(?:a|ab)c|(?:a|ab)", r"ab??c?", "abc"),
+    (r"[ab]*?a|[ab]*?", r"[ab]*?a?", "ba"),
+]
+
+
+def spans(pattern, text, flags=0):
+    return [m.span() for m in re.finditer(pattern, text, flags)]
+
+
+@pytest.mark.parametrize("pattern, unsafe, text", UNSAFE_REWRITES)
+def test_variable_width_prefixes_are_not_factored(pattern, unsafe, text):
+    optimized = optimize_regex(pattern).regex
+    assert optimized != unsafe
+    assert spans(optimized, text) == spans(pattern, text)
+
+
+@pytest.mark.parametrize("pattern, unsafe, text", UNSAFE_REWRITES)
+def test_sampled_strings_catch_unsafe_rewrites(pattern, unsafe, text):
+    assert spans(unsafe, text) != spans(pattern, text)
+    assert not _same_matches(re.compile(pattern), re.compile(unsafe), _check_strings(pattern, 0))
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r"Jan|Jun|Jul", r"J(?:an|u[nl])"),
+    (r"(\d{3})-(\d{4})", r"\d{3}-\d{4}"),
+    (r"[0-9\d]+", r"\d+"),
+    (r"(?:a+)*b", r"a*b"),
+    (r"^a(?:bc|)$", r"^a(?:bc)?$"),
+])
+def test_rewrites(pattern, expected):
+    assert optimize_regex(pattern).regex == expected
+
+
+def test_named_groups_kept():
+    optimization = optimize_regex(r"(?P<area>\d{3})-(\d{4})")
+    assert re.compile(optimization.regex).groupindex.keys() == {"area"}
+
+
+def test_random_alternations_match_the_same():
+    pieces = ["a", "b", "ab", "a*", "a+?", "[ab]", "[ab]*?", "b?", "(?:a|ab)", "^", "$", "."]
+    rng = random.Random(7)
+    for _ in range(300):
+        alternatives = ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 3))) for _ in range(rng.randint(2, 4))]
+        pattern = "|".join(alternatives)
+        optimized = optimize_regex(pattern).regex
+        for _ in range(20):
+            text = "".join(rng.choice("ab.") for _ in range(rng.randint(0, 8)))
+            assert spans(optimized, text) == spans(pattern, text), (pattern, optimized, text)
@@ -0,0 +1,111 @@
+import pytest
+
+import app as app_module
+from app import SmartRegexGenerator
+from regex_validation import RegexValidator, prompt_examples
+
+
+@pytest.mark.parametrize("prompt, positives, negatives", [
+    ("dates like 2024-01-15 but not 2024-13-01", ["2024-01-15"], ["2024-13-01"]),
+    ("emails like 'a@b.com' but not 'a@b'", ["a@b.com"], ["a@b"]),
+    ("times such as 12:30 and 23:59 but never 24:00", ["12:30", "23:59"], ["24:00"]),
+    # A list keeps the polarity of its cue
+    ("no '1' or '2'", [], ["1", "2"]),
+    # A verb right after a negation stays negative
+    ("don't match 'abc'", [], ["abc"]),
+    ("should not be like \"x-1\"", [], ["x-1"]),
+    # Quoted strings are examples without a cue
+    ('codes "A-12" and `B-7`', ["A-12", "B-7"], []),
+])
+def test_examples_and_polarity(prompt, positives, negatives):
+    assert prompt_examples(prompt) == (positives, negatives)
+
+
+@pytest.mark.parametrize("prompt", [
+    "3-digit codes",
+    "a 24-hour clock",
+    "numbers above 100",
+    # Too far from the cue
+    "like the ones in the big old file 555-1234",
+    "user@example.com style addresses",
+])
+def test_descriptions_are_not_examples(prompt):
+    assert prompt_examples(prompt) == ([], [])
+
+
+def test_examples_are_capped_and_deduplicated():
+    positives, _ = prompt_examples("like " + " ".join(f"'{i}'" for i in range(30)) + " '1'")
+    assert positives == [str(i) for i in range(10)]
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return RegexValidator(app_module.guarded_matcher, fuzz_budget=0.25, example_budget=1.0)
+
+
+def test_validate_passes(validator):
+    report = validator.validate(r"\d{4}-(0[1-9]|1[0-2])-\d{2}", ["2024-01-15"], ["2024-13-01"])
+    assert report["passed"] and report["failed"] is None
+    assert report["checks"] == {"compile": "passed", "backtracking": "passed", "examples": "passed"}
+    assert report["examples"]["passed"] == report["examples"]["total"] == 2
+
+
+def test_validate_reports_the_failed_check(validator):
+    report = validator.validate(r"(\d+")
+    assert report["failed"] == "compile"
+    assert report["checks"]["backtracking"] == "skipped"
+
+    report = validator.validate(r"^(\w+\s?)*$")
+    assert report["failed"] == "backtracking"
+
+    report = validator.validate(r"\d{4}-\d{2}-\d{2}", ["2024-01-15"], ["2024-13-01"])
+    assert report["failed"] == "examples"
+    assert "'2024-13-01'" in report["error"]
+    assert report["examples"]["passed"] == 1
+
+
+def attempt(regex, failed=None, examples_passed=0):
+    return {
+        "success": True,
+        "regex": regex,
+        "source": "model",
+        "validation": {
+            "passed": failed is None,
+            "failed": failed,
+            "error": None if failed is None else f"{failed} failed",
+            "examples": None if failed != "examples" else {"passed": examples_passed, "total": 3}
+        }
+    }
+
+
+@pytest.fixture
+def generator():
+    return SmartRegexGenerator("test")
+
+
+def test_settle_serves_a_passing_retry(generator):
+    attempts = [attempt("a", "examples", 1), attempt("b")]
+    assert generator.settle_validation("dates", attempts, attempts[-1])["regex"] == "b"
+
+
+def test_settle_keeps_the_best_examples_failure(generator):
+    attempts = [attempt("a", "examples", 2), attempt("b", "examples", 1)]
+    assert generator.settle_validation("dates", attempts, attempts[-1])["regex"] == "a"
+    # An unusable retry does not beat an attempt that only missed examples
+    attempts = [attempt("a", "examples", 1), attempt("(", "compile")]
+    assert generator.settle_validation("dates", attempts, attempts[-1])["regex"] == "a"
+
+
+@pytest.mark.parametrize("failed", ["compile", "backtracking"])
+def test_settle_falls_back_on_unusable_patterns(generator, failed):
+    attempts = [attempt("(a+)+$", failed)]
+    result = generator.settle_validation("email address", attempts, attempts[-1])
+    assert result["source"] == "fallback"
+    assert result["regex"] == generator.generate_smart_fallback("email address")
+    assert result["validation"]["failed"] == failed
+
+
+def test_settle_keeps_a_fallback_the_retry_ended_in(generator):
+    attempts = [attempt("(a+)+$", "backtracking")]
+    last = generator.fallback_result("email address", "Upstream unavailable")
+    assert generator.settle_validation("email address", attempts, last) is last
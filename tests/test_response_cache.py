@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from response_cache import DiskStore, MemoryStore, ResponseCache, normalize_prompt
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "disk"])
+def make_store(request, tmp_path):
+    def make(max_entries=100):
+        if request.param == "memory":
+            return MemoryStore(max_entries=max_entries)
+        return DiskStore(str(tmp_path / "responses.db"), max_entries=max_entries)
+    return make
+
+
+def test_round_trip(make_store):
+    cache = ResponseCache(make_store())
+    result = {"success": True, "regex": r"\d+", "source": "model"}
+    cache.set("Order numbers", result)
+    assert cache.get("  order NUMBERS. ") == result
+    assert cache.get("phone numbers") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["hit_ratio"]) == (1, 1, 1, 0.5)
+
+
+def test_entries_expire_after_the_ttl(make_store):
+    clock = FakeClock()
+    store = make_store()
+    cache = ResponseCache(store, ttl=60, clock=clock)
+    cache.set("dates", {"regex": "d"})
+    clock.now += 59
+    assert cache.get("dates") == {"regex": "d"}
+    clock.now += 2
+    assert cache.get("dates") is None
+    # Expired entries are dropped when they are found
+    assert len(store) == 0
+    cache.set("dates", {"regex": "d2"})
+    assert cache.get("dates") == {"regex": "d2"}
+
+
+def test_least_recently_used_is_evicted(make_store):
+    store = make_store(max_entries=2)
+    cache = ResponseCache(store)
+    # DiskStore orders by time.time() access stamps; keep them apart
+    cache.set("a", {"regex": "a"})
+    time.sleep(0.01)
+    cache.set("b", {"regex": "b"})
+    time.sleep(0.01)
+    assert cache.get("a") is not None
+    time.sleep(0.01)
+    cache.set("c", {"regex": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_store_is_shared(tmp_path):
+    path = str(tmp_path / "responses.db")
+    ResponseCache(DiskStore(path)).set("emails", {"regex": "@"})
+    assert ResponseCache(DiskStore(path)).get("emails") == {"regex": "@"}
+
+
+def test_concurrent_lookups_are_all_counted(make_store):
+    cache = ResponseCache(make_store())
+    cache.set("dates", {"regex": "d"})
+
+    def lookup():
+        for i in range(200):
+            cache.get("dates" if i % 2 else "nothing")
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (800, 800)
+
+
+@pytest.mark.parametrize("prompt, key", [
+    ("  Email   Addresses. ", "email addresses"),
+    ('"quoted" words!', "quoted words"),
+    ("dates as mm/dd/yyyy", "dates as mm/dd/yyyy"),
+    ("example.com domains", "example.com domains"),
+])
+def test_normalize_prompt(prompt, key):
+    assert normalize_prompt(prompt) == key
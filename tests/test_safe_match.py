@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from safe_match import GuardedMatcher, find_redos_risks
+
+CATASTROPHIC = (r"^(a+)+$", "a" * 40 + "!")
+
+
+@pytest.fixture
+def matcher():
+    return GuardedMatcher(max_workers=1)
+
+
+def occupy(matcher, seconds):
+    """Hold the matcher's only worker for about ``seconds`` (a match it will kill at the budget)"""
+    thread = threading.Thread(target=matcher.findall, args=(*CATASTROPHIC, seconds))
+    thread.start()
+    # Until the worker is spawned and busy
+    deadline = time.monotonic() + 10
+    while matcher.stats()["runs"] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return thread
+
+
+def test_results_and_timeouts(matcher):
+    assert matcher.findall(r"\d+", "a1 b22", 5) == {"status": "ok", "matches": ["1", "22"]}
+    started = time.perf_counter()
+    assert matcher.findall(*CATASTROPHIC, 0.3)["status"] == "timeout"
+    assert time.perf_counter() - started < 3
+    # The killed worker is replaced
+    assert matcher.findall(r"b", "abc", 5)["status"] == "ok"
+    assert matcher.stats()["timeouts"] == 1
+
+
+def test_no_free_worker_is_busy(matcher):
+    thread = occupy(matcher, 1.0)
+    started = time.perf_counter()
+    outcome = matcher.findall(r"\d+", "a1", 0.2)
+    elapsed = time.perf_counter() - started
+    thread.join()
+    assert outcome["status"] == "busy"
+    assert "busy" in outcome["error"]
+    assert elapsed < 1.0
+    assert matcher.stats()["busy"] == 1
+
+
+def test_waiting_for_a_worker_is_charged_to_the_budget(matcher):
+    thread = occupy(matcher, 1.0)
+    started = time.perf_counter()
+    outcome = matcher.findall(*CATASTROPHIC, 1.5)
+    elapsed = time.perf_counter() - started
+    thread.join()
+    assert outcome["status"] == "timeout"
+    # About 1.0 s queued and 0.5 s matching; a fresh 1.5 s after the wait would take 2.5 s
+    assert elapsed < 2.1
+
+
+def test_busy_guarded_test_result(matcher, monkeypatch):
+    monkeypatch.setattr(app_module, "guarded_matcher", matcher)
+    thread = occupy(matcher, 1.0)
+    response = app_module.app.test_client().post('/api/test', json={
+        "regex": r"\d+", "test_string": "a1", "guarded": True, "timeout_ms": 200
+    })
+    thread.join()
+    data = response.get_json()
+    assert data["status"] == "busy"
+    assert data["is_valid"] is True
+
+
+def test_bench_has_its_own_workers(matcher, monkeypatch):
+    monkeypatch.setattr(app_module, "guarded_matcher", matcher)
+    thread = occupy(matcher, 1.0)
+    response = app_module.app.test_client().post('/api/bench', json={"regex": r"\d+", "size": 2000, "repeat": 1})
+    thread.join()
+    data = response.get_json()
+    assert data["status"] == "ok"
+    assert app_module.bench_matcher is not app_module.guarded_matcher
+
+
+def test_redos_risks():
+    assert find_redos_risks(r"^(a+)+$")
+    assert find_redos_risks(r"(\w+\s?)*$")
+    assert not find_redos_risks(r"^\d{3}-\d{4}$")
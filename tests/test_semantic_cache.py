@@ -0,0 +1,59 @@
+import pytest
+
+import app
+from response_cache import MemoryStore, ResponseCache
+from semantic_cache import SemanticCache, same_words
+
+
+def cache_with(prompt, regex="stored"):
+    cache = SemanticCache()
+    cache.set(prompt, {"success": True, "regex": regex, "source": "model"})
+    return cache
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("validate emails", "regex for e-mail"),
+    ("match an e-mail", "validate emails"),
+    ("regex for US phone numbers", "validate US phone number"),
+    ("street adress", "street address"),
+])
+def test_near_duplicates_hit(stored, asked):
+    assert cache_with(stored).get(asked) is not None
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("validate US phone numbers with area code and optional extension",
+     "validate UK phone numbers with area code and optional extension"),
+    ("lowercase hexadecimal strings of any length", "uppercase hexadecimal strings of any length"),
+    ("dates in MM-DD-YYYY format", "dates in DD-MM-YYYY format"),
+    ("5 digit zip codes", "9 digit zip codes"),
+    ("usernames with spaces", "usernames without spaces"),
+    ("IPv4 addresses", "IPv6 addresses"),
+])
+def test_near_misses_do_not_hit(stored, asked):
+    assert cache_with(stored).get(asked) is None
+
+
+def test_same_words():
+    assert same_words(frozenset({"address", "street"}), frozenset({"adress", "street"}))
+    assert not same_words(frozenset({"lowercase"}), frozenset({"uppercase"}))
+    assert not same_words(frozenset({"email"}), frozenset({"email", "domain"}))
+
+
+def test_semantic_hits_are_not_copied_into_the_exact_cache():
+    response_cache = ResponseCache(MemoryStore(), ttl=60)
+    semantic_cache = SemanticCache()
+    generator = app.SmartRegexGenerator("test", response_cache=response_cache, semantic_cache=semantic_cache)
+    generator.remember("validate emails", {"success": True, "regex": "e", "source": "model"})
+
+    hit = generator.get_cached("regex for e-mail")
+    assert hit["regex"] == "e" and hit["similar_to"] == "email" and hit["cached"]
+    assert response_cache.get("regex for e-mail") is None
+    assert response_cache.get("validate emails")["regex"] == "e"
+
+
+def test_off_by_default(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE", raising=False)
+    assert app.build_semantic_cache() is None
+    monkeypatch.setenv("SEMANTIC_CACHE", "true")
+    assert isinstance(app.build_semantic_cache(), SemanticCache)
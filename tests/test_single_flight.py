@@ -0,0 +1,170 @@
+import asyncio
+import fcntl
+import os
+import threading
+import time
+
+import pytest
+
+from hedging import DeadlineExceeded
+from single_flight import SingleFlight
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+
+    def run(i):
+        results[i] = target()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def slow_call(calls, value="result", seconds=0.2):
+    def fn():
+        calls.append(value)
+        time.sleep(seconds)
+        return value
+    return fn
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    results = run_concurrently(8, lambda: flight.do("emails", slow_call(calls)))
+    assert calls == ["result"]
+    assert sorted(leader for _, leader in results) == [False] * 7 + [True]
+    assert all(result == "result" for result, _ in results)
+    assert (flight.leaders, flight.followers) == (1, 7)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("upstream broke")
+
+    def call():
+        try:
+            return flight.do("emails", fail)
+        except ValueError as e:
+            return str(e)
+
+    assert run_concurrently(3, call) == ["upstream broke"] * 3
+
+
+def test_followers_give_up():
+    flight = SingleFlight(wait_timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("emails", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            flight.do("emails", lambda: "mine")
+        with pytest.raises(DeadlineExceeded):
+            flight.do("emails", lambda: "mine", deadline=time.monotonic() + 0.02)
+    finally:
+        release.set()
+        leader.join(5)
+    assert flight.wait_timeouts == 2
+
+
+def test_async_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("emails", fn) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == [1]
+    assert [result for result, _ in results] == ["result"] * 5
+
+
+def test_result_is_shared_across_workers(tmp_path):
+    # Two instances stand in for two gunicorn workers: flock locks belong to
+    # the open file, so they exclude each other inside one process too
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    first_calls, second_calls = [], []
+    leader = threading.Thread(target=first.do, args=("emails", slow_call(first_calls, {"regex": "a"})))
+    leader.start()
+    time.sleep(0.05)
+    result, _ = second.do("emails", slow_call(second_calls, {"regex": "b"}))
+    leader.join(5)
+    assert result == {"regex": "a"}
+    assert (first_calls, second_calls) == ([{"regex": "a"}], [])
+    assert second.shared_across_workers == 1
+
+
+def test_unshareable_and_stale_results_are_not_reused(tmp_path):
+    first = SingleFlight(str(tmp_path))
+    first.do("emails", lambda: {"regex": "fallback"}, shareable=lambda result: False)
+    assert SingleFlight(str(tmp_path)).do("emails", lambda: {"regex": "own"})[0] == {"regex": "own"}
+
+    time.sleep(0.02)
+    stale = SingleFlight(str(tmp_path), result_ttl=0.01)
+    assert stale.do("emails", lambda: {"regex": "fresh"})[0] == {"regex": "fresh"}
+
+
+def age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def force_sweep(flight):
+    flight._last_sweep = time.monotonic() - flight.sweep_age - 1
+    flight._sweep()
+
+
+def test_sweep_skips_locked_files(tmp_path):
+    flight = SingleFlight(str(tmp_path), sweep_age=60)
+    idle, busy, fresh = (tmp_path / f"{name}.lock" for name in ("idle", "busy", "fresh"))
+    for path in (idle, busy, fresh):
+        path.write_text("")
+    age(idle, 120)
+    age(busy, 120)
+    holder = os.open(busy, os.O_RDWR)
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    try:
+        force_sweep(flight)
+    finally:
+        os.close(holder)
+    assert (idle.exists(), busy.exists(), fresh.exists()) == (False, True, True)
+
+
+def test_lock_on_a_swept_file_is_retaken(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    open_lock = flight._open_lock
+
+    def open_then_swept(key):
+        # The sweep unlinks the file between our open and our flock
+        fd, path = open_lock(key)
+        os.unlink(path)
+        return fd, path
+
+    flight._open_lock = open_then_swept
+    held = []
+
+    def fn():
+        # Another worker opening the lock file now must find it locked
+        fd = os.open(flight._lock_path("emails"), os.O_RDWR | os.O_CREAT)
+        try:
+            held.append(not flight._try_lock(fd))
+        finally:
+            os.close(fd)
+        return "result"
+
+    assert flight.do("emails", fn) == ("result", True)
+    assert held == [True]
@@ -0,0 +1,132 @@
+import json
+import random
+import re
+
+import pytest
+
+import app as app_module
+from stream_scan import LOOKAROUND_CHARS, match_window, scan_chunks
+
+
+def chunked(data, sizes):
+    chunks, start = [], 0
+    for size in sizes:
+        chunks.append(data[start:start + size])
+        start += size
+    chunks.append(data[start:])
+    return chunks
+
+
+def scan(pattern, chunks, window, flags=0):
+    compiled = re.compile(pattern, flags)
+    return [(offset + match.start(), match.group(), truncated)
+            for offset, match, truncated in scan_chunks(compiled, chunks, window)]
+
+
+def test_match_straddling_a_chunk_boundary():
+    assert scan(r"\d+", [b"order 12", b"345 shipped"], 16) == [(6, "12345", False)]
+
+
+def test_multibyte_character_split_across_chunks():
+    data = "café 42 naïve 7".encode("utf-8")
+    # Split inside the two bytes of "é"
+    found = scan(r"\d+|[^\W\d]+", chunked(data, [4, 1, 3]), 16)
+    assert found == [(0, "café", False), (5, "42", False), (8, "naïve", False), (14, "7", False)]
+
+
+@pytest.mark.parametrize("pattern, flags", [
+    (r"\b\w+@\w+\.com\b", 0),
+    (r"(?<=id=)\d+", 0),
+    (r"^\w+", re.MULTILINE),
+    (r"\d{3}-\d{4}", 0),
+    (r"x*", 0),
+])
+def test_same_matches_as_one_finditer(pattern, flags):
+    rng = random.Random(pattern)
+    words = ["id=123", "a@b.com", "555-1234", "x", "xx", "word", "\n", " ", "id=", "9"]
+    text = "".join(rng.choice(words) + rng.choice(" \n") for _ in range(300))
+    expected = [(m.start(), m.group(), False) for m in re.finditer(pattern, text, flags)]
+    data = text.encode("utf-8")
+    for _ in range(5):
+        sizes = [rng.randint(1, 40) for _ in range(len(data) // 10)]
+        assert scan(pattern, chunked(data, sizes), 32, flags) == expected
+
+
+def test_match_window_for_bounded_and_unbounded_patterns():
+    assert match_window(r"\d{3}-\d{4}", 4096) == 8 + LOOKAROUND_CHARS
+    assert match_window(r"\d{3}-\d{4}", 20) == 20
+    assert match_window(r"\d+", 4096) == 4096
+
+
+def test_bounded_window_path():
+    window = match_window(r"\d{3}-\d{4}", 4096)
+    filler = b"z" * 1000
+    chunks = [filler, b"call 555-", b"1234 now", filler, b"or 555-9876"]
+    assert scan(r"\d{3}-\d{4}", chunks, window) == [(1005, "555-1234", False), (2020, "555-9876", False)]
+
+
+def test_match_longer_than_the_window_is_truncated():
+    found = scan(r"a+", [b"aaaaa"] * 4 + [b"b"], 4)
+    assert [text for _, text, _ in found] == ["aaaaa"] * 4
+    assert all(truncated for _, _, truncated in found)
+
+
+@pytest.fixture
+def post_scan(monkeypatch):
+    # Small reads, so even short bodies arrive in several chunks
+    monkeypatch.setattr(app_module, "SCAN_CHUNK_BYTES", 7)
+
+    def post(body, **params):
+        response = app_module.app.test_client().post('/api/scan', query_string=params, data=body)
+        if response.status_code != 200:
+            return response.status_code, response.get_json()
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        return 200, lines
+    return post
+
+
+def test_scan_route_streams_matches(post_scan):
+    status, lines = post_scan(b"ids 123456 and 78 then 9", regex=r"(\d)(\d*)")
+    assert status == 200
+    *matches, done = lines
+    assert [(m["start"], m["match"], m["groups"]) for m in matches] == [
+        (4, "123456", ["1", "23456"]), (15, "78", ["7", "8"]), (23, "9", ["9", ""])
+    ]
+    assert done["done"] and done["match_count"] == 3
+    assert done["bytes_scanned"] == 24
+    assert done["limit_reached"] is False
+
+
+def test_scan_route_limit(post_scan):
+    _, lines = post_scan(b"1 2 3 4", regex=r"\d", limit=2)
+    assert [line["match"] for line in lines[:-1]] == ["1", "2"]
+    assert lines[-1]["limit_reached"] is True
+    _, lines = post_scan(b"1 2", regex=r"\d", limit=2)
+    assert lines[-1]["limit_reached"] is False
+    _, lines = post_scan(b"1 2", regex=r"\d", limit=0)
+    assert len(lines) == 1 and lines[-1]["limit_reached"] is True
+
+
+def test_scan_route_max_match(post_scan, monkeypatch):
+    monkeypatch.setattr(app_module, "SCAN_MAX_MATCH_WINDOW", 8)
+    # Capped at SCAN_MAX_MATCH_WINDOW
+    _, lines = post_scan(b"a" * 20, regex=r"a+", max_match=100)
+    assert lines[-1]["window"] == 8
+    assert lines[-1]["truncated_matches"] >= 1
+    _, lines = post_scan(b"a" * 5, regex=r"a+", max_match=3)
+    assert lines[-1]["window"] == 3
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"regex": "("},
+    {"regex": r"^(a+)+$"},
+    {"regex": "a", "max_match": "0"},
+    {"regex": "a", "max_match": "big"},
+    {"regex": "a", "limit": "-1"},
+    {"regex": "a", "limit": "1.5"},
+])
+def test_scan_route_rejects_bad_parameters(post_scan, params):
+    status, data = post_scan(b"a", **params)
+    assert status == 400
+    assert data["success"] is False
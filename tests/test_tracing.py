@@ -0,0 +1,206 @@
+import json
+import threading
+
+import pytest
+
+import app as app_module
+from tracing import NOOP_SPAN, FileExporter, OTLPExporter, Tracer, build_tracer, parse_traceparent, traced
+
+PARENT_TRACE = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN = "00f067aa0ba902b7"
+
+
+class RecordingExporter:
+    """Keeps finished traces in memory"""
+
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+@pytest.fixture
+def exporter():
+    return RecordingExporter()
+
+
+@traced("work")
+def work(tracer, fail=False):
+    tracer.current_span().set_attribute("step", "work")
+    if fail:
+        raise ValueError("bad input")
+    with tracer.span("inner", size=3):
+        return "done"
+
+
+def by_name(spans):
+    return {span["name"]: span for span in spans}
+
+
+def test_span_tree(exporter):
+    tracer = Tracer(exporter, sample_rate=1.0)
+    with tracer.start_trace("POST /api/generate", route="/api/generate") as root:
+        assert tracer.current_span() is root
+        assert work(tracer) == "done"
+        tracer.current_span().set_attribute("http.status_code", 200)
+    assert tracer.current_span() is NOOP_SPAN
+
+    (spans,) = exporter.traces
+    spans = by_name(spans)
+    root, middle, inner = spans["POST /api/generate"], spans["work"], spans["inner"]
+    assert len({span["trace_id"] for span in spans.values()}) == 1
+    assert (root["parent_id"], middle["parent_id"], inner["parent_id"]) == (None, root["span_id"], middle["span_id"])
+    assert root["attributes"] == {"route": "/api/generate", "http.status_code": 200}
+    assert middle["attributes"] == {"step": "work"}
+    assert inner["attributes"] == {"size": 3}
+    assert root["start_time_unix_nano"] <= middle["start_time_unix_nano"] <= middle["end_time_unix_nano"]
+    assert middle["end_time_unix_nano"] <= root["end_time_unix_nano"]
+
+
+def test_errors_are_recorded_on_the_span(exporter):
+    tracer = Tracer(exporter, sample_rate=1.0)
+    with pytest.raises(ValueError):
+        with tracer.start_trace("request"):
+            work(tracer, fail=True)
+    spans = by_name(exporter.traces[0])
+    assert spans["work"]["error"] == "ValueError: bad input"
+    assert spans["request"]["error"] == "ValueError: bad input"
+
+
+def test_unsampled_requests_create_no_spans(exporter):
+    tracer = Tracer(exporter, sample_rate=0.0)
+    with tracer.start_trace("request") as root:
+        assert root is NOOP_SPAN
+        assert tracer.span("child") is NOOP_SPAN
+        assert work(tracer) == "done"
+    assert exporter.traces == []
+    # Without an exporter nothing is ever sampled
+    assert Tracer(sample_rate=1.0).start_trace("request") is NOOP_SPAN
+
+
+def test_traces_in_threads_stay_apart(exporter):
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    def request(name):
+        with tracer.start_trace(name):
+            work(tracer)
+
+    threads = [threading.Thread(target=request, args=(f"request {i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(exporter.traces) == 4
+    for spans in exporter.traces:
+        assert len(spans) == 3
+        assert len({span["trace_id"] for span in spans}) == 1
+
+
+@pytest.mark.parametrize("header, parsed", [
+    (f"00-{PARENT_TRACE}-{PARENT_SPAN}-01", (PARENT_TRACE, PARENT_SPAN, True)),
+    (f"00-{PARENT_TRACE}-{PARENT_SPAN}-00", (PARENT_TRACE, PARENT_SPAN, False)),
+    (f"00-{PARENT_TRACE}-{PARENT_SPAN}", None),
+    (f"00-{PARENT_TRACE}-xyzxyzxyzxyzxyzx-01", None),
+    ("", None),
+])
+def test_parse_traceparent(header, parsed):
+    assert parse_traceparent(header) == parsed
+
+
+def test_sampled_traceparent_continues_the_trace(exporter):
+    tracer = Tracer(exporter, sample_rate=0.0)
+    with tracer.start_trace("request", traceparent=f"00-{PARENT_TRACE}-{PARENT_SPAN}-01"):
+        pass
+    assert tracer.start_trace("request", traceparent=f"00-{PARENT_TRACE}-{PARENT_SPAN}-00") is NOOP_SPAN
+    (root,) = exporter.traces[0]
+    assert (root["trace_id"], root["parent_id"]) == (PARENT_TRACE, PARENT_SPAN)
+
+
+def test_file_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    file_exporter = FileExporter(str(path), flush_interval=0.05)
+    tracer = Tracer(file_exporter, sample_rate=1.0)
+    with tracer.start_trace("request"):
+        work(tracer)
+    file_exporter.shutdown()
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert sorted(span["name"] for span in spans) == ["inner", "request", "work"]
+    assert file_exporter.dropped == 0
+
+
+class StubSession:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((url, json))
+        return self
+
+    def raise_for_status(self):
+        pass
+
+
+def test_otlp_exporter():
+    otlp = OTLPExporter("http://collector:4318/v1/traces", flush_interval=0.05)
+    otlp.session = StubSession()
+    tracer = Tracer(otlp, sample_rate=1.0)
+    with pytest.raises(ValueError):
+        with tracer.start_trace("request", cached=True, attempts=2):
+            work(tracer, fail=True)
+    otlp.shutdown()
+
+    (url, body), = otlp.session.posts
+    assert url == "http://collector:4318/v1/traces"
+    (resource,) = body["resourceSpans"]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "smart-regex"}}]
+    spans = {span["name"]: span for span in resource["scopeSpans"][0]["spans"]}
+    root, child = spans["request"], spans["work"]
+    assert "parentSpanId" not in root
+    assert child["parentSpanId"] == root["spanId"]
+    assert root["attributes"] == [{"key": "cached", "value": {"boolValue": True}},
+                                  {"key": "attempts", "value": {"intValue": "2"}}]
+    assert child["status"] == {"code": 2, "message": "ValueError: bad input"}
+    assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+
+
+@pytest.mark.parametrize("env, exporter_type, sample_rate", [
+    ({}, None, 0.0),
+    ({"TRACE_SAMPLE_RATE": "0.5", "TRACE_EXPORTER": "off"}, None, 0.0),
+    ({"TRACE_SAMPLE_RATE": "0.5"}, FileExporter, 0.5),
+    ({"TRACE_HONOR_TRACEPARENT": "true"}, FileExporter, 0.0),
+    ({"TRACE_SAMPLE_RATE": "1", "TRACE_EXPORTER": "otlp"}, OTLPExporter, 1.0),
+])
+def test_build_tracer(monkeypatch, tmp_path, env, exporter_type, sample_rate):
+    for name in ("TRACE_SAMPLE_RATE", "TRACE_EXPORTER", "TRACE_HONOR_TRACEPARENT"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    tracer = build_tracer()
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+    assert (type(tracer.exporter) if tracer.exporter else None) is exporter_type
+    assert tracer.sample_rate == sample_rate
+
+
+def test_request_trace(fake_upstream, exporter, monkeypatch):
+    url, _ = fake_upstream
+    generator = app_module.SmartRegexGenerator("test")
+    generator.base_url = url
+    monkeypatch.setattr(app_module, "generator", generator)
+    monkeypatch.setattr(app_module, "tracer", Tracer(exporter, sample_rate=0.0))
+
+    client = app_module.app.test_client()
+    client.post('/api/generate', json={"prompt": "three digits"})
+    assert exporter.traces == []
+    response = client.post('/api/generate', json={"prompt": "three digits"},
+                           headers={"traceparent": f"00-{PARENT_TRACE}-{PARENT_SPAN}-01"})
+    assert response.status_code == 200
+
+    (spans,) = exporter.traces
+    spans = by_name(spans)
+    root = spans["POST /api/generate"]
+    assert (root["trace_id"], root["parent_id"]) == (PARENT_TRACE, PARENT_SPAN)
+    assert root["attributes"]["http.status_code"] == 200
+    assert spans["generate_regex"]["parent_id"] == root["span_id"]
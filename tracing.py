@@ -0,0 +1,316 @@
+"""Lightweight request tracing.
+
+A sampled request gets a root span (``tracer.start_trace``); stages below it
+open child spans with ``tracer.span(name)``. The active span lives in a
+context variable, so nesting works across threads' own stacks and across
+``await``. When a request is not sampled no span objects are created at all:
+``tracer.span`` finds no active span and returns a shared no-op, which costs
+one ContextVar lookup.
+
+Finished traces are handed to an exporter that writes from a background
+thread, either as JSON lines to a local file or as OTLP/HTTP JSON to a
+collector (``/v1/traces``). Incoming W3C ``traceparent`` headers are honoured:
+a sampled parent forces sampling and the trace id is continued.
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+import requests
+
+logger = logging.getLogger("smart_regex.tracing")
+
+_current_span = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Returned whenever the current request is not being traced"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "error", "_token")
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = 0
+        self.end_ns = 0
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. a streamed response finishing late)
+            pass
+        self.trace.finish(self)
+        return False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class _Trace:
+    __slots__ = ("tracer", "trace_id", "root", "spans")
+
+    def __init__(self, tracer, trace_id):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.root = None
+        self.spans = []
+
+    def finish(self, span):
+        self.spans.append(span)
+        if span is self.root:
+            self.tracer.exporter.export([s.to_dict() for s in self.spans])
+
+
+def traced(name):
+    """Decorator: run the function in a child span of the active trace, if any"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current_span.get()
+            if parent is None:
+                return func(*args, **kwargs)
+            with Span(parent.trace, name, parent.span_id, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    parts = header.strip().split("-") if header else []
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_rate=0.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+
+    def start_trace(self, name, traceparent=None, **attributes):
+        """Root span for a request, or the no-op span if it is not sampled"""
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is not None and self.exporter is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = None, None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            return NOOP_SPAN
+
+        trace = _Trace(self, trace_id or os.urandom(16).hex())
+        trace.root = Span(trace, name, parent_id, attributes)
+        return trace.root
+
+    def span(self, name, **attributes):
+        """Child of the active span; a no-op outside a sampled trace"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(parent.trace, name, parent.span_id, attributes)
+
+    @staticmethod
+    def current_span():
+        return _current_span.get() or NOOP_SPAN
+
+
+class BatchExporter:
+    """Queues finished traces and writes them in batches from a background thread"""
+
+    def __init__(self, max_batch=512, flush_interval=1.0, max_queue=10000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._start()
+        # The writer thread does not survive fork (gunicorn --preload)
+        os.register_at_fork(after_in_child=self._start)
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        self._queue = queue.Queue(self.max_queue)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def export(self, spans):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            # Never block a request on tracing
+            self.dropped += len(spans)
+
+    def _drain(self, first=None):
+        batch = list(first or [])
+        while len(batch) < self.max_batch:
+            try:
+                batch.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write_safely(self._drain(first))
+
+    def _write_safely(self, batch):
+        if not batch:
+            return
+        try:
+            self.write(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning("⚠️ Dropped %d spans: %s", len(batch), e)
+
+    def shutdown(self):
+        """Stop the writer and flush whatever is still queued"""
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        while not self._queue.empty():
+            self._write_safely(self._drain())
+
+    def write(self, spans):
+        raise NotImplementedError
+
+
+class FileExporter(BatchExporter):
+    """Appends one JSON object per span to a local file"""
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def write(self, spans):
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter(BatchExporter):
+    """Posts spans as OTLP/HTTP JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint, service_name="smart-regex", timeout=5.0, **kwargs):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+        super().__init__(**kwargs)
+
+    def encode(self, spans):
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(span["start_time_unix_nano"]),
+                "endTimeUnixNano": str(span["end_time_unix_nano"]),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span["attributes"].items()],
+                "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1}
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            otlp_spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "smart_regex"}, "spans": otlp_spans}]
+            }]
+        }
+
+    def write(self, spans):
+        response = self.session.post(self.endpoint, json=self.encode(spans), timeout=self.timeout)
+        response.raise_for_status()
+
+
+def build_tracer():
+    """Tracer configured from TRACE_SAMPLE_RATE / TRACE_EXPORTER (file, otlp or off).
+
+    With a zero sample rate, tracing is fully off unless
+    TRACE_HONOR_TRACEPARENT is set, in which case only requests arriving with
+    a sampled traceparent header are traced.
+    """
+    sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", 0))
+    backend = os.getenv("TRACE_EXPORTER", "file").lower()
+    if backend == "off":
+        return Tracer()
+    # Don't start writer threads for tracing that can never fire
+    if sample_rate <= 0 and os.getenv("TRACE_HONOR_TRACEPARENT", "False").lower() != "true":
+        return Tracer()
+    if backend == "otlp":
+        exporter = OTLPExporter(os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+    else:
+        exporter = FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    return Tracer(exporter, sample_rate)